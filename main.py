@@ -9,7 +9,7 @@ from src.pages.methodology import MethodologyPage
 sys.path.append(str(Path(__file__).parent / "src"))
 
 from src.nm.analytics import Analytics
-from src.nm.data_loader import DataLoader
+from src.nm.dataset_registry import get_dataset_registry
 from src.state import StateManager
 from src.pages.overview import OverviewPage
 from src.pages.indicators import IndicatorsPage
@@ -86,112 +86,20 @@ class DashboardApp:
             "laboratorio": InteractiveAnalysisPage(),
             "card_demo": CardDemoPage(),
         }
-        
-        self.data = None
 
     def load_data(self):
-        """Carrega todos os dados necessários"""
-        if self.data is None:
-            with st.spinner("Carregando dados..."):
-                self.data = self._load_all_datasets()
-        return self.data
-
-    def _load_all_datasets(self):
-        """Carrega todos os datasets"""
-        data = {}
-
-        # Carregar CSVs
-        csv_files = {
-            'economicos': 'indicadores_economicos.csv',
-            'sociais': 'indicadores_sociais.csv',
-            'ambientais': 'indicadores_ambientais.csv',
-            'inovacao': 'indicadores_inovacao.csv'
-        }
+        """Obtém a versão atual dos dados compartilhados entre sessões"""
+        with st.spinner("Carregando dados..."):
+            snapshot = get_dataset_registry().snapshot()
+
+        for error in snapshot.errors.values():
+            st.warning(error)
 
-        for key, filename in csv_files.items():
-            filepath = f"static/datasets/{filename}"
-            data[key] = DataLoader.load_csv_safe(filepath)
-            if data[key] is None:
-                data[key] = self._create_dummy_data(key)
-
-        # Carregar JSONs
-        json_files = [
-            'ontologia_ecossistema_textil_ptbr.json'
-        ]
-
-        for filename in json_files:
-            filepath = f"static/datasets/{filename}"
-            json_data = DataLoader.load_json_safe(filepath)
-            if json_data:
-                data['ontologia'] = json_data
-                break
-
-        filepath = f"static/methodology/aim/board_aim_framework-fluid-version.html"
-        data['methodology'] = DataLoader.load_file(filepath)
-        filepath = f"static/js/controls.js"
-        data['controls'] = DataLoader.load_file(filepath)
-
-        return data
-
-    def _create_dummy_data(self, data_type):
-        """Cria dados simulados quando arquivos não estão disponíveis"""
-        import pandas as pd
-
-        cities = ['Santa Cruz do Capibaribe', 'Caruaru', 'Toritama']
-
-        if data_type == 'economicos':
-            return pd.DataFrame({
-                'cidade': cities,
-                'populacao': [107500, 365000, 44000],
-                'empresas_formais': [1200, 2500, 450],
-                'empresas_informais': [4800, 7500, 1550],
-                'taxa_informalidade': [39.8, 23.9, 57.3],
-                'empregos_diretos': [45000, 85000, 25000],
-                'faturamento_anual_milhoes': [1800, 2200, 1600],
-                'exportacao_percentual': [5, 8, 3],
-                'pib_per_capita': [12500, 18700, 14300]
-            })
-
-        elif data_type == 'sociais':
-            return pd.DataFrame({
-                'cidade': cities,
-                'idh': [0.648, 0.677, 0.618],
-                'taxa_pobreza': [28.5, 22.1, 35.2],
-                'taxa_extrema_pobreza': [12.3, 8.7, 15.8],
-                'evasao_escolar': [32.5, 24.8, 38.7],
-                'trabalho_infantil': [18.7, 12.5, 24.3],
-                'acesso_internet': [65.3, 72.8, 58.7],
-                'mulheres_empreendedoras': [58.2, 52.4, 62.5],
-                'jovens_empreendedores': [42.5, 38.2, 48.7]
-            })
-
-        elif data_type == 'ambientais':
-            return pd.DataFrame({
-                'cidade': cities,
-                'consumo_agua_m3_dia': [3200, 4500, 2800],
-                'efluentes_tratados_percentual': [35.2, 58.7, 22.5],
-                'residuos_solidos_ton_mes': [450, 780, 320],
-                'energia_renovavel_percentual': [15.3, 22.1, 8.7],
-                'reuso_agua_percentual': [12.5, 18.3, 8.2],
-                'poluicao_rios_indice': [7.8, 6.2, 8.9],
-                'lavanderias_quantidade': [25, 35, 70],
-                'lavanderias_licenciadas_percentual': [45.2, 62.8, 28.6]
-            })
-
-        elif data_type == 'inovacao':
-            return pd.DataFrame({
-                'cidade': cities,
-                'investimento_inovacao_percentual': [2.8, 4.2, 1.5],
-                'empresas_com_ecommerce': [18.5, 27.3, 12.4],
-                'adocao_tecnologias_digitais': [35.2, 48.6, 28.7],
-                'marcas_proprias_percentual': [22.4, 35.8, 18.2],
-                'design_proprio_percentual': [15.7, 28.4, 12.1],
-                'capacitacao_digital_percentual': [28.5, 42.1, 19.3],
-                'acesso_credito_inovacao': [6.2, 8.7, 4.1],
-                'startups_relacionadas': [8, 28, 3]
-            })
-
-        return pd.DataFrame()
+        state = StateManager.get_state()
+        if state.last_update != snapshot.loaded_at:
+            StateManager.update_state(data_loaded=True, last_update=snapshot.loaded_at)
+
+        return snapshot.data
 
     def _render_overview(self):
         """Render overview page"""
@@ -602,8 +510,11 @@ class DashboardApp:
             state = StateManager.get_state()
             st.text(f"Página ativa: {state.active_page}")
 
+            registry = get_dataset_registry()
+            st.text(f"Versão dos dados: {registry.version}")
+
             if st.button("🔄 Recarregar Dados", key="reload_data"):
-                self.data = None
+                registry.reload()
                 st.rerun()
 
 
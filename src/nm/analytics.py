@@ -10,13 +10,8 @@ import random
 from streamlit import runtime
 from streamlit.runtime.scriptrunner import get_script_run_ctx
 
-
-try:
-    from supabase import create_client, Client
-    SUPABASE_AVAILABLE = True
-except ImportError:
-    SUPABASE_AVAILABLE = False
-    Client = None
+from src.nm.analytics_writer import get_analytics_writer
+from src.nm.supabase_client import SUPABASE_AVAILABLE, get_supabase_factory
 
 class Analytics:
     """Classe para gerenciar analytics"""
@@ -77,39 +72,25 @@ class Analytics:
                 "data": event_data or {}
             }
 
-            # Criar diretório se não existir
-            analytics_dir = "static/analytics"
-            os.makedirs(analytics_dir, exist_ok=True)
-
-            # Salvar evento
-            analytics_file = os.path.join(
-                analytics_dir,
-                f"analytics_{datetime.datetime.now().strftime('%Y%m%d')}.jsonl"
-            )
-            with open(analytics_file, "a", encoding='utf-8') as f:
-                f.write(json.dumps(event, ensure_ascii=False) + "\n")
-
-            Analytics.save_analytics_db(event, page=page)
+            # Contexto da sessão é capturado aqui, na thread de renderização;
+            # a gravação (arquivo local e Supabase) fica com o gravador em segundo plano
+            row = Analytics._build_db_row(event, page=page)
+            get_analytics_writer().submit(event, row)
 
         except Exception as e:
             # Falha silenciosa em analytics para não impactar UX
             pass
 
     @staticmethod
-    def save_analytics_db(event_data: Optional[Dict] = None, page: str = "unknown"):
+    def _build_db_row(event_data: Optional[Dict] = None, page: str = "unknown") -> Optional[Dict]:
+        """Monta a linha da tabela analytics (None se o Supabase não estiver configurado)"""
         if not SUPABASE_AVAILABLE:
-            return False
+            return None
         try:
-            # Check if we have Supabase configuration in Streamlit secrets
-            if "SUPABASE_URL" not in st.secrets or "SUPABASE_KEY" not in st.secrets:
-                return False
+            if not get_supabase_factory().configured:
+                return None
 
-            # Initialize Supabase client
-            supabase: Client = create_client(
-                st.secrets["SUPABASE_URL"],
-                st.secrets["SUPABASE_KEY"]
-            )
-            data_to_insert = {
+            return {
                 "source": "textile-pe",
                 "session_id": Analytics.get_session_id(),
                 "timestamp": datetime.datetime.now().isoformat(),
@@ -117,10 +98,24 @@ class Analytics:
                 "page": page,
                 "data": event_data,
                 "action": "",
-                "env" : st.secrets["ENV"],
+                "env" : st.secrets.get("ENV"),
                 "user_id": Analytics.get_user_identifier(),
                 "ip": Analytics.get_remote_ip(),
             }
+        except Exception:
+            return None
+
+    @staticmethod
+    def save_analytics_db(event_data: Optional[Dict] = None, page: str = "unknown"):
+        """Grava um evento no Supabase de forma síncrona (log_event usa o gravador em lote)"""
+        data_to_insert = Analytics._build_db_row(event_data, page=page)
+        if data_to_insert is None:
+            return False
+        # Cliente compartilhado (conexões reaproveitadas)
+        supabase = get_supabase_factory().get_client()
+        try:
+            if supabase is None:
+                return False
 
             # Insert into database
             result = supabase.table("analytics").insert(data_to_insert).execute()
@@ -131,6 +126,7 @@ class Analytics:
                 return False
         except Exception as e:
             print(f"{datetime.datetime.now().isoformat()} - Erro ao salvar no Supabase: {str(e)}")
+            get_supabase_factory().reset(supabase)
             return False
 
     @staticmethod
@@ -0,0 +1,212 @@
+import atexit
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, Any, Optional, List, Tuple
+
+import streamlit as st
+
+from src.nm.supabase_client import SupabaseClientFactory, get_supabase_factory
+
+ANALYTICS_DIR = "static/analytics"
+SPILL_FILE = "pending_db.jsonl"
+ANALYTICS_TABLE = "analytics"
+
+_STOP = object()
+
+
+class AnalyticsWriter:
+    """Grava eventos de analytics em segundo plano.
+
+    Os eventos entram em uma fila limitada e uma thread os agrupa em lotes,
+    gravados quando atingem `batch_size` ou após `flush_interval` segundos:
+    primeiro no JSONL diário local e depois em um único insert no Supabase,
+    pelo cliente compartilhado da `factory`. Falhas no banco são repetidas com
+    backoff exponencial (reconectando o cliente); se persistirem, as
+    linhas vão para um arquivo de pendências reenviado no próximo envio bem
+    sucedido. Com a fila cheia o evento é descartado (e contado em `dropped`).
+    """
+
+    def __init__(self, factory: Optional[SupabaseClientFactory] = None,
+                 analytics_dir: str = ANALYTICS_DIR, batch_size: int = 50,
+                 flush_interval: float = 2.0, max_queue: int = 10000,
+                 max_retries: int = 3, backoff: float = 0.5):
+        self.factory = factory
+        self.analytics_dir = analytics_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def spill_path(self) -> str:
+        return os.path.join(self.analytics_dir, SPILL_FILE)
+
+    def submit(self, event: Dict[str, Any], row: Optional[Dict[str, Any]] = None) -> bool:
+        """Enfileira um evento (e a linha do banco, se houver) sem bloquear"""
+        try:
+            self._queue.put_nowait((event, row))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="analytics-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Grava o que estiver na fila e encerra a thread"""
+        if not self._thread or not self._thread.is_alive():
+            return
+        self._stopping.set()
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+
+    def _run(self) -> None:
+        batch: List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]] = []
+        deadline = 0.0
+
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else self.flush_interval
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush(batch)
+                return
+
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+
+    def _flush(self, batch: List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]) -> None:
+        if not batch:
+            return
+        try:
+            self._write_local([event for event, _ in batch])
+
+            rows = [row for _, row in batch if row is not None]
+            if rows:
+                if self._send(rows):
+                    self._drain_spill()
+                else:
+                    self._append_jsonl(self.spill_path, rows)
+        except Exception as e:
+            # A gravação de analytics nunca deve derrubar a thread
+            print(f"{datetime.datetime.now().isoformat()} - Erro ao gravar analytics: {str(e)}")
+
+    def _write_local(self, events: List[Dict[str, Any]]) -> None:
+        """Acrescenta os eventos aos arquivos diários (um open por arquivo)"""
+        by_file: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            try:
+                day = datetime.datetime.fromisoformat(event["timestamp"]).strftime('%Y%m%d')
+            except (KeyError, TypeError, ValueError):
+                day = datetime.datetime.now().strftime('%Y%m%d')
+            path = os.path.join(self.analytics_dir, f"analytics_{day}.jsonl")
+            by_file.setdefault(path, []).append(event)
+
+        for path, file_events in by_file.items():
+            self._append_jsonl(path, file_events)
+
+    def _append_jsonl(self, path: str, records: List[Dict[str, Any]]) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records))
+
+    def _send(self, rows: List[Dict[str, Any]]) -> bool:
+        """Insere as linhas em lote, com até `max_retries` tentativas"""
+        for attempt in range(self.max_retries):
+            client = self.factory.get_client() if self.factory else None
+            try:
+                if client is None:
+                    return False
+                client.table(ANALYTICS_TABLE).insert(rows).execute()
+                return True
+            except Exception as e:
+                print(f"{datetime.datetime.now().isoformat()} - Erro ao salvar no Supabase "
+                      f"(tentativa {attempt + 1}/{self.max_retries}): {str(e)}")
+                # Reconecta na próxima tentativa
+                self.factory.reset(client)
+                if attempt + 1 < self.max_retries:
+                    self._stopping.wait(self.backoff * (2 ** attempt))
+        return False
+
+    def _drain_spill(self) -> None:
+        """Reenvia as linhas pendentes de falhas anteriores.
+
+        Um `.sending` que sobrou de uma drenagem interrompida é reenviado
+        junto com o arquivo pendente atual, e linhas corrompidas são
+        descartadas sem interromper o envio das demais.
+        """
+        sending_path = self.spill_path + ".sending"
+        if os.path.exists(self.spill_path):
+            if os.path.exists(sending_path):
+                self._merge_spill(self.spill_path, sending_path)
+            else:
+                os.replace(self.spill_path, sending_path)
+        elif not os.path.exists(sending_path):
+            return
+
+        rows, skipped = [], 0
+        with open(sending_path, "r", encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    skipped += 1
+        if skipped:
+            print(f"{datetime.datetime.now().isoformat()} - {skipped} linhas inválidas descartadas de {sending_path}")
+
+        for start in range(0, len(rows), self.batch_size):
+            chunk = rows[start:start + self.batch_size]
+            if not self._send(chunk):
+                self._append_jsonl(self.spill_path, rows[start:])
+                break
+
+        os.remove(sending_path)
+
+    @staticmethod
+    def _merge_spill(spill_path: str, sending_path: str) -> None:
+        """Acrescenta o arquivo pendente ao `.sending` e o remove"""
+        with open(sending_path, "rb+") as dst:
+            dst.seek(0, os.SEEK_END)
+            if dst.tell() > 0:
+                dst.seek(-1, os.SEEK_END)
+                if dst.read(1) != b"\n":
+                    dst.write(b"\n")  # Última linha truncada não pode colar na seguinte
+            with open(spill_path, "rb") as src:
+                dst.write(src.read())
+        os.remove(spill_path)
+
+
+@st.cache_resource(show_spinner=False)
+def get_analytics_writer() -> AnalyticsWriter:
+    """Retorna o gravador de analytics compartilhado por todas as sessões do processo"""
+    writer = AnalyticsWriter(factory=get_supabase_factory())
+    writer.start()
+    atexit.register(writer.stop)
+    return writer
@@ -0,0 +1,150 @@
+from typing import Any, List, Mapping, Optional, Sequence
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.nm.city_table import CITY_TABLE_KEYS, NORM_SUFFIX, ZSCORE_SUFFIX, base_numeric_columns
+
+SIMILARITY_METHODS = {
+    'cosine': 'Cosseno',
+    'correlation': 'Correlação',
+    'gower': 'Gower',
+}
+
+# Memória máxima (em número de floats) de um bloco da busca de vizinhos
+BLOCK_BUDGET = 4_000_000
+
+
+def group_columns(data: Mapping[str, Any], df: pd.DataFrame, group: Optional[str]) -> List[str]:
+    """Indicadores numéricos da tabela fato que vieram da tabela `group` do registro"""
+    available = base_numeric_columns(df)
+    if group is None or group not in CITY_TABLE_KEYS:
+        return available
+
+    source = data.get(group)
+    if source is None or source.empty:
+        return []
+    columns = []
+    for col in source.select_dtypes(include=[np.number]).columns:
+        # Colunas repetidas recebem o sufixo da tabela no merge
+        suffixed = f"{col}_{group}"
+        if suffixed in available:
+            columns.append(suffixed)
+        elif col in available:
+            columns.append(col)
+    return columns
+
+
+def similarity_features(df: pd.DataFrame, columns: Sequence[str], method: str) -> np.ndarray:
+    """Matriz (cidades × indicadores) usada na comparação.
+
+    Cosseno e correlação usam os z-scores da tabela fato (ausentes = média);
+    Gower usa os valores min-max (`_norm`) e mantém os ausentes como NaN.
+    """
+    suffix = NORM_SUFFIX if method == 'gower' else ZSCORE_SUFFIX
+    derived = [f"{col}{suffix}" for col in columns]
+    if all(col in df.columns for col in derived):
+        features = df[derived].to_numpy(dtype=float)
+    else:
+        # Tabela sem colunas derivadas: calcula a mesma padronização
+        values = df[list(columns)].to_numpy(dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if method == 'gower':
+                span = np.nanmax(values, axis=0) - np.nanmin(values, axis=0)
+                features = np.where(span > 0, (values - np.nanmin(values, axis=0)) / span, 0.5)
+            else:
+                std = np.nanstd(values, axis=0, ddof=1)
+                features = np.where(std > 0, (values - np.nanmean(values, axis=0)) / std, 0.0)
+
+    if method == 'gower':
+        return features
+
+    features = np.nan_to_num(features, nan=0.0)
+    if method == 'correlation':
+        # Correlação de Pearson entre cidades = cosseno dos perfis centrados
+        features = features - features.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    return np.divide(features, norms, out=np.zeros_like(features), where=norms > 0)
+
+
+def _block_similarity(block: np.ndarray, features: np.ndarray, method: str) -> np.ndarray:
+    """Similaridade das linhas do bloco com todas as cidades"""
+    if method != 'gower':
+        return block @ features.T
+
+    # Gower: 1 - média das distâncias absolutas nos indicadores presentes nos dois lados
+    diff = np.abs(block[:, np.newaxis, :] - features[np.newaxis, :, :])
+    valid = ~np.isnan(diff)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        distance = np.nansum(diff, axis=2) / valid.sum(axis=2)
+    return 1 - np.nan_to_num(distance, nan=1.0)
+
+
+def similarity_edges(features: np.ndarray, method: str, k: Optional[int] = None,
+                     threshold: Optional[float] = None) -> pd.DataFrame:
+    """Arestas (i, j, weight) do grafo de similaridade, sem montar a matriz n×n.
+
+    As cidades são processadas em blocos cujo tamanho respeita `BLOCK_BUDGET`;
+    de cada bloco ficam apenas os `k` vizinhos mais similares de cada cidade
+    (kNN) e/ou os pares acima de `threshold`. Pares repetidos (i→j e j→i)
+    são unidos.
+    """
+    n, d = features.shape
+    per_row = n * (d if method == 'gower' else 1)
+    block_size = max(1, min(n, BLOCK_BUDGET // max(per_row, 1)))
+
+    sources: List[np.ndarray] = []
+    targets: List[np.ndarray] = []
+    weights: List[np.ndarray] = []
+    for start in range(0, n, block_size):
+        stop = min(n, start + block_size)
+        sims = _block_similarity(features[start:stop], features, method)
+        rows = np.arange(start, stop)
+        sims[rows - start, rows] = -np.inf  # sem laços
+
+        if k is not None and k < n - 1:
+            cols = np.argpartition(-sims, k, axis=1)[:, :k]
+        else:
+            cols = np.tile(np.arange(n), (len(rows), 1))
+        values = np.take_along_axis(sims, cols, axis=1)
+        keep = np.isfinite(values)
+        if threshold is not None:
+            keep &= values >= threshold
+
+        row_index = np.broadcast_to(rows[:, np.newaxis], cols.shape)
+        sources.append(row_index[keep])
+        targets.append(cols[keep])
+        weights.append(values[keep])
+
+    edges = pd.DataFrame({
+        'i': np.concatenate(sources) if sources else np.empty(0, dtype=int),
+        'j': np.concatenate(targets) if targets else np.empty(0, dtype=int),
+        'weight': np.concatenate(weights) if weights else np.empty(0),
+    })
+    lo = np.minimum(edges['i'], edges['j'])
+    hi = np.maximum(edges['i'], edges['j'])
+    edges = edges.assign(i=lo, j=hi).drop_duplicates(['i', 'j']).reset_index(drop=True)
+    return edges
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_similarity_graph(df: pd.DataFrame, columns: Sequence[str], method: str = 'cosine',
+                             k: Optional[int] = 5, threshold: Optional[float] = None,
+                             city_column: str = 'cidade') -> nx.Graph:
+    """Grafo de similaridade entre cidades (nós com grau ponderado; arestas com `weight`)"""
+    columns = [col for col in columns if col in df.columns]
+    cities = df[city_column].astype(str).tolist()
+    graph = nx.Graph()
+    graph.add_nodes_from(cities)
+    if not columns or len(cities) < 2:
+        return graph
+
+    features = similarity_features(df, columns, method)
+    edges = similarity_edges(features, method, k=k, threshold=threshold)
+    graph.add_weighted_edges_from(
+        (cities[i], cities[j], float(w)) for i, j, w in edges.itertuples(index=False, name=None)
+    )
+    nx.set_node_attributes(graph, dict(graph.degree(weight='weight')), 'strength')
+    return graph
@@ -0,0 +1,97 @@
+from typing import Mapping, Any, Optional, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Tabelas de indicadores que compõem a tabela consolidada, na ordem do merge
+CITY_TABLE_KEYS = ('economicos', 'sociais', 'ambientais', 'inovacao')
+
+# Sufixos das colunas derivadas da tabela fato
+NORM_SUFFIX = '_norm'
+ZSCORE_SUFFIX = '_z'
+DERIVED_SUFFIXES = (NORM_SUFFIX, ZSCORE_SUFFIX)
+
+# Linhas dos arquivos de indicadores que agregam vários municípios (não entram em rankings)
+AGGREGATE_ROWS = ('Total Polo', 'Outros Municípios')
+
+# Versão do layout da tabela fato (invalida snapshots antigos do cache colunar)
+CITY_FACTS_SCHEMA = 'facts-v1'
+
+
+def city_rows(df: pd.DataFrame, city_column: str = 'cidade') -> np.ndarray:
+    """Máscara das linhas que são municípios (sem as linhas agregadas de AGGREGATE_ROWS)"""
+    return ~df[city_column].astype(str).str.strip().isin(AGGREGATE_ROWS).to_numpy()
+
+
+def merge_city_tables(data: Mapping[str, Any]) -> Optional[pd.DataFrame]:
+    """Combina as tabelas de indicadores em uma tabela larga por cidade"""
+    df_base = data.get('economicos')
+    if df_base is None or df_base.empty:
+        return None
+    df_base = df_base.copy()
+
+    # Mesclar outros datasets
+    for key in CITY_TABLE_KEYS[1:]:
+        df = data.get(key)
+        if df is not None and not df.empty:
+            df_base = df_base.merge(df, on='cidade', how='left', suffixes=('', f'_{key}'))
+
+    return df_base
+
+
+def build_city_facts(data: Mapping[str, Any]) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+    """Monta a tabela fato de cidades e as estatísticas de cada indicador.
+
+    A tabela fato é a tabela consolidada acrescida de colunas derivadas:
+    `empresas_totais`, `<coluna>_norm` (0–1, min-max sobre todas as cidades;
+    0.5 quando não há variação) e `<coluna>_z` (z-score). As estatísticas
+    (min, max, média e desvio) são retornadas em uma tabela à parte, com uma
+    linha por indicador.
+    """
+    df = merge_city_tables(data)
+    if df is None:
+        return None, None
+
+    # Colunas calculadas
+    if 'empresas_formais' in df.columns and 'empresas_informais' in df.columns:
+        df['empresas_totais'] = df['empresas_formais'] + df['empresas_informais']
+
+    columns = base_numeric_columns(df)
+    values = df[columns].to_numpy(dtype=float)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mins = np.nanmin(values, axis=0)
+        maxs = np.nanmax(values, axis=0)
+        means = np.nanmean(values, axis=0)
+        stds = np.nanstd(values, axis=0, ddof=1) if len(df) > 1 else np.zeros(len(columns))
+
+        ranges = maxs - mins
+        norm = np.where(ranges > 0, (values - mins) / np.where(ranges > 0, ranges, 1), 0.5)
+        zscores = np.where(stds > 0, (values - means) / np.where(stds > 0, stds, 1), 0.0)
+
+    norm[np.isnan(values)] = np.nan
+    zscores[np.isnan(values)] = np.nan
+
+    derived = pd.concat([
+        pd.DataFrame(norm, columns=[f"{col}{NORM_SUFFIX}" for col in columns], index=df.index),
+        pd.DataFrame(zscores, columns=[f"{col}{ZSCORE_SUFFIX}" for col in columns], index=df.index)
+    ], axis=1)
+    facts = pd.concat([df, derived], axis=1)
+
+    stats = pd.DataFrame({
+        'coluna': columns,
+        'min': mins,
+        'max': maxs,
+        'media': means,
+        'desvio': stds
+    })
+
+    return facts, stats
+
+
+def base_numeric_columns(df: pd.DataFrame) -> List[str]:
+    """Colunas numéricas originais (sem as colunas derivadas da tabela fato)"""
+    return [
+        col for col in df.select_dtypes(include=[np.number]).columns
+        if not col.endswith(DERIVED_SUFFIXES)
+    ]
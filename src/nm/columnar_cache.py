@@ -0,0 +1,94 @@
+import os
+import tempfile
+from typing import Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+CACHE_DIR = "static/cache/columnar"
+FINGERPRINT_METADATA_KEY = b"source_fingerprint"
+
+
+class ColumnarCache:
+    """Cache em disco de DataFrames tipados no formato Feather (Arrow IPC).
+
+    Cada tabela é gravada sem compressão para permitir leitura por memory-map
+    e guarda nos metadados o hash do conteúdo de origem; um snapshot só é
+    reaproveitado se o hash coincidir.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    @property
+    def enabled(self) -> bool:
+        return PYARROW_AVAILABLE
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.feather")
+
+    def load(self, key: str, fingerprint: str) -> Optional[pd.DataFrame]:
+        """Carrega o snapshot de `key` se ele corresponder ao hash informado"""
+        if not self.enabled or not fingerprint:
+            return None
+
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            table = feather.read_table(path, memory_map=True)
+            metadata = table.schema.metadata or {}
+            if metadata.get(FINGERPRINT_METADATA_KEY) != fingerprint.encode():
+                return None
+            return table.to_pandas(split_blocks=True)
+        except Exception as e:
+            print(f"Erro ao ler cache colunar {path}: {str(e)}")
+            return None
+
+    def store(self, key: str, df: pd.DataFrame, fingerprint: str) -> bool:
+        """Grava o snapshot de `key` de forma atômica"""
+        if not self.enabled or not fingerprint or df is None:
+            return False
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            metadata = dict(table.schema.metadata or {})
+            metadata[FINGERPRINT_METADATA_KEY] = fingerprint.encode()
+            table = table.replace_schema_metadata(metadata)
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            os.close(fd)
+            try:
+                feather.write_feather(table, tmp_path, compression="uncompressed")
+                os.replace(tmp_path, self.path_for(key))
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            return True
+        except Exception as e:
+            print(f"Erro ao gravar cache colunar {key}: {str(e)}")
+            return False
+
+
+if __name__ == "__main__":
+    # Etapa de build: gera os snapshots colunares de todos os indicadores
+    # e da tabela consolidada de cidades (python -m src.nm.columnar_cache)
+    from src.nm.dataset_registry import DatasetRegistry
+
+    if not PYARROW_AVAILABLE:
+        raise SystemExit("pyarrow não está instalado; cache colunar indisponível")
+
+    snapshot = DatasetRegistry().snapshot()
+    for key, error in snapshot.errors.items():
+        print(f"{key}: {error}")
+    for key, value in snapshot.data.items():
+        if isinstance(value, pd.DataFrame):
+            print(f"{key}: {len(value)} linhas, {len(value.columns)} colunas")
@@ -0,0 +1,204 @@
+import asyncio
+import datetime
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Iterable, Callable, Deque, Set, Tuple
+
+from src.nm.supabase_client import SupabaseClientFactory
+
+try:
+    from realtime import AsyncRealtimeClient
+    REALTIME_AVAILABLE = True
+except ImportError:
+    REALTIME_AVAILABLE = False
+
+SESSION_IDLE_TIMEOUT = 600.0
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """Alteração (INSERT/DELETE) recebida para uma linha da tabela monitorada"""
+    type: str
+    record: Dict[str, Any] = field(default_factory=dict)
+    old_record: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def location(self) -> Optional[str]:
+        return self.record.get("location") or self.old_record.get("location")
+
+
+class _SessionBuffer:
+    def __init__(self, size: int):
+        self.locations: Set[str] = set()
+        self.events: Deque[ChangeEvent] = deque(maxlen=size)
+        self.last_seen = time.monotonic()
+
+
+class CommentStream:
+    """Publica inserções e remoções de uma tabela para as sessões interessadas.
+
+    Uma thread do processo assina o Supabase Realtime (postgres_changes) e,
+    se ele não estiver disponível, consulta periodicamente as linhas novas.
+    Cada alteração é entregue aos `listeners` (por exemplo, o cache de
+    comentários) e ao buffer das sessões inscritas na localização da linha;
+    as sessões consomem o buffer com `drain` em uma atualização do fragmento.
+    Remoções sem localização (sem REPLICA IDENTITY FULL) vão para todas.
+    """
+
+    def __init__(self, factory: SupabaseClientFactory, table: str = "comments",
+                 filter_column: str = "project", filter_value: Optional[str] = None,
+                 poll_interval: float = 15.0, buffer_size: int = 50):
+        self.factory = factory
+        self.table = table
+        self.filter_column = filter_column
+        self.filter_value = filter_value
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.mode = "off"
+        self._listeners: List[Callable[[ChangeEvent], None]] = []
+        self._sessions: Dict[str, _SessionBuffer] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_listener(self, listener: Callable[[ChangeEvent], None]) -> None:
+        self._listeners.append(listener)
+
+    def subscribe(self, session_id: str, locations: Iterable[str]) -> None:
+        """Acrescenta as localizações às inscrições da sessão (cada seção de comentários inscreve a sua)"""
+        now = time.monotonic()
+        with self._lock:
+            buffer = self._sessions.get(session_id)
+            if buffer is None:
+                buffer = self._sessions[session_id] = _SessionBuffer(self.buffer_size)
+            buffer.locations.update(locations)
+            buffer.last_seen = now
+
+            # Descartar sessões encerradas
+            for sid in [sid for sid, b in self._sessions.items() if now - b.last_seen > SESSION_IDLE_TIMEOUT]:
+                del self._sessions[sid]
+
+    def drain(self, session_id: str) -> List[ChangeEvent]:
+        """Retorna e limpa os eventos pendentes da sessão"""
+        with self._lock:
+            buffer = self._sessions.get(session_id)
+            if buffer is None:
+                return []
+            buffer.last_seen = time.monotonic()
+            events = list(buffer.events)
+            buffer.events.clear()
+            return events
+
+    def publish(self, event: ChangeEvent) -> None:
+        """Entrega um evento aos listeners e às sessões inscritas"""
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"{datetime.datetime.now().isoformat()} - Erro ao processar evento de {self.table}: {str(e)}")
+
+        location = event.location
+        with self._lock:
+            for buffer in self._sessions.values():
+                if location is None or location in buffer.locations:
+                    buffer.events.append(event)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.table}-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval)
+
+    def _run(self) -> None:
+        if not self.factory.configured:
+            return
+
+        if REALTIME_AVAILABLE:
+            try:
+                self.mode = "realtime"
+                asyncio.run(self._run_realtime())
+            except Exception as e:
+                print(f"{datetime.datetime.now().isoformat()} - Realtime indisponível, usando polling: {str(e)}")
+
+        if not self._stop.is_set():
+            self.mode = "polling"
+            self._run_polling()
+
+    async def _run_realtime(self) -> None:
+        client = AsyncRealtimeClient(f"{self.factory.url.rstrip('/')}/realtime/v1", token=self.factory.key)
+        await client.connect()
+
+        failed = asyncio.Event()
+
+        def on_status(status, error):
+            if error is not None:
+                print(f"{datetime.datetime.now().isoformat()} - Erro na assinatura realtime: {str(error)}")
+                failed.set()
+
+        filter_expr = f"{self.filter_column}=eq.{self.filter_value}" if self.filter_value else None
+        channel = client.channel(f"{self.table}-changes")
+        await channel.on_postgres_changes(
+            "*", callback=self._on_realtime_change, table=self.table, filter=filter_expr
+        ).subscribe(on_status)
+
+        try:
+            while not self._stop.is_set():
+                if failed.is_set() or not client.is_connected:
+                    raise ConnectionError("conexão realtime encerrada")
+                await asyncio.sleep(1.0)
+        finally:
+            await client.close()
+
+    def _on_realtime_change(self, payload: Dict[str, Any]) -> None:
+        data = payload.get("data", payload)
+        event_type = (data.get("type") or data.get("eventType") or "").upper()
+        if event_type in ("INSERT", "DELETE"):
+            self.publish(ChangeEvent(
+                type=event_type,
+                record=data.get("record") or data.get("new") or {},
+                old_record=data.get("old_record") or data.get("old") or {},
+            ))
+
+    def _run_polling(self) -> None:
+        """Fallback: busca periodicamente as linhas criadas desde a última consulta"""
+        cursor: Optional[Tuple[str, int]] = None
+        seen: Deque[Any] = deque(maxlen=500)
+
+        while True:
+            client = self.factory.get_client()
+            try:
+                if client is not None:
+                    query = client.table(self.table).select("*")
+                    if self.filter_value:
+                        query = query.eq(self.filter_column, self.filter_value)
+
+                    if cursor is None:
+                        # Ponto de partida: a linha mais recente
+                        result = query.order("created_at", desc=True).order("id", desc=True).limit(1).execute()
+                        rows = result.data or []
+                        cursor = (rows[0]["created_at"], rows[0]["id"]) if rows else ("1970-01-01T00:00:00", 0)
+                    else:
+                        result = query.gte("created_at", cursor[0]) \
+                            .order("created_at").order("id").limit(100).execute()
+                        for row in result.data or []:
+                            if row.get("id") in seen or (row["created_at"], row["id"]) <= cursor:
+                                continue
+                            seen.append(row.get("id"))
+                            self.publish(ChangeEvent(type="INSERT", record=row))
+                        if result.data:
+                            last = result.data[-1]
+                            cursor = max(cursor, (last["created_at"], last["id"]))
+            except Exception as e:
+                self.factory.reset_if_disconnected(client, e)
+                print(f"{datetime.datetime.now().isoformat()} - Erro ao consultar {self.table}: {str(e)}")
+
+            if self._stop.wait(self.poll_interval):
+                return
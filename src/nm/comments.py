@@ -1,16 +1,20 @@
 import streamlit as st
 import datetime
-from typing import Dict, Any, Optional, List
-from dataclasses import dataclass
-
-try:
-    from supabase import create_client, Client
-    SUPABASE_AVAILABLE = True
-except ImportError:
-    SUPABASE_AVAILABLE = False
-    Client = None
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Iterable, Tuple
+from dataclasses import dataclass, field, replace
 
 from src.nm.analytics import Analytics
+from src.nm.supabase_client import SyncPostgrestClient, get_supabase_factory
+from src.nm.comment_stream import CommentStream, ChangeEvent
+
+PROJECT = "st-textile-pe"
+COMMENT_CACHE_TTL = 60.0
+COMMENTS_PAGE_SIZE = 10
+COMMENTS_REFRESH_INTERVAL = 10
+REMOVED_IDS_LIMIT = 1024
 
 
 @dataclass
@@ -18,31 +22,160 @@ class Comment:
     """Data class for comment structure"""
     id: Optional[int] = None
     created_at: Optional[str] = None
-    project: str = "st-textile-pe"
+    project: str = PROJECT
     location: Optional[str] = None
     author: Optional[str] = None
     comment: Optional[str] = None
     author_picture: Optional[str] = None
     author_name: Optional[str] = None
 
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "Comment":
+        """Build a Comment from a `comments` table row"""
+        return cls(
+            id=row.get("id"),
+            created_at=row.get("created_at"),
+            project=row.get("project"),
+            location=row.get("location"),
+            author=row.get("author"),
+            comment=row.get("comment"),
+            author_picture=row.get("author_picture"),
+            author_name=row.get("author_name")
+        )
+
+
+@dataclass
+class CommentThread:
+    """Cached prefix (newest first) of the comments of one location"""
+    comments: List[Comment] = field(default_factory=list)
+    complete: bool = False
+    count: Optional[int] = None
+    expires_at: float = 0.0
+
+    @property
+    def cursor(self) -> Optional[Tuple[str, int]]:
+        """Keyset cursor (created_at, id) of the oldest loaded comment"""
+        if not self.comments:
+            return None
+        last = self.comments[-1]
+        return last.created_at, last.id
+
+    @property
+    def total(self) -> Optional[int]:
+        return len(self.comments) if self.complete else self.count
+
+
+class CommentCache:
+    """Process-wide read-through cache of comments keyed by (project, location).
+
+    Each entry is a CommentThread holding the newest comments loaded so far
+    (extended page by page) and, when known, the total count. Entries expire
+    after `ttl` seconds so writes from other processes show up eventually;
+    writes from this process patch the cached threads right away. The `None`
+    location holds the unfiltered list of the project. Deletions are applied
+    once per comment id, so the realtime echo of a delete this process has
+    already applied does not decrement the counts again.
+    """
+
+    def __init__(self, ttl: float = COMMENT_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, Optional[str]], CommentThread] = {}
+        self._removed: "OrderedDict[Tuple[str, int], None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_thread(self, project: str, location: Optional[str]) -> Optional[CommentThread]:
+        with self._lock:
+            thread = self._entries.get((project, location))
+            if thread is None:
+                return None
+            if thread.expires_at < time.monotonic():
+                del self._entries[(project, location)]
+                return None
+            return replace(thread, comments=list(thread.comments))
+
+    def put_thread(self, project: str, location: Optional[str], thread: CommentThread) -> None:
+        with self._lock:
+            self._entries[(project, location)] = replace(
+                thread, comments=list(thread.comments), expires_at=time.monotonic() + self.ttl
+            )
+
+    def get(self, project: str, location: Optional[str]) -> Optional[List[Comment]]:
+        """Full comment list of a location, if the whole thread is cached"""
+        thread = self.get_thread(project, location)
+        if thread is None or not thread.complete:
+            return None
+        return thread.comments
+
+    def put(self, project: str, location: Optional[str], comments: List[Comment]) -> None:
+        self.put_thread(project, location, CommentThread(comments=comments, complete=True, count=len(comments)))
+
+    def invalidate(self, project: str, location: Optional[str] = None) -> None:
+        """Drop one location (and the unfiltered list), or the whole project"""
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == project and (location is None or key[1] in (location, None)):
+                    del self._entries[key]
+
+    def add(self, comment: Comment) -> None:
+        """Prepend a newly saved comment to the cached threads it belongs to"""
+        with self._lock:
+            for key in ((comment.project, comment.location), (comment.project, None)):
+                thread = self._entries.get(key)
+                if thread is not None and all(c.id != comment.id for c in thread.comments):
+                    thread.comments = [comment] + thread.comments
+                    if thread.count is not None:
+                        thread.count += 1
+
+    def remove(self, project: str, comment_id: int, location: Optional[str] = None) -> None:
+        """Remove a deleted comment from the cached threads of the project"""
+        with self._lock:
+            if (project, comment_id) in self._removed:
+                return
+            self._removed[(project, comment_id)] = None
+            while len(self._removed) > REMOVED_IDS_LIMIT:
+                self._removed.popitem(last=False)
+
+            for key, thread in self._entries.items():
+                if key[0] != project:
+                    continue
+                before = len(thread.comments)
+                thread.comments = [c for c in thread.comments if c.id != comment_id]
+                removed = len(thread.comments) < before or (location is not None and key[1] in (location, None))
+                if removed and thread.count is not None:
+                    thread.count = max(0, thread.count - 1)
+
+
+@st.cache_resource(show_spinner=False)
+def get_comment_cache() -> CommentCache:
+    """Return the comment cache shared by all sessions of the process"""
+    return CommentCache()
+
+
+@st.cache_resource(show_spinner=False)
+def get_comment_stream() -> CommentStream:
+    """Return the process-wide comment change stream, feeding the comment cache"""
+    cache = get_comment_cache()
+
+    def apply_to_cache(event: ChangeEvent):
+        if event.type == "INSERT":
+            cache.add(Comment.from_row(event.record))
+        elif event.type == "DELETE":
+            cache.remove(PROJECT, event.old_record.get("id"), event.location)
+
+    stream = CommentStream(get_supabase_factory(), table="comments", filter_value=PROJECT)
+    stream.add_listener(apply_to_cache)
+    stream.start()
+    return stream
+
 
 class CommentsManager:
     """Manages comments using Supabase backend"""
     
     @staticmethod
-    def _get_supabase_client() -> Optional[Client]:
-        """Get Supabase client if available and configured"""
-        if not SUPABASE_AVAILABLE:
-            return None
-            
+    def _get_supabase_client() -> Optional[SyncPostgrestClient]:
+        """Get the shared Supabase client if available and configured"""
         try:
-            if "SUPABASE_URL" not in st.secrets or "SUPABASE_KEY" not in st.secrets:
-                return None
-                
-            return create_client(
-                st.secrets["SUPABASE_URL"],
-                st.secrets["SUPABASE_KEY"]
-            )
+            return get_supabase_factory().get_client()
         except Exception:
             return None
     
@@ -77,7 +210,7 @@ class CommentsManager:
                 pass
             
             comment_data = {
-                "project": "st-textile-pe",
+                "project": PROJECT,
                 "location": location,
                 "author": author,
                 "comment": comment_text.strip(),
@@ -88,50 +221,154 @@ class CommentsManager:
             result = supabase.table("comments").insert(comment_data).execute()
             
             if result.data:
+                get_comment_cache().add(Comment.from_row(result.data[0]))
                 return True
             else:
                 return False
                 
         except Exception as e:
+            get_supabase_factory().reset_if_disconnected(supabase, e)
             st.error(f"Erro ao salvar comentário: {str(e)}")
             return False
     
     @staticmethod
-    def load_comments(location: Optional[str] = None) -> List[Comment]:
-        """Load comments from Supabase"""
+    def _comments_query(supabase: SyncPostgrestClient, location: Optional[str] = None,
+                        cursor: Optional[Tuple[str, int]] = None):
+        """Select query ordered newest first on (created_at, id), optionally after a cursor"""
+        query = supabase.table("comments").select("*").eq("project", PROJECT)
+
+        if location:
+            query = query.eq("location", location)
+
+        if cursor:
+            # Keyset: rows strictly older than the cursor
+            created_at, comment_id = cursor
+            query = query.or_(
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{comment_id})'
+            )
+
+        return query.order("created_at", desc=True).order("id", desc=True)
+
+    @staticmethod
+    def load_comments(location: Optional[str] = None, use_cache: bool = True) -> List[Comment]:
+        """Load all comments of a location (served from the comment cache when fresh)"""
+        cache = get_comment_cache()
+        if use_cache:
+            cached = cache.get(PROJECT, location or None)
+            if cached is not None:
+                return cached
+
         supabase = CommentsManager._get_supabase_client()
         if not supabase:
             return []
             
         try:
-            query = supabase.table("comments").select("*").eq("project", "st-textile-pe")
-            
-            if location:
-                query = query.eq("location", location)
-                
-            result = query.order("created_at", desc=True).execute()
+            result = CommentsManager._comments_query(supabase, location).execute()
             
-            if result.data:
-                comments = []
-                for row in result.data:
-                    comment = Comment(
-                        id=row.get("id"),
-                        created_at=row.get("created_at"),
-                        project=row.get("project"),
-                        location=row.get("location"),
-                        author=row.get("author"),
-                        comment=row.get("comment"),
-                        author_picture=row.get("author_picture"),
-                        author_name=row.get("author_name")
-                    )
-                    comments.append(comment)
-                return comments
-            else:
-                return []
+            comments = [Comment.from_row(row) for row in result.data or []]
+            cache.put(PROJECT, location or None, comments)
+            return comments
                 
         except Exception as e:
+            get_supabase_factory().reset_if_disconnected(supabase, e)
             st.error(f"Erro ao carregar comentários: {str(e)}")
             return []
+
+    @staticmethod
+    def load_comments_page(location: str, limit: int = COMMENTS_PAGE_SIZE) -> Tuple[List[Comment], bool]:
+        """Load the newest `limit` comments of a location.
+
+        Only the rows missing from the cached thread are fetched, continuing
+        from its keyset cursor. Returns the comments and whether there are more.
+        """
+        cache = get_comment_cache()
+        thread = cache.get_thread(PROJECT, location) or CommentThread()
+
+        if not thread.complete and len(thread.comments) <= limit:
+            supabase = CommentsManager._get_supabase_client()
+            if supabase:
+                try:
+                    # One extra row tells whether the thread continues
+                    need = limit - len(thread.comments) + 1
+                    result = CommentsManager._comments_query(supabase, location, thread.cursor) \
+                        .limit(need).execute()
+
+                    rows = result.data or []
+                    thread.comments.extend(Comment.from_row(row) for row in rows)
+                    thread.complete = len(rows) < need
+                    cache.put_thread(PROJECT, location, thread)
+
+                except Exception as e:
+                    get_supabase_factory().reset_if_disconnected(supabase, e)
+                    st.error(f"Erro ao carregar comentários: {str(e)}")
+
+        return thread.comments[:limit], len(thread.comments) > limit
+
+    @staticmethod
+    def count_comments(location: str) -> Optional[int]:
+        """Number of comments of a location (count-only query, cached with the thread)"""
+        cache = get_comment_cache()
+        thread = cache.get_thread(PROJECT, location)
+        if thread is not None and thread.total is not None:
+            return thread.total
+
+        supabase = CommentsManager._get_supabase_client()
+        if not supabase:
+            return None
+
+        try:
+            result = supabase.table("comments").select("id", count="exact", head=True) \
+                .eq("project", PROJECT).eq("location", location).execute()
+
+            thread = thread or CommentThread()
+            thread.count = result.count
+            cache.put_thread(PROJECT, location, thread)
+            return result.count
+
+        except Exception as e:
+            get_supabase_factory().reset_if_disconnected(supabase, e)
+            print(f"{datetime.datetime.now().isoformat()} - Erro ao contar comentários: {str(e)}")
+            return None
+
+    @staticmethod
+    def prefetch_comments(locations: Iterable[str], per_location: int = COMMENTS_PAGE_SIZE) -> None:
+        """Warm the cache for several locations with a single query.
+
+        Loads at most `per_location` comments per location on average; threads
+        are marked complete only if the whole result fit in that budget.
+        """
+        cache = get_comment_cache()
+        missing = [loc for loc in dict.fromkeys(locations) if loc and cache.get_thread(PROJECT, loc) is None]
+        if not missing:
+            return
+
+        supabase = CommentsManager._get_supabase_client()
+        if not supabase:
+            return
+
+        try:
+            budget = per_location * len(missing)
+            result = supabase.table("comments").select("*").eq("project", PROJECT) \
+                .in_("location", missing).order("created_at", desc=True).order("id", desc=True) \
+                .limit(budget + 1).execute()
+
+            rows = result.data or []
+            complete = len(rows) <= budget
+            by_location: Dict[str, List[Comment]] = {loc: [] for loc in missing}
+            for row in rows[:budget]:
+                comment = Comment.from_row(row)
+                by_location.setdefault(comment.location, []).append(comment)
+
+            # Each location's rows are a prefix of its own thread (newest first)
+            for loc, comments in by_location.items():
+                cache.put_thread(PROJECT, loc, CommentThread(
+                    comments=comments, complete=complete, count=len(comments) if complete else None
+                ))
+
+        except Exception as e:
+            # Falls back to per-location loads
+            get_supabase_factory().reset_if_disconnected(supabase, e)
+            print(f"{datetime.datetime.now().isoformat()} - Erro ao pré-carregar comentários: {str(e)}")
     
     @staticmethod
     def delete_comment(comment_id: int) -> bool:
@@ -147,137 +384,45 @@ class CommentsManager:
             # Only allow deletion of comments from current user
             result = supabase.table("comments").delete().eq("id", comment_id).eq("author", current_author).execute()
             
-            return len(result.data) > 0
+            if len(result.data) > 0:
+                get_comment_cache().remove(PROJECT, comment_id, result.data[0].get("location"))
+                return True
+            return False
             
         except Exception as e:
+            get_supabase_factory().reset_if_disconnected(supabase, e)
             st.error(f"Erro ao deletar comentário: {str(e)}")
             return False
     
     @staticmethod
-    def render_comment_section(location: str, key_prefix: str = ""):
-        """Render a complete comment section with input and display"""
-        st.subheader("💬 Comentários")
-        
-        # Show current user info before comment input
-        current_user_picture = None
-        current_user_display = "Usuário Anônimo"
-        
-        # Get current user info
-        try:
-            if hasattr(st, 'user') and st.user.is_logged_in:
-                if hasattr(st.user, 'picture') and st.user.picture:
-                    current_user_picture = st.user.picture
-                if hasattr(st.user, 'name') and st.user.name:
-                    current_user_display = st.user.name
-                elif hasattr(st.user, 'email') and st.user.email:
-                    current_user_display = st.user.email.split("@")[0]
-        except:
-            pass
-        
-        # Comment input with user info
-        with st.form(key=f"comment_form_{key_prefix}_{location}"):
-            # Show who is commenting
-            if current_user_picture:
-                st.markdown(f"""
-                <div style="display: flex; align-items: center; margin-bottom: 10px;">
-                    <img src="{current_user_picture}" 
-                         style="width: 24px; height: 24px; border-radius: 50%; margin-right: 8px; 
-                                object-fit: cover; border: 1px solid #e0e0e0;" 
-                         alt="Your profile picture"/>
-                    <span style="color: #666; font-size: 14px;">Comentando como: <strong>{current_user_display}</strong></span>
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.caption(f"👤 Comentando como: **{current_user_display}**")
-            
-            comment_text = st.text_area(
-                "Adicione seu comentário:",
-                placeholder="Digite seu comentário aqui...",
-                height=100,
-                key=f"comment_input_{key_prefix}_{location}"
-            )
-            
-            submitted = st.form_submit_button("💾 Salvar Comentário")
-            
-            if submitted and comment_text.strip():
-                if CommentsManager.save_comment(location, comment_text):
-                    st.success("Comentário salvo com sucesso!")
-                    st.rerun()
-                else:
-                    st.error("Erro ao salvar comentário.")
-        
-        # Display existing comments
-        comments = CommentsManager.load_comments(location)
-        
-        if comments:
-            st.subheader(f"📝 Comentários ({len(comments)})")
-            
-            for comment in comments:
-                with st.container():
-                    # Format timestamp
-                    if comment.created_at:
-                        try:
-                            dt = datetime.datetime.fromisoformat(comment.created_at.replace('Z', '+00:00'))
-                            formatted_time = dt.strftime("%d/%m/%Y %H:%M")
-                        except:
-                            formatted_time = "Data não disponível"
-                    else:
-                        formatted_time = "Data não disponível"
-                    
-                    # Format author display - prioritize author_name if available
-                    if comment.author_name:
-                        # Use the saved full name
-                        author_display = comment.author_name
-                        author_icon = "👤"
-                    elif comment.author and "@" in comment.author:
-                        # If it's an email, show just the name part
-                        author_display = comment.author.split("@")[0]
-                        author_icon = "👤"
-                    else:
-                        # If it's a session ID, show first 8 chars
-                        author_display = comment.author[:8] if comment.author else "Anônimo"
-                        author_icon = "🔹"
-                    
-                    # Comment header with profile picture
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        # Create a container for profile picture and author info
-                        if comment.author_picture and comment.author_picture.strip():
-                            # Use HTML for circular profile picture with professional styling
-                            st.markdown(f"""
-                            <div style="display: flex; align-items: center; margin-bottom: 8px;">
-                                <img src="{comment.author_picture}" 
-                                     style="width: 32px; height: 32px; border-radius: 50%; margin-right: 10px; 
-                                            object-fit: cover; border: 2px solid #e0e0e0; 
-                                            box-shadow: 0 2px 4px rgba(0,0,0,0.1);" 
-                                     alt="Profile picture"/>
-                                <div>
-                                    <span style="color: #333; font-weight: 500; font-size: 14px;">{author_display}</span>
-                                    <br/>
-                                    <span style="color: #666; font-size: 12px;">📅 {formatted_time}</span>
-                                </div>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        else:
-                            # Fallback to emoji when no picture
-                            st.caption(f"{author_icon} {author_display} • 📅 {formatted_time}")
-                            # Debug info (remove in production)
-                            if st.secrets.get("ENV") == "dev":
-                                st.caption(f"🔍 Debug: author_picture = '{comment.author_picture}'")
-                    
-                    # Delete button for own comments
-                    current_author = Analytics.get_user_identifier()
-                    if comment.author == current_author:
-                        with col2:
-                            if st.button("🗑️", key=f"delete_{comment.id}", help="Deletar comentário"):
-                                if CommentsManager.delete_comment(comment.id):
-                                    st.success("Comentário deletado!")
-                                    st.rerun()
-                                else:
-                                    st.error("Erro ao deletar comentário.")
-                    
-                    # Comment content
-                    st.write(comment.comment)
-                    st.divider()
-        else:
-            st.info("Nenhum comentário ainda. Seja o primeiro a comentar!")
\ No newline at end of file
+    def page_limit(state_key: str) -> int:
+        """Number of comments currently shown for a thread in this session"""
+        if state_key not in st.session_state:
+            st.session_state[state_key] = COMMENTS_PAGE_SIZE
+        return st.session_state[state_key]
+
+    @staticmethod
+    def render_load_more(state_key: str, has_more: bool):
+        """Render the "load more" control that extends the visible page"""
+        def _load_more():
+            st.session_state[state_key] = CommentsManager.page_limit(state_key) + COMMENTS_PAGE_SIZE
+
+        if has_more:
+            st.button("⬇️ Carregar mais comentários", key=f"{state_key}_more", on_click=_load_more)
+
+    @staticmethod
+    def sync_live_updates(locations: List[str]):
+        """Subscribe the session to the visible locations and notify pushed comments.
+
+        Called from the comments section fragment; the cache is already patched
+        by the stream, so the fragment only needs to render again.
+        """
+        session_id = Analytics.get_session_id()
+        stream = get_comment_stream()
+        stream.subscribe(session_id, locations)
+
+        current_author = Analytics.get_user_identifier()
+        for event in stream.drain(session_id):
+            if event.type == "INSERT" and event.record.get("author") != current_author:
+                author = event.record.get("author_name") or "Alguém"
+                st.toast(f"💬 {author} comentou em {event.location}")
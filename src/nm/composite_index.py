@@ -0,0 +1,227 @@
+import hashlib
+import json
+import threading
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.nm.city_table import AGGREGATE_ROWS, city_rows
+from src.nm.correlation_service import frame_version
+
+NORMALIZATION_METHODS = {
+    'minmax': 'Mínimo-máximo',
+    'zscore': 'Z-score',
+    'rank': 'Percentil',
+}
+
+# Z-scores são limitados a ±Z_CLIP desvios antes de ir para a escala 0-100
+Z_CLIP = 3.0
+
+# Fração mínima dos indicadores com valor para a cidade entrar no ranking
+MIN_COVERAGE = 0.5
+
+
+@dataclass(frozen=True)
+class IndicatorSpec:
+    """Indicador que compõe o índice.
+
+    `direction` é 1 quando valores maiores são melhores e -1 quando menores
+    são melhores; `dimension` agrupa os indicadores no detalhamento (por
+    padrão, o dataset de origem).
+    """
+    dataset: str
+    column: str
+    direction: int = 1
+    weight: float = 1.0
+    normalization: str = 'minmax'
+    label: str = ''
+    dimension: str = ''
+
+    @property
+    def name(self) -> str:
+        return self.label or self.column.replace('_', ' ').title()
+
+    @property
+    def group(self) -> str:
+        return self.dimension or self.dataset
+
+
+DEFAULT_SPECS: Tuple[IndicatorSpec, ...] = (
+    IndicatorSpec('economicos', 'pib_per_capita', 1, label='PIB per capita', dimension='Econômica'),
+    IndicatorSpec('economicos', 'taxa_informalidade', -1, label='Taxa de informalidade', dimension='Econômica'),
+    IndicatorSpec('sociais', 'idh', 1, label='IDH', dimension='Social'),
+    IndicatorSpec('sociais', 'evasao_escolar', -1, label='Evasão escolar', dimension='Social'),
+    IndicatorSpec('inovacao', 'investimento_inovacao_percentual', 1, label='Investimento em inovação',
+                  dimension='Inovação'),
+)
+
+
+def spec_hash(specs: Sequence[IndicatorSpec]) -> str:
+    """Hash estável de um conjunto de especificações"""
+    payload = json.dumps([asdict(spec) for spec in specs], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _resolve_column(facts: pd.DataFrame, spec: IndicatorSpec) -> Optional[str]:
+    """Coluna da tabela fato do indicador (colunas repetidas recebem o sufixo do dataset)"""
+    for candidate in (f"{spec.column}_{spec.dataset}", spec.column):
+        if candidate in facts.columns:
+            return candidate
+    return None
+
+
+def min_valid_indicators(n_indicators: int) -> int:
+    """Número mínimo de indicadores com valor para uma cidade ser ranqueada"""
+    return max(1, int(np.ceil(MIN_COVERAGE * n_indicators)))
+
+
+def rankable_components(components: pd.DataFrame) -> pd.DataFrame:
+    """Linhas (cidade × indicador) que podem ser ranqueadas: municípios, sem as
+    linhas agregadas, com pelo menos MIN_COVERAGE dos indicadores"""
+    cities = ~components.index.astype(str).str.strip().isin(AGGREGATE_ROWS)
+    covered = components.notna().sum(axis=1).to_numpy() >= min_valid_indicators(components.shape[1])
+    return components[cities & covered]
+
+
+def normalize_matrix(values: np.ndarray, methods: Sequence[str], directions: np.ndarray) -> np.ndarray:
+    """Normaliza cada coluna para 0-100 (100 = melhor), todas de uma vez por método"""
+    scores = np.full(values.shape, np.nan)
+    methods = np.asarray(methods)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for method in np.unique(methods):
+            cols = np.flatnonzero(methods == method)
+            block = values[:, cols]
+            if method == 'zscore':
+                z = (block - np.nanmean(block, axis=0)) / np.nanstd(block, axis=0, ddof=1)
+                scaled = (np.clip(z, -Z_CLIP, Z_CLIP) + Z_CLIP) / (2 * Z_CLIP)
+            elif method == 'rank':
+                scaled = pd.DataFrame(block).rank(pct=True).to_numpy()
+            else:
+                low, high = np.nanmin(block, axis=0), np.nanmax(block, axis=0)
+                scaled = (block - low) / (high - low)
+            # Coluna constante: todas as cidades no meio da escala
+            scaled = np.where(np.isnan(scaled) & ~np.isnan(block), 0.5, scaled)
+            scores[:, cols] = scaled
+
+    scores = np.where(directions > 0, scores, 1 - scores)
+    return scores * 100
+
+
+def weighted_scores(scores: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Média ponderada por cidade ignorando indicadores ausentes.
+
+    `weights` pode ser um vetor (indicadores,) ou uma matriz (esquemas,
+    indicadores); no segundo caso o resultado é (esquemas, cidades), calculado
+    com dois produtos de matrizes.
+    """
+    valid = ~np.isnan(scores)
+    matrix = np.atleast_2d(weights)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = (matrix @ np.where(valid, scores, 0).T) / (matrix @ valid.T)
+    return result[0] if np.ndim(weights) == 1 else result
+
+
+@dataclass(frozen=True)
+class CompositeIndex:
+    """Resultado do índice: notas normalizadas por indicador, índice e detalhamento por dimensão"""
+    specs: Tuple[IndicatorSpec, ...]
+    cities: Tuple[str, ...]
+    components: pd.DataFrame  # cidade × indicador (0-100)
+    breakdown: pd.DataFrame   # cidade × dimensão (0-100)
+    ranking: pd.DataFrame     # cidade, indice_composto, indicadores_validos, posicao
+
+    @property
+    def ranked_components(self) -> pd.DataFrame:
+        """Notas por indicador só das cidades do ranking (na ordem do ranking)"""
+        return self.components.loc[self.ranking[self.components.index.name]]
+
+    def score_schemes(self, weights: np.ndarray) -> np.ndarray:
+        """Índice de cada cidade para vários vetores de pesos (esquemas × cidades)"""
+        return weighted_scores(self.components.to_numpy(), np.atleast_2d(weights))
+
+
+def compute_composite_index(facts: pd.DataFrame, specs: Sequence[IndicatorSpec] = DEFAULT_SPECS,
+                            city_column: str = 'cidade') -> Optional[CompositeIndex]:
+    """Calcula o índice para todas as cidades da tabela fato em uma operação matricial
+
+    As linhas agregadas (total do polo, outros municípios) são descartadas
+    antes da normalização; só entram no ranking as cidades com pelo menos
+    MIN_COVERAGE dos indicadores.
+    """
+    facts = facts[city_rows(facts, city_column)]
+    resolved = [(spec, _resolve_column(facts, spec)) for spec in specs]
+    resolved = [(spec, column) for spec, column in resolved if column is not None and spec.weight > 0]
+    if not resolved:
+        return None
+    specs = tuple(spec for spec, _ in resolved)
+    columns = [column for _, column in resolved]
+
+    values = facts[columns].to_numpy(dtype=float)
+    directions = np.array([1 if spec.direction >= 0 else -1 for spec in specs])
+    weights = np.array([spec.weight for spec in specs], dtype=float)
+    scores = normalize_matrix(values, [spec.normalization for spec in specs], directions)
+
+    cities = facts[city_column].astype(str).to_numpy()
+    components = pd.DataFrame(scores, index=pd.Index(cities, name=city_column), columns=[spec.name for spec in specs])
+
+    # Detalhamento: média ponderada dos indicadores de cada dimensão
+    groups = pd.Index([spec.group for spec in specs]).unique()
+    membership = np.array([[spec.group == group for spec in specs] for group in groups], dtype=float)
+    breakdown = pd.DataFrame(weighted_scores(scores, membership * weights).T,
+                             index=components.index, columns=list(groups))
+
+    valid = (~np.isnan(scores)).sum(axis=1)
+    ranking = pd.DataFrame({
+        city_column: cities,
+        'indice_composto': weighted_scores(scores, weights),
+        'indicadores_validos': valid
+    })
+    ranking = ranking[ranking['indicadores_validos'] >= min_valid_indicators(len(specs))]
+    ranking = ranking.sort_values('indice_composto', ascending=False, kind='stable').reset_index(drop=True)
+    ranking['posicao'] = np.arange(1, len(ranking) + 1)
+
+    return CompositeIndex(
+        specs=specs,
+        cities=tuple(cities),
+        components=components,
+        breakdown=breakdown,
+        ranking=ranking,
+    )
+
+
+class CompositeIndexEngine:
+    """Mantém os índices calculados por (versão da tabela fato, hash das especificações)"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._results: Dict[Tuple[str, str], Optional[CompositeIndex]] = {}
+        self._lock = threading.Lock()
+
+    def get_index(self, facts: pd.DataFrame, specs: Sequence[IndicatorSpec] = DEFAULT_SPECS,
+                  version: Optional[str] = None) -> Optional[CompositeIndex]:
+        specs = tuple(specs)
+        key = (version or frame_version(facts), spec_hash(specs))
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+
+        started = datetime.now()
+        result = compute_composite_index(facts, specs)
+        print(f"{datetime.now().isoformat()} - Índice composto calculado para {len(facts)} cidades e "
+              f"{len(specs)} indicadores em {(datetime.now() - started).total_seconds():.2f}s")
+
+        with self._lock:
+            self._results[key] = result
+            while len(self._results) > self.max_entries:
+                self._results.pop(next(iter(self._results)))
+        return result
+
+
+@st.cache_resource(show_spinner=False)
+def get_composite_index_engine() -> CompositeIndexEngine:
+    """Retorna o motor de índices compartilhado por todas as sessões do processo"""
+    return CompositeIndexEngine()
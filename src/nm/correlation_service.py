@@ -0,0 +1,140 @@
+import hashlib
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy import stats
+
+CORRELATION_METHODS = ('pearson', 'spearman', 'kendall')
+
+
+def frame_version(df: pd.DataFrame) -> str:
+    """Hash do conteúdo da tabela (as tabelas do registro não mudam dentro de uma versão)"""
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update('|'.join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+
+def _p_values(corr: np.ndarray, counts: np.ndarray, method: str) -> np.ndarray:
+    """P-valores bilaterais de H0: correlação nula, para cada par de variáveis.
+
+    Pearson e Spearman usam a estatística t com n - 2 graus de liberdade;
+    Kendall usa a aproximação normal de tau.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if method == 'kendall':
+            z = 3 * corr * np.sqrt(counts * (counts - 1)) / np.sqrt(2 * (2 * counts + 5))
+            p = 2 * stats.norm.sf(np.abs(z))
+        else:
+            dof = counts - 2
+            t = corr * np.sqrt(dof / np.clip(1 - corr ** 2, 1e-300, None))
+            p = 2 * stats.t.sf(np.abs(t), np.where(dof > 0, dof, np.nan))
+    return np.where(counts > 2, p, np.nan)
+
+
+@dataclass(frozen=True)
+class CorrelationResult:
+    """Matriz completa de correlações de uma versão da tabela e um método.
+
+    `pairs` é o índice de pares (var1, var2, correlation, strength, p_value, n)
+    em ordem decrescente de força, usado para filtrar por correlação mínima
+    sem recalcular nada.
+    """
+    version: str
+    method: str
+    matrix: pd.DataFrame
+    p_values: pd.DataFrame
+    counts: pd.DataFrame
+    pairs: pd.DataFrame
+
+    def subset(self, variables: Sequence[str]) -> pd.DataFrame:
+        """Matriz das variáveis selecionadas (na ordem recebida)"""
+        variables = [var for var in variables if var in self.matrix.index]
+        return self.matrix.loc[variables, variables]
+
+    def strong_pairs(self, min_correlation: float = 0.0,
+                     variables: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Pares com |correlação| >= min_correlation, do mais forte ao mais fraco"""
+        # `strength` está em ordem decrescente: o corte é uma busca binária
+        cut = np.searchsorted(-self.pairs['strength'].to_numpy(), -min_correlation, side='right')
+        pairs = self.pairs.iloc[:cut]
+        if variables is not None:
+            selected = set(variables)
+            pairs = pairs[pairs['var1'].isin(selected) & pairs['var2'].isin(selected)]
+        return pairs
+
+
+def compute_correlations(df: pd.DataFrame, method: str = 'pearson', version: str = '') -> CorrelationResult:
+    """Correlações de todos os pares de colunas, com p-valores e índice de pares fortes"""
+    matrix = df.corr(method=method)
+    valid = df.notna().to_numpy(dtype=float)
+    counts = valid.T @ valid                                        # observações completas por par
+
+    values = matrix.to_numpy()
+    p_values = _p_values(values, counts, method)
+
+    upper_i, upper_j = np.triu_indices(len(matrix.columns), k=1)
+    columns = matrix.columns.to_numpy()
+    correlation = values[upper_i, upper_j]
+    pairs = pd.DataFrame({
+        'var1': columns[upper_i],
+        'var2': columns[upper_j],
+        'correlation': correlation,
+        'strength': np.abs(correlation),
+        'p_value': p_values[upper_i, upper_j],
+        'n': counts[upper_i, upper_j].astype(int),
+    })
+    pairs = pairs.dropna(subset=['correlation'])
+    pairs = pairs.sort_values('strength', ascending=False, kind='stable').reset_index(drop=True)
+
+    return CorrelationResult(
+        version=version,
+        method=method,
+        matrix=matrix,
+        p_values=pd.DataFrame(p_values, index=matrix.index, columns=matrix.columns),
+        counts=pd.DataFrame(counts.astype(int), index=matrix.index, columns=matrix.columns),
+        pairs=pairs,
+    )
+
+
+class CorrelationService:
+    """Mantém as matrizes de correlação por (versão da tabela, método).
+
+    Cada matriz cobre todas as colunas numéricas da tabela e é calculada uma
+    única vez; as páginas apenas recortam as variáveis selecionadas e filtram
+    o índice de pares.
+    """
+
+    def __init__(self, max_entries: int = 12):
+        self.max_entries = max_entries
+        self._results: Dict[Tuple[str, str, Tuple[str, ...]], CorrelationResult] = {}
+        self._lock = threading.Lock()
+
+    def get_correlations(self, df: pd.DataFrame, columns: Sequence[str], method: str = 'pearson',
+                         version: Optional[str] = None) -> CorrelationResult:
+        columns = tuple(col for col in columns if col in df.columns)
+        version = version or frame_version(df[list(columns)])
+        key = (version, method, columns)
+
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                started = datetime.now()
+                result = compute_correlations(df[list(columns)], method, version)
+                print(f"{datetime.now().isoformat()} - Correlações ({method}) calculadas para {len(columns)} "
+                      f"variáveis em {(datetime.now() - started).total_seconds():.2f}s")
+
+                self._results[key] = result
+                while len(self._results) > self.max_entries:
+                    self._results.pop(next(iter(self._results)))
+            return result
+
+
+@st.cache_resource(show_spinner=False)
+def get_correlation_service() -> CorrelationService:
+    """Retorna o serviço de correlações compartilhado por todas as sessões do processo"""
+    return CorrelationService()
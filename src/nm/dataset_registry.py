@@ -0,0 +1,412 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Mapping, Tuple, Iterable
+
+import pandas as pd
+import streamlit as st
+
+from src.nm.city_table import CITY_TABLE_KEYS, CITY_FACTS_SCHEMA, build_city_facts
+from src.nm.columnar_cache import ColumnarCache
+from src.nm.ontology_store import parse_ontology
+from src.nm.risk_register import parse_risk_register
+from src.nm.time_series import build_time_series_store
+
+
+@dataclass(frozen=True)
+class DatasetSource:
+    """Descreve um arquivo de dados carregado pelo registro"""
+    key: str
+    path: str
+    kind: str  # 'csv', 'json' ou 'text'
+    encoding: str = 'utf-8'
+    optional: bool = False  # Ausência do arquivo não é um erro
+
+
+DATASET_SOURCES: Tuple[DatasetSource, ...] = (
+    DatasetSource('economicos', 'static/datasets/indicadores_economicos.csv', 'csv'),
+    DatasetSource('sociais', 'static/datasets/indicadores_sociais.csv', 'csv'),
+    DatasetSource('ambientais', 'static/datasets/indicadores_ambientais.csv', 'csv'),
+    DatasetSource('inovacao', 'static/datasets/indicadores_inovacao.csv', 'csv'),
+    DatasetSource('historico', 'static/datasets/indicadores_historicos.csv', 'csv', optional=True),
+    DatasetSource('ontologia', 'static/datasets/ontologia_ecossistema_textil_ptbr.json', 'json'),
+    DatasetSource('riscos', 'static/datasets/riscos_cadeia_valor.json', 'json'),
+    DatasetSource('methodology', 'static/methodology/aim/board_aim_framework-fluid-version.html', 'text'),
+    DatasetSource('controls', 'static/js/controls.js', 'text'),
+)
+
+
+@dataclass(frozen=True)
+class DatasetSnapshot:
+    """Versão imutável do conjunto de dados compartilhado entre sessões.
+
+    `data` é uma visão somente leitura; as páginas devem copiar os DataFrames
+    (`df.copy()`) antes de alterá-los. Além dos arquivos registrados, contém a
+    a tabela fato `cidades` (merge dos indicadores por cidade com colunas
+    derivadas `_norm`/`_z`), `cidades_stats` (min/max/média/desvio) e
+    `ontologia_store` (a ontologia normalizada em um OntologyStore),
+    `series` (as séries anuais por cidade e indicador em um TimeSeriesStore) e
+    `riscos_store` (o registro de riscos em um RiskRegister).
+    """
+    version: int
+    data: Mapping[str, Any]
+    fingerprints: Mapping[str, str]
+    errors: Mapping[str, str]
+    loaded_at: datetime
+
+
+class DatasetRegistry:
+    """Registro de datasets carregado uma única vez por processo"""
+
+    def __init__(self, sources: Iterable[DatasetSource] = DATASET_SOURCES,
+                 columnar_cache: Optional[ColumnarCache] = None):
+        self._sources: Dict[str, DatasetSource] = {source.key: source for source in sources}
+        self._columnar = columnar_cache or ColumnarCache()
+        self._lock = threading.Lock()
+        self._snapshot: Optional[DatasetSnapshot] = None
+        self._stats: Dict[str, Optional[Tuple[int, int]]] = {}
+        self.watcher: Optional["DatasetWatcher"] = None
+
+    @property
+    def sources(self) -> Mapping[str, DatasetSource]:
+        return MappingProxyType(self._sources)
+
+    @property
+    def version(self) -> int:
+        """Versão atual dos dados (0 se ainda não carregados)"""
+        snapshot = self._snapshot
+        return snapshot.version if snapshot else 0
+
+    def watch(self, interval: float = 5.0) -> "DatasetWatcher":
+        """Inicia o monitoramento dos arquivos em segundo plano (um único watcher por registro)"""
+        with self._lock:
+            if self.watcher is None:
+                self.watcher = DatasetWatcher(self, interval)
+        self.watcher.start()
+        return self.watcher
+
+    def snapshot(self) -> DatasetSnapshot:
+        """Retorna a versão atual, carregando os dados na primeira chamada"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._build_snapshot(version=1)
+                snapshot = self._snapshot
+        return snapshot
+
+    def reload(self) -> DatasetSnapshot:
+        """Recarrega todos os arquivos e publica uma nova versão"""
+        with self._lock:
+            self._snapshot = self._build_snapshot(version=self.version + 1)
+            return self._snapshot
+
+    def refresh_changed(self) -> Optional[DatasetSnapshot]:
+        """Relê apenas os arquivos alterados em disco e publica uma nova versão.
+
+        A alteração é detectada pelo mtime/tamanho e confirmada pelo hash do
+        conteúdo. Retorna a nova versão ou None se nada mudou.
+        """
+        self.snapshot()
+
+        with self._lock:
+            base = self._snapshot
+            changed = []
+
+            for key, source in self._sources.items():
+                stat = self._stat(source.path)
+                if stat == self._stats.get(key):
+                    continue
+                self._stats[key] = stat
+
+                raw, error = self._read_raw(source)
+                fingerprint = hashlib.sha256(raw).hexdigest() if raw is not None else None
+                if error is None and fingerprint == base.fingerprints.get(key):
+                    continue  # Apenas o mtime mudou
+                changed.append((source, raw, fingerprint, error))
+
+            if not changed:
+                return None
+
+            data = dict(base.data)
+            fingerprints = dict(base.fingerprints)
+            errors = dict(base.errors)
+
+            for source, raw, fingerprint, error in changed:
+                value = None
+                if error is None and raw is not None:
+                    value, error = self._parse(source, raw, fingerprint)
+                errors.pop(source.key, None)
+
+                if value is None and source.key in data and error is not None:
+                    # Mantém a versão anterior se o novo arquivo não puder ser lido
+                    errors[source.key] = error
+                    continue
+
+                self._apply(source, value, fingerprint, error, data, fingerprints, errors)
+
+            if any(source.key in CITY_TABLE_KEYS for source, _, _, _ in changed):
+                self._derive_city_table(data, fingerprints)
+            if any(source.key == 'ontologia' for source, _, _, _ in changed):
+                self._derive_ontology_store(data, fingerprints)
+            if any(source.key in CITY_TABLE_KEYS + ('historico',) for source, _, _, _ in changed):
+                self._derive_time_series(data, fingerprints)
+            if any(source.key == 'riscos' for source, _, _, _ in changed):
+                self._derive_risk_register(data, fingerprints)
+
+            # Troca atômica: renderizações em andamento mantêm a versão anterior
+            self._snapshot = DatasetSnapshot(
+                version=base.version + 1,
+                data=MappingProxyType(data),
+                fingerprints=MappingProxyType(fingerprints),
+                errors=MappingProxyType(errors),
+                loaded_at=datetime.now()
+            )
+            return self._snapshot
+
+    def _build_snapshot(self, version: int) -> DatasetSnapshot:
+        """Carrega todos os arquivos registrados em uma nova versão"""
+        data: Dict[str, Any] = {}
+        fingerprints: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+
+        for key, source in self._sources.items():
+            self._stats[key] = self._stat(source.path)
+            raw, error = self._read_raw(source)
+            fingerprint = hashlib.sha256(raw).hexdigest() if raw is not None else None
+            value = None
+            if error is None and raw is not None:
+                value, error = self._parse(source, raw, fingerprint)
+            self._apply(source, value, fingerprint, error, data, fingerprints, errors)
+
+        self._derive_city_table(data, fingerprints)
+        self._derive_ontology_store(data, fingerprints)
+        self._derive_time_series(data, fingerprints)
+        self._derive_risk_register(data, fingerprints)
+
+        return DatasetSnapshot(
+            version=version,
+            data=MappingProxyType(data),
+            fingerprints=MappingProxyType(fingerprints),
+            errors=MappingProxyType(errors),
+            loaded_at=datetime.now()
+        )
+
+    def _apply(self, source: DatasetSource, value: Any, fingerprint: Optional[str], error: Optional[str],
+               data: Dict[str, Any], fingerprints: Dict[str, str], errors: Dict[str, str]) -> None:
+        """Registra o resultado da leitura de um arquivo nos dicionários da versão"""
+        key = source.key
+        if error:
+            errors[key] = error
+        if fingerprint:
+            fingerprints[key] = fingerprint
+        else:
+            fingerprints.pop(key, None)
+
+        if value is None and source.kind == 'csv':
+            value = self.create_dummy_data(key)
+        if value is not None or source.kind == 'text':
+            data[key] = value
+        else:
+            data.pop(key, None)
+
+    @staticmethod
+    def _stat(path: str) -> Optional[Tuple[int, int]]:
+        """Retorna (mtime em ns, tamanho) do arquivo ou None se não existir"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _read_raw(source: DatasetSource) -> Tuple[Optional[bytes], Optional[str]]:
+        """Lê o conteúdo bruto de um arquivo"""
+        try:
+            with open(source.path, 'rb') as f:
+                return f.read(), None
+        except FileNotFoundError:
+            return None, None if source.optional else f"Arquivo {source.path} não encontrado"
+        except Exception as e:
+            return None, f"Erro ao carregar {source.path}: {str(e)}"
+
+    def _parse(self, source: DatasetSource, raw: bytes, fingerprint: Optional[str]) -> Tuple[Any, Optional[str]]:
+        """Interpreta o conteúdo de um arquivo conforme seu tipo"""
+        try:
+            if source.kind == 'csv':
+                df = self._columnar.load(source.key, fingerprint)
+                if df is None:
+                    df = pd.read_csv(io.BytesIO(raw), encoding=source.encoding)
+                    self._columnar.store(source.key, df, fingerprint)
+                return df, None
+            elif source.kind == 'json':
+                return json.loads(raw.decode(source.encoding)), None
+            else:
+                return raw.decode(source.encoding), None
+        except Exception as e:
+            return None, f"Erro ao carregar {source.path}: {str(e)}"
+
+    def _derive_city_table(self, data: Dict[str, Any], fingerprints: Mapping[str, str]) -> None:
+        """Monta (ou lê do cache colunar) a tabela fato de cidades e suas estatísticas"""
+        parts = '|'.join(fingerprints.get(key, 'dummy') for key in CITY_TABLE_KEYS)
+        fingerprint = hashlib.sha256(f"{CITY_FACTS_SCHEMA}|{parts}".encode()).hexdigest()
+
+        facts = self._columnar.load('cidades', fingerprint)
+        stats = self._columnar.load('cidades_stats', fingerprint)
+        if facts is None or stats is None:
+            facts, stats = build_city_facts(data)
+            if facts is not None:
+                self._columnar.store('cidades', facts, fingerprint)
+                self._columnar.store('cidades_stats', stats, fingerprint)
+
+        if facts is not None:
+            data['cidades'] = facts
+            data['cidades_stats'] = stats
+        else:
+            data.pop('cidades', None)
+            data.pop('cidades_stats', None)
+
+    @staticmethod
+    def _derive_ontology_store(data: Dict[str, Any], fingerprints: Mapping[str, str]) -> None:
+        """Normaliza a ontologia uma única vez por versão dos dados"""
+        store = None
+        if data.get('ontologia'):
+            try:
+                store = parse_ontology(data['ontologia'], version=fingerprints.get('ontologia', ''))
+            except Exception as e:
+                print(f"{datetime.now().isoformat()} - Erro ao normalizar a ontologia: {str(e)}")
+
+        if store is not None:
+            data['ontologia_store'] = store
+        else:
+            data.pop('ontologia_store', None)
+
+    @staticmethod
+    def _derive_time_series(data: Dict[str, Any], fingerprints: Mapping[str, str]) -> None:
+        """Monta o store de séries temporais (histórico registrado + valores atuais)"""
+        parts = '|'.join(fingerprints.get(key, 'dummy') for key in CITY_TABLE_KEYS + ('historico',))
+        try:
+            data['series'] = build_time_series_store(data, version=hashlib.sha256(parts.encode()).hexdigest())
+        except Exception as e:
+            print(f"{datetime.now().isoformat()} - Erro ao montar as séries temporais: {str(e)}")
+            data.pop('series', None)
+
+    @staticmethod
+    def _derive_risk_register(data: Dict[str, Any], fingerprints: Mapping[str, str]) -> None:
+        """Monta o registro de riscos tipado uma única vez por versão do arquivo"""
+        register = None
+        if data.get('riscos'):
+            try:
+                register = parse_risk_register(data['riscos'], version=fingerprints.get('riscos', ''))
+            except Exception as e:
+                print(f"{datetime.now().isoformat()} - Erro ao montar o registro de riscos: {str(e)}")
+
+        if register is not None:
+            data['riscos_store'] = register
+        else:
+            data.pop('riscos_store', None)
+
+    @staticmethod
+    def create_dummy_data(data_type: str) -> pd.DataFrame:
+        """Cria dados simulados quando arquivos não estão disponíveis"""
+        cities = ['Santa Cruz do Capibaribe', 'Caruaru', 'Toritama']
+
+        if data_type == 'economicos':
+            return pd.DataFrame({
+                'cidade': cities,
+                'populacao': [107500, 365000, 44000],
+                'empresas_formais': [1200, 2500, 450],
+                'empresas_informais': [4800, 7500, 1550],
+                'taxa_informalidade': [39.8, 23.9, 57.3],
+                'empregos_diretos': [45000, 85000, 25000],
+                'faturamento_anual_milhoes': [1800, 2200, 1600],
+                'exportacao_percentual': [5, 8, 3],
+                'pib_per_capita': [12500, 18700, 14300]
+            })
+
+        elif data_type == 'sociais':
+            return pd.DataFrame({
+                'cidade': cities,
+                'idh': [0.648, 0.677, 0.618],
+                'taxa_pobreza': [28.5, 22.1, 35.2],
+                'taxa_extrema_pobreza': [12.3, 8.7, 15.8],
+                'evasao_escolar': [32.5, 24.8, 38.7],
+                'trabalho_infantil': [18.7, 12.5, 24.3],
+                'acesso_internet': [65.3, 72.8, 58.7],
+                'mulheres_empreendedoras': [58.2, 52.4, 62.5],
+                'jovens_empreendedores': [42.5, 38.2, 48.7]
+            })
+
+        elif data_type == 'ambientais':
+            return pd.DataFrame({
+                'cidade': cities,
+                'consumo_agua_m3_dia': [3200, 4500, 2800],
+                'efluentes_tratados_percentual': [35.2, 58.7, 22.5],
+                'residuos_solidos_ton_mes': [450, 780, 320],
+                'energia_renovavel_percentual': [15.3, 22.1, 8.7],
+                'reuso_agua_percentual': [12.5, 18.3, 8.2],
+                'poluicao_rios_indice': [7.8, 6.2, 8.9],
+                'lavanderias_quantidade': [25, 35, 70],
+                'lavanderias_licenciadas_percentual': [45.2, 62.8, 28.6]
+            })
+
+        elif data_type == 'inovacao':
+            return pd.DataFrame({
+                'cidade': cities,
+                'investimento_inovacao_percentual': [2.8, 4.2, 1.5],
+                'empresas_com_ecommerce': [18.5, 27.3, 12.4],
+                'adocao_tecnologias_digitais': [35.2, 48.6, 28.7],
+                'marcas_proprias_percentual': [22.4, 35.8, 18.2],
+                'design_proprio_percentual': [15.7, 28.4, 12.1],
+                'capacitacao_digital_percentual': [28.5, 42.1, 19.3],
+                'acesso_credito_inovacao': [6.2, 8.7, 4.1],
+                'startups_relacionadas': [8, 28, 3]
+            })
+
+        return pd.DataFrame()
+
+
+class DatasetWatcher:
+    """Monitora os arquivos do registro em segundo plano e publica as alterações"""
+
+    def __init__(self, registry: DatasetRegistry, interval: float = 5.0):
+        self.registry = registry
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="dataset-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                snapshot = self.registry.refresh_changed()
+                if snapshot:
+                    print(f"{datetime.now().isoformat()} - Dados atualizados para a versão {snapshot.version}")
+            except Exception as e:
+                # O monitoramento não deve derrubar o processo
+                print(f"{datetime.now().isoformat()} - Erro ao monitorar datasets: {str(e)}")
+
+
+@st.cache_resource(show_spinner=False)
+def get_dataset_registry() -> DatasetRegistry:
+    """Retorna o registro de datasets compartilhado por todas as sessões do processo"""
+    registry = DatasetRegistry()
+    registry.snapshot()
+    registry.watch()
+    return registry
@@ -0,0 +1,313 @@
+import threading
+import warnings
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import combinations
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy import stats
+
+from src.nm.time_series import TimeSeriesStore
+
+FORECAST_MODELS = {
+    'auto': 'Automático (menor AIC)',
+    'linear': 'Linear',
+    'exponential': 'Exponencial',
+    'holt': 'Holt (nível e tendência)',
+    'robust': 'Robusto (Theil-Sen)',
+}
+
+# Número de parâmetros de cada modelo (para o AIC) e mínimo de observações
+MODEL_PARAMETERS = {'linear': 2, 'exponential': 2, 'holt': 4, 'robust': 2}
+MIN_OBSERVATIONS = {'linear': 3, 'exponential': 3, 'holt': 4, 'robust': 3}
+
+# Grade de suavização testada no Holt (nível e tendência), avaliada em lote
+HOLT_ALPHAS = np.linspace(0.1, 0.9, 9)
+HOLT_BETAS = np.linspace(0.05, 0.5, 10)
+
+
+def _series_grid(store: TimeSeriesStore) -> Tuple[pd.MultiIndex, np.ndarray, np.ndarray]:
+    """Matriz (séries × anos) com NaN nos anos sem observação"""
+    data = store.data
+    pairs = pd.MultiIndex.from_arrays([data['indicador'].astype(str), data['cidade'].astype(str)],
+                                      names=['indicador', 'cidade'])
+    codes, keys = pd.factorize(pairs)
+    if len(data) == 0:
+        return keys, np.empty(0, dtype=int), np.empty((0, 0))
+    years = np.arange(data['ano'].min(), data['ano'].max() + 1)
+    grid = np.full((len(keys), len(years)), np.nan)
+    grid[codes, data['ano'].to_numpy() - years[0]] = data['valor'].to_numpy()
+    return pd.MultiIndex.from_tuples(keys, names=['indicador', 'cidade']), years, grid
+
+
+def _least_squares(t: np.ndarray, y: np.ndarray) -> Dict[str, np.ndarray]:
+    """Regressão y = a + b·t de todas as séries ao mesmo tempo (NaN = ausente)"""
+    mask = ~np.isnan(y)
+    n = mask.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_mean = np.where(mask, t, 0).sum(axis=1) / n
+        y_mean = np.nansum(y, axis=1) / n
+        dt = np.where(mask, t - t_mean[:, None], 0)
+        s_tt = (dt ** 2).sum(axis=1)
+        b = (dt * np.nan_to_num(y - y_mean[:, None])).sum(axis=1) / s_tt
+        a = y_mean - b * t_mean
+        residuals = y - a[:, None] - b[:, None] * t
+        sse = np.nansum(residuals ** 2, axis=1)
+        sigma = np.sqrt(sse / (n - 2))
+    return {'a': a, 'b': b, 'sigma': sigma, 'n': n, 't_mean': t_mean, 's_tt': s_tt, 'sse': sse}
+
+
+def _theil_sen(t: np.ndarray, y: np.ndarray) -> Dict[str, np.ndarray]:
+    """Inclinação mediana dos pares de pontos (Theil-Sen), em lote"""
+    pairs = np.array(list(combinations(range(len(t)), 2)), dtype=int).reshape(-1, 2)
+    base = _least_squares(t, y)
+    if len(pairs) == 0:
+        return base
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # séries sem pares válidos
+        slopes = (y[:, pairs[:, 1]] - y[:, pairs[:, 0]]) / (t[pairs[:, 1]] - t[pairs[:, 0]])
+        b = np.nanmedian(slopes, axis=1)
+        a = np.nanmedian(y - b[:, None] * t, axis=1)
+        residuals = y - a[:, None] - b[:, None] * t
+        # Desvio robusto (MAD) no lugar do desvio padrão dos resíduos
+        sigma = 1.4826 * np.nanmedian(np.abs(residuals), axis=1)
+    return {**base, 'a': a, 'b': b, 'sigma': sigma, 'sse': np.nansum(residuals ** 2, axis=1)}
+
+
+def _holt(y: np.ndarray) -> Dict[str, np.ndarray]:
+    """Holt com tendência aditiva para todas as séries e toda a grade (α, β) de uma vez.
+
+    Anos ausentes não atualizam o estado; cada série fica com o par (α, β)
+    de menor erro quadrático de um passo.
+    """
+    alphas, betas = np.meshgrid(HOLT_ALPHAS, HOLT_BETAS, indexing='ij')
+    alpha = alphas.ravel()[:, None]                               # (combinações, 1)
+    beta = betas.ravel()[:, None]
+    shape = (alpha.shape[0], y.shape[0])
+
+    level = np.full(shape, np.nan)
+    trend = np.full(shape, np.nan)
+    sse = np.zeros(shape)
+    steps = np.zeros(y.shape[0], dtype=int)
+    gap = np.ones(y.shape[0])                                     # anos desde a última observação
+    for column in y.T:
+        observed = ~np.isnan(column)
+        ready = observed & ~np.isnan(trend[0])
+        second = observed & np.isnan(trend[0]) & ~np.isnan(level[0])
+        first = observed & np.isnan(level[0])
+
+        forecast = level + gap * trend
+        error = column - forecast
+        new_level = alpha * column + (1 - alpha) * forecast
+        new_trend = beta * (new_level - level) / gap + (1 - beta) * trend
+        sse = np.where(ready, sse + error ** 2, sse)
+        steps += ready
+        level, trend = np.where(ready, new_level, level), np.where(ready, new_trend, trend)
+
+        # Inicialização: nível = primeira observação, tendência = primeira diferença anual
+        trend = np.where(second, (column - level) / gap, trend)
+        level = np.where(second | first, column, level)
+        gap = np.where(observed, 1.0, gap + 1)
+
+    best = np.argmin(np.where(steps > 0, sse, np.inf), axis=0)
+    columns = np.arange(y.shape[0])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sigma = np.sqrt(sse[best, columns] / steps)
+    return {
+        'level': level[best, columns],
+        'trend': trend[best, columns],
+        'alpha': alpha[best, 0],
+        'beta': beta[best, 0],
+        'sigma': sigma,
+        'sse': sse[best, columns],
+        'n': (~np.isnan(y)).sum(axis=1),
+    }
+
+
+def _aic(sse: np.ndarray, n: np.ndarray, k: int) -> np.ndarray:
+    with np.errstate(invalid='ignore', divide='ignore'):
+        aic = n * np.log(sse / n) + 2 * k
+    return np.where(n > k, aic, np.nan)
+
+
+@dataclass(frozen=True)
+class ForecastFits:
+    """Parâmetros ajustados de todos os modelos para todas as séries (indicador, cidade)"""
+    version: str
+    keys: pd.MultiIndex
+    last_year: np.ndarray
+    last_value: np.ndarray
+    params: Dict[str, Dict[str, np.ndarray]]
+    aic: pd.DataFrame
+    best: np.ndarray
+
+    def position(self, city: str, indicator: str) -> Optional[int]:
+        try:
+            return int(self.keys.get_loc((indicator, city)))
+        except KeyError:
+            return None
+
+    def model_for(self, city: str, indicator: str, model: str = 'auto') -> Optional[str]:
+        """Modelo efetivamente usado (None se a série não tem observações suficientes)"""
+        row = self.position(city, indicator)
+        if row is None:
+            return None
+        if model == 'auto':
+            return self.best[row] or None
+        return model if np.isfinite(self.params[model]['sigma'][row]) else None
+
+    def predict(self, model: str, rows: np.ndarray, horizon: int, confidence: float = 0.95
+                ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Previsões (anos, média, limite inferior, superior) com forma (séries, horizonte)"""
+        params = {name: values[rows] for name, values in self.params[model].items()}
+        steps = np.arange(1, horizon + 1)
+        years = self.last_year[rows][:, None] + steps
+        q_normal = stats.norm.ppf(0.5 + confidence / 2)
+
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            if model == 'holt':
+                mean = params['level'][:, None] + steps * params['trend'][:, None]
+                # Variância h passos à frente: σ²·[1 + Σ_{j<h} α²(1 + jβ)²]
+                j = np.arange(horizon)
+                weights = (params['alpha'][:, None] * (1 + j * params['beta'][:, None])) ** 2
+                weights[:, 0] = 1.0
+                half = q_normal * params['sigma'][:, None] * np.sqrt(np.cumsum(weights, axis=1))
+                return years, mean, mean - half, mean + half
+
+            t = years - self.params['linear']['t_ref'][rows][:, None]
+            mean = params['a'][:, None] + params['b'][:, None] * t
+            n = params['n'][:, None]
+            se = params['sigma'][:, None] * np.sqrt(
+                1 + 1 / n + (t - params['t_mean'][:, None]) ** 2 / params['s_tt'][:, None])
+            half = stats.t.ppf(0.5 + confidence / 2, np.maximum(n - 2, 1)) * se
+            if model == 'exponential':
+                return years, np.exp(mean), np.exp(mean - half), np.exp(mean + half)
+            return years, mean, mean - half, mean + half
+
+    def forecast(self, city: str, indicator: str, horizon: int, model: str = 'auto',
+                 confidence: float = 0.95) -> Optional[pd.DataFrame]:
+        """Previsão de uma série: year, value, lower, upper (a primeira linha é o último valor observado)"""
+        row = self.position(city, indicator)
+        model = self.model_for(city, indicator, model)
+        if row is None or model is None:
+            return None
+        years, mean, lower, upper = (values[0] for values in self.predict(model, np.array([row]), horizon, confidence))
+        anchor = self.last_value[row]
+        return pd.DataFrame({
+            'year': np.concatenate([[self.last_year[row]], years]).astype(int),
+            'value': np.concatenate([[anchor], mean]),
+            'lower': np.concatenate([[anchor], lower]),
+            'upper': np.concatenate([[anchor], upper]),
+        })
+
+    def forecast_frame(self, horizon: int, model: str = 'auto', confidence: float = 0.95,
+                       indicator: Optional[str] = None) -> pd.DataFrame:
+        """Previsões de todas as séries (ou de um indicador) em formato longo"""
+        rows = np.arange(len(self.keys))
+        if indicator is not None:
+            rows = rows[self.keys.get_level_values('indicador') == indicator]
+        models = self.best[rows] if model == 'auto' else np.full(len(rows), model, dtype=object)
+
+        parts = []
+        for name in MODEL_PARAMETERS:
+            selected = rows[models == name]
+            if len(selected) == 0:
+                continue
+            years, mean, lower, upper = self.predict(name, selected, horizon, confidence)
+            frame = pd.DataFrame({
+                'indicador': np.repeat(self.keys.get_level_values('indicador')[selected], horizon),
+                'cidade': np.repeat(self.keys.get_level_values('cidade')[selected], horizon),
+                'modelo': name,
+                'ano': years.ravel(),
+                'valor': mean.ravel(),
+                'inferior': lower.ravel(),
+                'superior': upper.ravel(),
+            })
+            parts.append(frame.dropna(subset=['valor']))
+        if not parts:
+            return pd.DataFrame(columns=['indicador', 'cidade', 'modelo', 'ano', 'valor', 'inferior', 'superior'])
+        return pd.concat(parts, ignore_index=True)
+
+
+def fit_forecasts(store: TimeSeriesStore) -> ForecastFits:
+    """Ajusta os quatro modelos em todas as séries do store em uma única passada"""
+    keys, years, grid = _series_grid(store)
+    if grid.size == 0:
+        return ForecastFits(store.version, keys, np.empty(0, dtype=int), np.empty(0), {}, pd.DataFrame(),
+                            np.empty(0, dtype=object))
+    observed = ~np.isnan(grid)
+    n = observed.sum(axis=1)
+    last_index = grid.shape[1] - 1 - np.argmax(observed[:, ::-1], axis=1)
+    last_year = years[last_index]
+    last_value = grid[np.arange(len(keys)), last_index]
+
+    # Tempo relativo ao último ano da grade, para estabilidade numérica
+    t_ref = np.full(len(keys), years[-1])
+    t = (years - years[-1]).astype(float)
+
+    linear = _least_squares(t, grid)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        positive = np.where(np.min(np.where(observed, grid, np.inf), axis=1) > 0, 1.0, np.nan)
+        exponential = _least_squares(t, np.log(np.where(grid > 0, grid, np.nan)) * positive[:, None])
+        exp_sse = np.nansum((grid - np.exp(exponential['a'][:, None] + exponential['b'][:, None] * t)) ** 2, axis=1)
+    robust = _theil_sen(t, grid)
+    holt = _holt(grid)
+
+    params = {'linear': linear, 'exponential': exponential, 'robust': robust, 'holt': holt}
+    sse = {'linear': linear['sse'], 'exponential': exp_sse, 'robust': robust['sse'], 'holt': holt['sse']}
+    for model, values in params.items():
+        values['t_ref'] = t_ref
+        values['n'] = n
+        # Séries curtas demais para o modelo ficam sem ajuste
+        values['sigma'] = np.where(n >= MIN_OBSERVATIONS[model], values['sigma'], np.nan)
+
+    aic = pd.DataFrame({
+        model: np.where(np.isfinite(params[model]['sigma']),
+                        _aic(sse[model], n, MODEL_PARAMETERS[model]), np.nan)
+        for model in MODEL_PARAMETERS
+    }, index=keys)
+    valid = aic.notna().any(axis=1).to_numpy()
+    best = np.where(valid, aic.fillna(np.inf).idxmin(axis=1).to_numpy(dtype=object), None)
+
+    return ForecastFits(
+        version=store.version,
+        keys=keys,
+        last_year=last_year,
+        last_value=last_value,
+        params=params,
+        aic=aic,
+        best=best,
+    )
+
+
+class ForecastService:
+    """Mantém os ajustes de previsão por versão do store de séries"""
+
+    def __init__(self, max_versions: int = 4):
+        self.max_versions = max_versions
+        self._fits: Dict[str, ForecastFits] = {}
+        self._lock = threading.Lock()
+
+    def get_fits(self, store: TimeSeriesStore) -> ForecastFits:
+        version = store.version or str(id(store))
+        with self._lock:
+            fits = self._fits.get(version)
+            if fits is None:
+                started = datetime.now()
+                fits = fit_forecasts(store)
+                print(f"{datetime.now().isoformat()} - Previsões ajustadas para {len(fits.keys)} séries "
+                      f"em {(datetime.now() - started).total_seconds():.2f}s")
+
+                self._fits[version] = fits
+                while len(self._fits) > self.max_versions:
+                    self._fits.pop(next(iter(self._fits)))
+            return fits
+
+
+@st.cache_resource(show_spinner=False)
+def get_forecast_service() -> ForecastService:
+    """Retorna o serviço de previsões compartilhado por todas as sessões do processo"""
+    return ForecastService()
@@ -0,0 +1,340 @@
+import atexit
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+JOB_CACHE_DIR = "static/cache/jobs"
+
+# Limites dos resultados persistidos: quantidade de arquivos e idade máxima
+MAX_DISK_RESULTS = 256
+RESULT_TTL = 7 * 24 * 3600  # segundos
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Estado compartilhado com o processo do job (progresso e pedido de cancelamento)
+_job_state = None
+_job_id: Optional[str] = None
+
+
+class JobCancelled(Exception):
+    """Levantada dentro do job quando o cancelamento é solicitado"""
+
+
+def report_progress(fraction: float) -> None:
+    """Informa o progresso (0 a 1) do job em execução e interrompe se foi cancelado.
+
+    Fora de um job (execução direta da função) não faz nada.
+    """
+    if _job_state is None or _job_id is None:
+        return
+    entry = _job_state.get(_job_id, {})
+    if entry.get('cancel'):
+        raise JobCancelled(_job_id)
+    _job_state[_job_id] = {**entry, 'progress': float(min(max(fraction, 0.0), 1.0))}
+
+
+def _execute(job_id: str, state, func: Callable, args: tuple, kwargs: dict) -> Any:
+    """Ponto de entrada no processo do pool"""
+    global _job_state, _job_id
+    _job_state, _job_id = state, job_id
+    try:
+        report_progress(0.0)
+        state[job_id] = {**state.get(job_id, {}), 'started': True}
+        result = func(*args, **kwargs)
+        report_progress(1.0)
+        return result
+    finally:
+        _job_state, _job_id = None, None
+
+
+def _fingerprint(value: Any) -> Any:
+    """Representação estável de um argumento para o hash do job"""
+    if isinstance(value, pd.DataFrame):
+        digest = hashlib.sha256(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        digest.update('|'.join(map(str, value.columns)).encode())
+        return {'dataframe': digest.hexdigest()}
+    if isinstance(value, pd.Series):
+        return {'series': hashlib.sha256(pd.util.hash_pandas_object(value).to_numpy().tobytes()).hexdigest()}
+    if isinstance(value, np.ndarray):
+        return {'array': hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest(), 'shape': value.shape}
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return sorted(map(str, value))
+    return str(value)
+
+
+def job_key(func: Callable, args: tuple, kwargs: dict) -> str:
+    """Hash dos parâmetros de um job (função, argumentos posicionais e nomeados)"""
+    payload = {
+        'func': f"{func.__module__}.{func.__qualname__}",
+        'args': list(args),
+        'kwargs': kwargs,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=_fingerprint, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class JobHandle:
+    """Referência leve a um job, guardada no session_state no lugar do resultado"""
+    job_id: str
+    kind: str
+    submitted_at: float
+
+
+@dataclass(frozen=True)
+class JobStatus:
+    state: str
+    progress: float = 0.0
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (DONE, FAILED, CANCELLED)
+
+
+class JobRunner:
+    """Executa funções pesadas em um pool de processos.
+
+    Os jobs são identificados pelo hash dos parâmetros: submeter de novo os
+    mesmos parâmetros reaproveita o job em andamento ou o resultado já
+    calculado (em memória ou persistido em disco com pickle), de modo que
+    reruns do Streamlit não recalculam nada. As sessões guardam apenas o
+    `JobHandle` e consultam `poll`/`result`; `cancel` cancela jobs na fila e
+    pede a interrupção dos que estão rodando (via `report_progress`).
+    Os resultados em disco expiram após `ttl` segundos e ficam limitados aos
+    `max_disk_results` usados mais recentemente.
+    """
+
+    def __init__(self, max_workers: int = 2, cache_dir: str = JOB_CACHE_DIR, max_results: int = 32,
+                 max_disk_results: int = MAX_DISK_RESULTS, ttl: float = RESULT_TTL):
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.max_results = max_results
+        self.max_disk_results = max_disk_results
+        self.ttl = ttl
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._state = None
+        self._futures: Dict[str, Future] = {}
+        self._started: Dict[str, float] = {}
+        self._errors: "OrderedDict[str, str]" = OrderedDict()
+        self._results: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable, *args, kind: str = "job", **kwargs) -> JobHandle:
+        """Agenda `func(*args, **kwargs)` (função de módulo, argumentos serializáveis)"""
+        job_id = job_key(func, args, kwargs)
+        handle = JobHandle(job_id=job_id, kind=kind, submitted_at=time.time())
+
+        with self._lock:
+            if job_id in self._results or self._on_disk(job_id):
+                return handle
+            future = self._futures.get(job_id)
+            if future is not None and not future.cancelled() and job_id not in self._errors:
+                return handle
+
+            self._ensure_pool()
+            self._errors.pop(job_id, None)
+            self._state[job_id] = {'progress': 0.0}
+            self._started[job_id] = time.time()
+            future = self._executor.submit(_execute, job_id, self._state, func, args, kwargs)
+            self._futures[job_id] = future
+
+        future.add_done_callback(lambda f, job_id=job_id: self._on_done(job_id, f))
+        print(f"{datetime.now().isoformat()} - Job {kind} {job_id[:12]} agendado")
+        return handle
+
+    def poll(self, handle: JobHandle) -> JobStatus:
+        """Estado atual do job"""
+        job_id = handle.job_id
+        with self._lock:
+            if job_id in self._results:
+                return JobStatus(DONE, 1.0)
+            error = self._errors.get(job_id)
+            future = self._futures.get(job_id)
+            elapsed = time.time() - self._started.get(job_id, time.time())
+
+        if error is not None:
+            return JobStatus(CANCELLED if error == CANCELLED else FAILED, error=error, elapsed=elapsed)
+        if future is None:
+            return JobStatus(DONE, 1.0) if self._on_disk(job_id) else JobStatus(CANCELLED)
+        if future.cancelled():
+            return JobStatus(CANCELLED, elapsed=elapsed)
+        if future.done():
+            # O callback ainda não terminou de guardar o resultado
+            return JobStatus(RUNNING, 1.0, elapsed=elapsed)
+
+        entry = self._state.get(job_id, {}) if self._state is not None else {}
+        state = RUNNING if entry.get('started') else PENDING
+        return JobStatus(state, entry.get('progress', 0.0), elapsed=elapsed)
+
+    def result(self, handle: JobHandle) -> Optional[Any]:
+        """Resultado do job concluído (None se ainda não houver)"""
+        job_id = handle.job_id
+        with self._lock:
+            if job_id in self._results:
+                self._results.move_to_end(job_id)
+                return self._results[job_id]
+
+        result = self._load(job_id)
+        if result is not None:
+            self._remember(job_id, result)
+        return result
+
+    def cancel(self, handle: JobHandle) -> bool:
+        """Cancela o job; retorna False se ele já terminou"""
+        job_id = handle.job_id
+        with self._lock:
+            future = self._futures.get(job_id)
+            if future is None or future.done():
+                return False
+            if future.cancel():
+                self._fail(job_id, CANCELLED)
+                return True
+            # Em execução: o job é interrompido no próximo report_progress
+            entry = self._state.get(job_id, {})
+            self._state[job_id] = {**entry, 'cancel': True}
+            return True
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+
+    def _ensure_pool(self) -> None:
+        if self._executor is None:
+            # spawn: o processo do Streamlit tem várias threads, e fork pode herdar locks travados
+            context = multiprocessing.get_context("spawn")
+            self._manager = context.Manager()
+            self._state = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    def _on_done(self, job_id: str, future: Future) -> None:
+        if future.cancelled():
+            return  # `cancel` já registrou o estado e limpou as entradas
+        try:
+            result = future.result()
+        except JobCancelled:
+            with self._lock:
+                self._fail(job_id, CANCELLED)
+            return
+        except Exception as e:
+            with self._lock:
+                self._fail(job_id, str(e))
+            print(f"{datetime.now().isoformat()} - Erro no job {job_id[:12]}: {str(e)}")
+            return
+
+        self._store(job_id, result)
+        self._remember(job_id, result)
+        with self._lock:
+            started = self._release(job_id)
+        print(f"{datetime.now().isoformat()} - Job {job_id[:12]} concluído em "
+              f"{time.time() - (started or time.time()):.2f}s")
+
+    def _fail(self, job_id: str, error: str) -> None:
+        """Registra a falha ou o cancelamento (chamar com o lock)"""
+        self._release(job_id)
+        self._errors[job_id] = error
+        self._errors.move_to_end(job_id)
+        while len(self._errors) > self.max_results:
+            self._errors.popitem(last=False)
+
+    def _release(self, job_id: str) -> Optional[float]:
+        """Remove as entradas do job em andamento (chamar com o lock); retorna o início"""
+        self._futures.pop(job_id, None)
+        if self._state is not None:
+            self._state.pop(job_id, None)
+        return self._started.pop(job_id, None)
+
+    def _remember(self, job_id: str, result: Any) -> None:
+        with self._lock:
+            self._results[job_id] = result
+            self._results.move_to_end(job_id)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.cache_dir, f"{job_id}.pkl")
+
+    def _on_disk(self, job_id: str) -> bool:
+        """Se há um resultado persistido dentro do prazo de validade"""
+        try:
+            return time.time() - os.path.getmtime(self._path(job_id)) <= self.ttl
+        except OSError:
+            return False
+
+    def _store(self, job_id: str, result: Any) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(job_id))
+        except Exception as e:
+            print(f"{datetime.now().isoformat()} - Erro ao gravar resultado do job {job_id[:12]}: {str(e)}")
+        self._prune()
+
+    def _prune(self) -> None:
+        """Remove resultados expirados e os menos usados além de `max_disk_results`"""
+        try:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if name.endswith((".pkl", ".tmp")):
+                    entries.append((os.path.getmtime(path), name.endswith(".pkl"), path))
+        except OSError:
+            return
+
+        now = time.time()
+        expired = [path for mtime, _, path in entries if now - mtime > self.ttl]
+        results = sorted((mtime, path) for mtime, is_result, path in entries
+                         if is_result and now - mtime <= self.ttl)
+        excess = [path for _, path in results[:max(len(results) - self.max_disk_results, 0)]]
+        for path in expired + excess:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _load(self, job_id: str) -> Optional[Any]:
+        path = self._path(job_id)
+        if not self._on_disk(job_id):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+            os.utime(path)  # O mtime marca o último uso para o limite de arquivos
+            return result
+        except Exception as e:
+            print(f"{datetime.now().isoformat()} - Erro ao ler resultado do job {job_id[:12]}: {str(e)}")
+            return None
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_runner() -> JobRunner:
+    """Retorna o executor de jobs compartilhado por todas as sessões do processo"""
+    runner = JobRunner()
+    atexit.register(runner.shutdown)
+    return runner
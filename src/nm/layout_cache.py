@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+import streamlit as st
+
+LAYOUT_CACHE_DIR = "static/cache/layouts"
+
+# Acima deste tamanho o Kamada-Kawai (O(n²) memória, O(n³) tempo) é
+# substituído pelo spring layout com partida aquecida
+KAMADA_KAWAI_MAX_NODES = 1000
+
+Positions = Dict[Any, Tuple[float, float]]
+
+
+def graph_fingerprint(graph: nx.Graph) -> str:
+    """Hash estável da estrutura do grafo (nós e arestas, sem atributos)"""
+    nodes = sorted(str(node) for node in graph.nodes())
+    edges = sorted('|'.join(sorted((str(u), str(v)))) for u, v in graph.edges())
+    digest = hashlib.sha256()
+    digest.update('\n'.join(nodes).encode())
+    digest.update(b'\x00')
+    digest.update('\n'.join(edges).encode())
+    return digest.hexdigest()
+
+
+class LayoutCache:
+    """Cache de posições de layout por (fingerprint do grafo, algoritmo).
+
+    As posições ficam em memória e em disco (JSON), sobrevivendo a reinícios.
+    Quando o grafo muda, o último layout do mesmo algoritmo é usado como
+    posição inicial (warm start): nós existentes mantêm o lugar e nós novos
+    partem da média dos vizinhos, então o desenho continua estável e converge
+    em menos iterações.
+
+    O lock global protege apenas os dicionários; o cálculo de um layout
+    segura só o lock da sua chave, então sessões pedindo outros grafos não
+    esperam, e pedidos simultâneos do mesmo grafo calculam uma única vez. A
+    memória guarda os `max_entries` layouts usados mais recentemente.
+    """
+
+    def __init__(self, cache_dir: str = LAYOUT_CACHE_DIR, max_entries: int = 64):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[Tuple[str, str], Positions]" = OrderedDict()
+        self._latest: Dict[str, Positions] = {}
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get_layout(self, graph: nx.Graph, algorithm: str = 'spring', fingerprint: Optional[str] = None) -> Positions:
+        """Retorna as posições do grafo, calculando apenas se ainda não existirem"""
+        fingerprint = fingerprint or graph_fingerprint(graph)
+        key = (fingerprint, algorithm)
+
+        with self._lock:
+            pos = self._cached(key, graph)
+            if pos is not None:
+                return pos
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Outra sessão pode ter calculado o layout enquanto esperávamos
+            with self._lock:
+                pos = self._cached(key, graph)
+            if pos is None:
+                pos = self._load(fingerprint, algorithm)
+                if pos is None or any(node not in pos for node in graph.nodes()):
+                    init, new_nodes = self._warm_start(graph, algorithm)
+                    pos = self._compute(graph, algorithm, init, new_nodes)
+                    self._store(fingerprint, algorithm, pos)
+
+            with self._lock:
+                self._memory[key] = pos
+                self._memory.move_to_end(key)
+                while len(self._memory) > self.max_entries:
+                    self._memory.popitem(last=False)
+                self._latest[algorithm] = pos
+                self._key_locks.pop(key, None)
+            return pos
+
+    def _cached(self, key: Tuple[str, str], graph: nx.Graph) -> Optional[Positions]:
+        """Layout em memória que cobre todos os nós do grafo (chamar com o lock)"""
+        pos = self._memory.get(key)
+        if pos is None or any(node not in pos for node in graph.nodes()):
+            return None
+        self._memory.move_to_end(key)
+        return pos
+
+    def path_for(self, fingerprint: str, algorithm: str) -> str:
+        return os.path.join(self.cache_dir, f"{algorithm}_{fingerprint[:24]}.json")
+
+    def _latest_path(self, algorithm: str) -> str:
+        return os.path.join(self.cache_dir, f"{algorithm}_latest.json")
+
+    def _compute(self, graph: nx.Graph, algorithm: str, init: Optional[Positions] = None,
+                 new_nodes: int = 0) -> Positions:
+        n = graph.number_of_nodes()
+        if n == 0:
+            return {}
+
+        if init and n > KAMADA_KAWAI_MAX_NODES and new_nodes < 0.05 * n:
+            # Mudança incremental em grafo grande: os nós novos já estão junto
+            # aos vizinhos, e os demais mantêm exatamente a posição anterior
+            return {node: (float(xy[0]), float(xy[1])) for node, xy in init.items()}
+
+        if algorithm == 'circular':
+            pos = nx.circular_layout(graph)
+        elif algorithm == 'random':
+            pos = nx.random_layout(graph, seed=42)
+        elif algorithm == 'kamada_kawai' and n <= KAMADA_KAWAI_MAX_NODES:
+            pos = nx.kamada_kawai_layout(graph, pos=init)
+        else:
+            if init:
+                # Com partida aquecida, poucas iterações bastam para acomodar as mudanças
+                iterations = 15 if n <= KAMADA_KAWAI_MAX_NODES else 5
+            elif n > KAMADA_KAWAI_MAX_NODES:
+                # Grafos grandes: partida espectral (esparsa) e refinamento curto
+                init = nx.spectral_layout(graph)
+                iterations = 10
+            else:
+                iterations = 50
+            pos = nx.spring_layout(graph, k=3 if n < 200 else None, pos=init,
+                                   iterations=iterations, seed=42)
+
+        return {node: (float(xy[0]), float(xy[1])) for node, xy in pos.items()}
+
+    def _warm_start(self, graph: nx.Graph, algorithm: str) -> Tuple[Optional[Positions], int]:
+        """Posições iniciais a partir do último layout calculado com o algoritmo.
+
+        Retorna as posições e a quantidade de nós que não existiam nele.
+        """
+        if algorithm in ('circular', 'random'):
+            return None, 0
+
+        previous = self._latest.get(algorithm)
+        if previous is None:
+            previous = self._read(self._latest_path(algorithm))
+        if not previous:
+            return None, 0
+
+        init = {node: previous[node] for node in graph.nodes() if node in previous}
+        if len(init) < graph.number_of_nodes() / 2:
+            # Grafo muito diferente: recalcular do zero
+            return None, 0
+
+        new_nodes = graph.number_of_nodes() - len(init)
+        rng = np.random.default_rng(42)
+        center = np.mean(list(init.values()), axis=0)
+        for node in graph.nodes():
+            if node in init:
+                continue
+            placed = [init[nb] for nb in graph.neighbors(node) if nb in init]
+            base = np.mean(placed, axis=0) if placed else center
+            jitter = rng.normal(scale=0.05, size=2)
+            init[node] = (float(base[0] + jitter[0]), float(base[1] + jitter[1]))
+
+        return {node: np.array(xy) for node, xy in init.items()}, new_nodes
+
+    def _load(self, fingerprint: str, algorithm: str) -> Optional[Positions]:
+        return self._read(self.path_for(fingerprint, algorithm))
+
+    def _read(self, path: str) -> Optional[Positions]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            return {node: (xy[0], xy[1]) for node, xy in payload['positions'].items()}
+        except Exception as e:
+            print(f"{datetime.now().isoformat()} - Erro ao ler layout {path}: {str(e)}")
+            return None
+
+    def _store(self, fingerprint: str, algorithm: str, pos: Positions) -> None:
+        payload = {
+            'fingerprint': fingerprint,
+            'algorithm': algorithm,
+            'created_at': datetime.now().isoformat(),
+            'positions': {str(node): list(xy) for node, xy in pos.items()}
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for path in (self.path_for(fingerprint, algorithm), self._latest_path(algorithm)):
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(payload, f)
+                os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"{datetime.now().isoformat()} - Erro ao gravar layout: {str(e)}")
+
+
+@st.cache_resource(show_spinner=False)
+def get_layout_cache() -> LayoutCache:
+    """Retorna o cache de layouts compartilhado por todas as sessões do processo"""
+    return LayoutCache()
@@ -0,0 +1,76 @@
+import difflib
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Similaridade mínima (difflib) para aceitar um nome aproximado
+FUZZY_CUTOFF = 0.8
+
+_NON_WORD = re.compile(r"[^\w\s]")
+
+
+def normalize_name(name: str) -> str:
+    """Chave de comparação: sem acentos, sem pontuação, minúscula e com espaços simples"""
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = _NON_WORD.sub(' ', text.casefold())
+    return ' '.join(text.split())
+
+
+class NameIndex:
+    """Índice de nomes insensível a acentos e maiúsculas.
+
+    A busca tenta, nesta ordem: a chave normalizada exata, um único nome com
+    o mesmo primeiro e último termo ("Fernando Pimentel" para "Fernando
+    Valente Pimentel") e a maior similaridade do difflib acima de
+    `FUZZY_CUTOFF`. Os resultados aproximados ficam memorizados.
+    """
+
+    def __init__(self, names: Iterable[Tuple[int, str]], cutoff: float = FUZZY_CUTOFF):
+        self.cutoff = cutoff
+        self._exact: Dict[str, int] = {}
+        self._by_ends: Dict[Tuple[str, str], List[int]] = {}
+        for position, name in names:
+            if not name:
+                continue
+            key = normalize_name(name)
+            if not key:
+                continue
+            self._exact.setdefault(key, position)
+            tokens = key.split()
+            self._by_ends.setdefault((tokens[0], tokens[-1]), []).append(position)
+        self._keys = list(self._exact)
+        self._fuzzy: Dict[str, Optional[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def exact(self, name: str) -> Optional[int]:
+        return self._exact.get(normalize_name(name))
+
+    def match(self, name: str) -> Optional[int]:
+        """Posição do nome no índice (exato ou aproximado) ou None"""
+        key = normalize_name(name)
+        if not key:
+            return None
+        position = self._exact.get(key)
+        if position is not None:
+            return position
+
+        with self._lock:
+            if key in self._fuzzy:
+                return self._fuzzy[key]
+
+        tokens = key.split()
+        candidates = self._by_ends.get((tokens[0], tokens[-1]), [])
+        if len(candidates) == 1:
+            position = candidates[0]
+        else:
+            close = difflib.get_close_matches(key, self._keys, n=1, cutoff=self.cutoff)
+            position = self._exact[close[0]] if close else None
+
+        with self._lock:
+            self._fuzzy[key] = position
+        return position
@@ -0,0 +1,134 @@
+from dataclasses import dataclass, field
+from typing import Dict, Any, Iterable, List, Tuple
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from src.nm.network_metrics import NetworkMetrics
+
+# Máximo de marcadores (atores + super-nós) enviados ao navegador
+NODE_BUDGET = 2000
+# Máximo de arestas desenhadas; as mais pesadas têm prioridade
+EDGE_BUDGET = 5000
+
+# Prefixo dos ids de super-nó (não colide com os ids de atores da ontologia)
+SUPER_NODE_PREFIX = "community:"
+
+
+def super_node_id(community: str) -> str:
+    return f"{SUPER_NODE_PREFIX}{community}"
+
+
+def is_super_node(node_id: Any) -> bool:
+    return isinstance(node_id, str) and node_id.startswith(SUPER_NODE_PREFIX)
+
+
+def community_of(node_id: str) -> str:
+    return node_id[len(SUPER_NODE_PREFIX):]
+
+
+@dataclass(frozen=True)
+class SuperNode:
+    """Comunidade recolhida: representa os membros que não estão visíveis"""
+    id: str
+    community: str
+    members: Tuple[Any, ...]
+    total_members: int
+    internal_edges: int
+
+    @property
+    def label(self) -> str:
+        if len(self.members) < self.total_members:
+            return f"{self.community} (+{len(self.members)})"
+        return f"{self.community} ({self.total_members})"
+
+
+@dataclass(frozen=True)
+class LodView:
+    """Grafo reduzido a ser desenhado.
+
+    `graph` contém os atores visíveis e os super-nós (atributo `super`), com
+    o peso das arestas agregado em `weight`.
+    """
+    graph: nx.Graph
+    actors: Tuple[Any, ...]
+    super_nodes: Dict[str, SuperNode] = field(default_factory=dict)
+    hidden_edges: int = 0
+
+
+def build_lod_view(graph: nx.Graph, metrics: NetworkMetrics,
+                   expanded: Iterable[str] = (), rank_by: str = 'degree_centrality',
+                   node_budget: int = NODE_BUDGET, edge_budget: int = EDGE_BUDGET) -> LodView:
+    """Monta a visão com nível de detalhe da rede.
+
+    Cada comunidade (Louvain, do serviço de métricas) vira um super-nó, exceto
+    as expandidas, cujos membros aparecem em ordem de `rank_by` até esgotar o
+    orçamento de marcadores; os que sobram continuam no super-nó. As arestas
+    são agregadas por par de representantes, somando a multiplicidade.
+    """
+    nodes = metrics.nodes
+    community = nodes['community']
+    expanded = [c for c in dict.fromkeys(expanded) if c in set(community)]
+    collapsed_count = community.nunique() - len(expanded)
+
+    # Membros das comunidades expandidas, por ordem de importância
+    budget = max(0, node_budget - collapsed_count)
+    visible: List[Any] = []
+    for name in expanded:
+        members = nodes.loc[community == name, rank_by].sort_values(ascending=False, kind='stable')
+        # Reserva um marcador para o super-nó dos membros restantes
+        room = len(members) if len(members) <= budget else max(0, budget - 1)
+        visible.extend(members.index[:room])
+        budget -= room
+
+    visible_set = set(visible)
+    representative = pd.Series(
+        [node if node in visible_set else super_node_id(c) for node, c in community.items()],
+        index=community.index, dtype=object
+    )
+
+    # Arestas agregadas pelos representantes das extremidades
+    edges = pd.DataFrame(
+        [(u, v, data.get('multiplicity', 1)) for u, v, data in graph.edges(data=True)],
+        columns=['u', 'v', 'weight']
+    )
+    super_nodes: Dict[str, SuperNode] = {}
+    view = nx.Graph()
+    view.add_nodes_from(visible, super=False)
+
+    internal = pd.Series(dtype=float)
+    if not edges.empty:
+        edges['ru'] = edges['u'].map(representative)
+        edges['rv'] = edges['v'].map(representative)
+        loops = edges['ru'] == edges['rv']
+        internal = edges.loc[loops].groupby('ru').size()
+
+        between = edges.loc[~loops]
+        swap = between['ru'] > between['rv']
+        a = np.where(swap, between['rv'], between['ru'])
+        b = np.where(swap, between['ru'], between['rv'])
+        aggregated = between.assign(a=a, b=b).groupby(['a', 'b'], sort=False)['weight'].sum()
+        aggregated = aggregated.sort_values(ascending=False, kind='stable')
+        hidden_edges = max(0, len(aggregated) - edge_budget)
+        aggregated = aggregated.iloc[:edge_budget]
+    else:
+        aggregated = pd.Series(dtype=float)
+        hidden_edges = 0
+
+    hidden = representative[~representative.index.isin(visible_set)]
+    totals = community.value_counts()
+    for rep, members in hidden.groupby(hidden, sort=False):
+        name = community_of(rep)
+        super_nodes[rep] = SuperNode(
+            id=rep,
+            community=name,
+            members=tuple(members.index),
+            total_members=int(totals[name]),
+            internal_edges=int(internal.get(rep, 0)),
+        )
+        view.add_node(rep, super=True)
+
+    view.add_weighted_edges_from((a, b, float(w)) for (a, b), w in aggregated.items())
+    return LodView(graph=view, actors=tuple(visible), super_nodes=super_nodes, hidden_edges=hidden_edges)
+
@@ -0,0 +1,155 @@
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Any, Optional, Set, Tuple, FrozenSet
+
+import networkx as nx
+import pandas as pd
+import streamlit as st
+
+# Acima deste número de nós a intermediação é estimada por amostragem
+BETWEENNESS_EXACT_MAX_NODES = 500
+BETWEENNESS_SAMPLE_SIZE = 256
+
+# Métricas expostas como atributos dos nós (seletores de cor e tamanho)
+METRIC_ATTRIBUTES = {
+    'degree_centrality': 'Centralidade de grau',
+    'betweenness': 'Intermediação',
+    'pagerank': 'PageRank',
+    'clustering': 'Coeficiente de clusterização',
+    'core_number': 'Núcleo (k-core)',
+    'community': 'Comunidade',
+}
+
+Edge = FrozenSet[Any]
+
+
+@dataclass(frozen=True)
+class NetworkMetrics:
+    """Métricas de uma versão do grafo: uma linha por nó e o resumo da rede"""
+    version: str
+    nodes: pd.DataFrame
+    summary: Dict[str, Any]
+    edges: FrozenSet[Edge] = field(repr=False, default=frozenset())
+
+    def top(self, metric: str) -> Optional[Tuple[Any, float]]:
+        """Nó com o maior valor da métrica"""
+        if self.nodes.empty or metric not in self.nodes.columns:
+            return None
+        node = self.nodes[metric].idxmax()
+        return node, float(self.nodes.at[node, metric])
+
+
+def _edge_set(graph: nx.Graph) -> FrozenSet[Edge]:
+    return frozenset(frozenset((u, v)) for u, v in graph.edges())
+
+
+def _betweenness(graph: nx.Graph) -> Tuple[Dict[Any, float], bool]:
+    """Intermediação exata ou amostrada (k fontes) conforme o tamanho do grafo"""
+    n = graph.number_of_nodes()
+    if n <= BETWEENNESS_EXACT_MAX_NODES:
+        return nx.betweenness_centrality(graph), False
+    return nx.betweenness_centrality(graph, k=min(n, BETWEENNESS_SAMPLE_SIZE), seed=42), True
+
+
+def _communities(graph: nx.Graph) -> Dict[Any, str]:
+    communities = nx.community.louvain_communities(graph, seed=42) if graph.number_of_edges() else []
+    membership = {}
+    # Numeração estável: comunidades maiores primeiro
+    for i, members in enumerate(sorted(communities, key=lambda c: (-len(c), min(map(str, c))))):
+        for node in members:
+            membership[node] = f"C{i + 1}"
+    for node in graph.nodes():
+        membership.setdefault(node, "Isolado")
+    return membership
+
+
+def compute_network_metrics(graph: nx.Graph, version: str,
+                            previous: Optional[NetworkMetrics] = None) -> NetworkMetrics:
+    """Calcula as métricas do grafo.
+
+    Com `previous` (métricas de uma versão anterior), as métricas locais
+    (grau, clusterização) só são recalculadas para os nós afetados pelas
+    arestas alteradas e o PageRank parte dos valores anteriores.
+    """
+    edges = _edge_set(graph)
+    nodes = list(graph.nodes())
+
+    affected: Optional[Set[Any]] = None
+    if previous is not None and set(previous.nodes.index) == set(nodes):
+        changed = edges.symmetric_difference(previous.edges)
+        affected = set()
+        for edge in changed:
+            for node in edge:
+                affected.add(node)
+                affected.update(graph.neighbors(node))
+
+    if affected is not None and previous is not None:
+        clustering = previous.nodes['clustering'].to_dict()
+        if affected:
+            clustering.update(nx.clustering(graph, affected))
+        pagerank = nx.pagerank(graph, nstart=previous.nodes['pagerank'].to_dict())
+    else:
+        clustering = nx.clustering(graph)
+        pagerank = nx.pagerank(graph) if nodes else {}
+
+    betweenness, approximate = _betweenness(graph)
+
+    frame = pd.DataFrame({
+        'degree': pd.Series(dict(graph.degree()), dtype=float),
+        'degree_centrality': pd.Series(nx.degree_centrality(graph), dtype=float),
+        'betweenness': pd.Series(betweenness, dtype=float),
+        'pagerank': pd.Series(pagerank, dtype=float),
+        'clustering': pd.Series(clustering, dtype=float),
+        'core_number': pd.Series(nx.core_number(graph) if nodes else {}, dtype=float),
+        'community': pd.Series(_communities(graph), dtype=object),
+    }, index=pd.Index(nodes, dtype=object))
+
+    n = graph.number_of_nodes()
+    summary = {
+        'num_nodes': n,
+        'num_edges': graph.number_of_edges(),
+        'density': nx.density(graph) if n > 1 else 0.0,
+        'avg_clustering': float(frame['clustering'].mean()) if n else 0.0,
+        'num_communities': int(frame['community'].nunique()) if n else 0,
+        'max_core': int(frame['core_number'].max()) if n else 0,
+        'betweenness_approximate': approximate,
+    }
+
+    return NetworkMetrics(version=version, nodes=frame, summary=summary, edges=edges)
+
+
+class NetworkMetricsService:
+    """Mantém as métricas por versão do grafo, calculadas uma única vez.
+
+    Versões novas do mesmo conjunto de nós são atualizadas incrementalmente a
+    partir da última versão calculada.
+    """
+
+    def __init__(self, max_versions: int = 8):
+        self.max_versions = max_versions
+        self._metrics: Dict[str, NetworkMetrics] = {}
+        self._latest: Optional[NetworkMetrics] = None
+        self._lock = threading.Lock()
+
+    def get_metrics(self, graph: nx.Graph, version: str) -> NetworkMetrics:
+        with self._lock:
+            metrics = self._metrics.get(version)
+            if metrics is None:
+                started = datetime.now()
+                metrics = compute_network_metrics(graph, version, previous=self._latest)
+                print(f"{datetime.now().isoformat()} - Métricas da rede calculadas para {graph.number_of_nodes()} nós "
+                      f"em {(datetime.now() - started).total_seconds():.2f}s")
+
+                self._metrics[version] = metrics
+                while len(self._metrics) > self.max_versions:
+                    self._metrics.pop(next(iter(self._metrics)))
+
+            self._latest = metrics
+            return metrics
+
+
+@st.cache_resource(show_spinner=False)
+def get_network_metrics_service() -> NetworkMetricsService:
+    """Retorna o serviço de métricas compartilhado por todas as sessões do processo"""
+    return NetworkMetricsService()
@@ -0,0 +1,290 @@
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Mapping
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from src.nm.name_index import NameIndex
+
+# Raízes conhecidas dos arquivos de ontologia
+ONTOLOGY_ROOTS = (
+    'textile_ecosystem_network_ontology',
+    'ecosystem_network_ontology',
+    'ontologia_pessoas_ecossistema_textil_pernambuco',
+    'ontologia_ecossistema_textil_pernambuco',
+)
+
+# Campos do esquema em português -> esquema canônico (inglês)
+FIELD_ALIASES = {
+    'nos': 'nodes',
+    'arestas': 'edges',
+    'nome': 'name',
+    'tipo': 'type',
+    'cargo': 'position',
+    'atributos': 'attributes',
+    'origem': 'source',
+    'destino': 'target',
+    'descricao': 'description',
+}
+
+ATTRIBUTE_ALIASES = {
+    'perfil_linkedin': 'profile_linkedin',
+    'perfil_instagram': 'profile_instagram',
+    'foto_perfil': 'profile_photo',
+    'empresa': 'company',
+    'instituicao': 'institution',
+    'formacao': 'education',
+    'cidade_principal': 'main_city',
+    'estado': 'state',
+    'pais': 'country',
+    'geolocalizacao': 'geolocation',
+    'area_atuacao': 'activity_area',
+    'contribuicao_principal': 'main_contribution',
+    'grau_relevancia': 'relevance_degree',
+    'escala_impacto': 'impact_scale',
+    'tipo_lideranca': 'leadership_type',
+    'citacao_relevante': 'relevant_quote',
+    'natureza_relacao': 'relationship_nature',
+    'intensidade': 'intensity',
+    'contexto': 'context',
+    'evidencia': 'evidence',
+}
+
+# Colunas fixas das tabelas de nós e arestas (os atributos vêm depois)
+NODE_COLUMNS = ('id', 'type', 'name', 'position')
+EDGE_COLUMNS = ('id', 'source', 'target', 'type')
+
+
+def _canonical(record: Mapping[str, Any]) -> Dict[str, Any]:
+    """Renomeia os campos e atributos de um registro para o esquema canônico"""
+    result = {FIELD_ALIASES.get(key, key): value for key, value in record.items()}
+    attributes = result.get('attributes')
+    if isinstance(attributes, Mapping):
+        result['attributes'] = {ATTRIBUTE_ALIASES.get(key, key): value for key, value in attributes.items()}
+    else:
+        result['attributes'] = {}
+    return result
+
+
+def find_ontology_root(raw: Mapping[str, Any]) -> Optional[Mapping[str, Any]]:
+    """Localiza o corpo da ontologia (o dicionário com nós e arestas)"""
+    if not isinstance(raw, Mapping):
+        return None
+    if 'nodes' in raw or 'nos' in raw:
+        return raw
+    for root in ONTOLOGY_ROOTS:
+        if isinstance(raw.get(root), Mapping):
+            return raw[root]
+    # Raiz desconhecida: primeiro valor com nós
+    for value in raw.values():
+        if isinstance(value, Mapping) and ('nodes' in value or 'nos' in value):
+            return value
+    return None
+
+
+def _attribute_frame(records: List[Dict[str, Any]], fixed: Tuple[str, ...]) -> pd.DataFrame:
+    """Tabela com as colunas fixas e uma coluna por atributo"""
+    frame = pd.DataFrame.from_records(
+        [{**{col: record.get(col) for col in fixed}, **record['attributes']} for record in records]
+    )
+    for col in fixed:
+        if col not in frame.columns:
+            frame[col] = None
+
+    for col in frame.columns:
+        if col in ('id', 'source', 'target'):
+            continue
+        values = frame[col]
+        if values.map(lambda v: isinstance(v, str) or v is None).all():
+            # Textos repetidos (cidades, tipos) viram categorias internadas
+            if values.nunique(dropna=True) <= max(1, len(values) // 2):
+                frame[col] = values.astype('category')
+        elif pd.api.types.is_numeric_dtype(values):
+            frame[col] = pd.to_numeric(values, errors='coerce')
+    return frame
+
+
+@dataclass(frozen=True)
+class OntologyStore:
+    """Ontologia normalizada em tabelas e adjacência compacta.
+
+    Os ids de nó são internados em posições inteiras (`index`); `nodes` e
+    `edges` têm uma linha por registro e uma coluna por atributo (nomes do
+    esquema canônico em inglês, qualquer que seja o arquivo de origem), e a
+    adjacência não direcionada fica em CSR (`indptr`, `indices`, com a linha
+    da aresta em `edge_rows`).
+    """
+    ids: np.ndarray
+    index: Mapping[str, int]
+    nodes: pd.DataFrame
+    edges: pd.DataFrame
+    indptr: np.ndarray
+    indices: np.ndarray
+    edge_rows: np.ndarray
+    clusters: Tuple[Dict[str, Any], ...] = ()
+    metadata: Mapping[str, Any] = field(default_factory=dict)
+    records: Tuple[Dict[str, Any], ...] = field(default=(), repr=False)
+    edge_records: Tuple[Dict[str, Any], ...] = field(default=(), repr=False)
+    version: str = ''
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.edges)
+
+    def position(self, node_id: str) -> Optional[int]:
+        return self.index.get(node_id)
+
+    @cached_property
+    def name_index(self) -> NameIndex:
+        """Índice de nomes dos nós (montado no primeiro uso)"""
+        return NameIndex(enumerate(self.nodes['name'].astype(object)))
+
+    def find_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Registro do nó pelo nome, sem diferenciar acentos/maiúsculas e com aproximação"""
+        position = self.name_index.match(name)
+        return self.records[position] if position is not None else None
+
+    def node(self, node_id: str) -> Optional[Dict[str, Any]]:
+        """Registro canônico do nó (id, type, name, position, attributes)"""
+        i = self.index.get(node_id)
+        return self.records[i] if i is not None else None
+
+    def actors(self, positions: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """Registros canônicos de todos os nós ou das posições informadas"""
+        if positions is None:
+            return list(self.records)
+        return [self.records[i] for i in positions]
+
+    def attribute(self, name: str) -> pd.Series:
+        """Coluna de um atributo por id de nó (vazia se o atributo não existir)"""
+        if name not in self.nodes.columns:
+            return pd.Series(index=self.ids, dtype=object)
+        return pd.Series(self.nodes[name].to_numpy(), index=self.ids)
+
+    def neighbors(self, node_id: str) -> np.ndarray:
+        """Posições dos vizinhos de um nó"""
+        i = self.index.get(node_id)
+        if i is None:
+            return np.empty(0, dtype=np.int32)
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def degree(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def cluster_members(self, cluster_id: str) -> np.ndarray:
+        for cluster in self.clusters:
+            if cluster.get('id') == cluster_id:
+                return cluster['members']
+        return np.empty(0, dtype=np.int32)
+
+    def subgraph_edges(self, mask: np.ndarray) -> pd.DataFrame:
+        """Arestas com as duas extremidades nos nós selecionados pela máscara"""
+        source = self.edges['source_pos'].to_numpy()
+        target = self.edges['target_pos'].to_numpy()
+        return self.edges[mask[source] & mask[target]]
+
+    def to_networkx(self, mask: Optional[np.ndarray] = None,
+                    node_columns: Mapping[str, str] = None, edge_columns: Mapping[str, str] = None) -> nx.Graph:
+        """Grafo NetworkX dos nós selecionados.
+
+        `node_columns`/`edge_columns` mapeiam o nome do atributo no grafo para
+        a coluna do store; valores ausentes não viram atributo.
+        """
+        mask = np.ones(self.num_nodes, dtype=bool) if mask is None else mask
+        graph = nx.Graph()
+        graph.add_nodes_from(self._attribute_tuples(self.nodes.loc[mask], ['id'], node_columns or {}))
+        graph.add_edges_from(self._attribute_tuples(self.subgraph_edges(mask), ['source', 'target'],
+                                                    edge_columns or {}))
+        return graph
+
+    @staticmethod
+    def _attribute_tuples(frame: pd.DataFrame, keys: List[str], columns: Mapping[str, str]):
+        columns = {name: col for name, col in columns.items() if col in frame.columns}
+        names = list(columns)
+        for row in frame[keys + list(columns.values())].itertuples(index=False, name=None):
+            attributes = {name: value for name, value in zip(names, row[len(keys):])
+                          if value is not None and not (isinstance(value, float) and np.isnan(value))}
+            yield (*row[:len(keys)], attributes)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Ontologia no esquema canônico (nodes/edges/clusters) para código legado"""
+        return {
+            'metadata': dict(self.metadata),
+            'nodes': list(self.records),
+            'edges': list(self.edge_records),
+            'clusters': [
+                {key: value for key, value in cluster.items() if key != 'members'} for cluster in self.clusters
+            ],
+        }
+
+
+def parse_ontology(raw: Mapping[str, Any], version: str = '') -> Optional[OntologyStore]:
+    """Normaliza qualquer um dos esquemas de ontologia em um OntologyStore
+
+    `version` identifica o conteúdo de origem (o hash do arquivo) e serve de
+    chave para os caches derivados do store.
+    """
+    body = find_ontology_root(raw)
+    if body is None:
+        return None
+
+    body = {FIELD_ALIASES.get(key, key): value for key, value in body.items()}
+    records = [_canonical(node) for node in body.get('nodes') or [] if node.get('id') is not None]
+
+    # Internação dos ids (o primeiro registro de um id repetido prevalece)
+    index: Dict[str, int] = {}
+    unique_records = []
+    for record in records:
+        if record['id'] not in index:
+            index[record['id']] = len(unique_records)
+            unique_records.append(record)
+    ids = np.array([record['id'] for record in unique_records], dtype=object)
+
+    edge_records = [
+        edge for edge in (_canonical(edge) for edge in body.get('edges') or [])
+        if edge.get('source') in index and edge.get('target') in index
+    ]
+
+    nodes = _attribute_frame(unique_records, NODE_COLUMNS)
+    edges = _attribute_frame(edge_records, EDGE_COLUMNS)
+    source = np.array([index[edge['source']] for edge in edge_records], dtype=np.int32)
+    target = np.array([index[edge['target']] for edge in edge_records], dtype=np.int32)
+    edges['source_pos'] = source
+    edges['target_pos'] = target
+
+    # CSR não direcionado: cada aresta aparece nas linhas das duas extremidades
+    rows = np.concatenate([source, target])
+    cols = np.concatenate([target, source])
+    edge_rows = np.concatenate([np.arange(len(source)), np.arange(len(source))]).astype(np.int32)
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(ids)), out=indptr[1:])
+
+    clusters = []
+    for cluster in body.get('clusters') or []:
+        cluster = {FIELD_ALIASES.get(key, key): value for key, value in cluster.items()}
+        members = [node for node in cluster.get('nodes', []) if node in index]
+        cluster['nodes'] = members
+        cluster['members'] = np.array([index[node] for node in members], dtype=np.int32)
+        clusters.append(cluster)
+
+    return OntologyStore(
+        ids=ids,
+        index=index,
+        nodes=nodes,
+        edges=edges,
+        indptr=indptr,
+        indices=cols[order].astype(np.int32),
+        edge_rows=edge_rows[order],
+        clusters=tuple(clusters),
+        metadata=dict(body.get('metadata') or {}),
+        records=tuple(unique_records),
+        edge_records=tuple(edge_records),
+        version=version,
+    )
@@ -1,10 +1,62 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
 import plotly.graph_objects as go
 import plotly.express as px
 import streamlit as st
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Any
 import networkx as nx
 from src.nm.data_loader import DataLoader
+from src.nm.layout_cache import get_layout_cache, graph_fingerprint
+from src.nm.network_metrics import NetworkMetrics, METRIC_ATTRIBUTES, get_network_metrics_service
+from src.nm.ontology_store import OntologyStore
+from src.nm.network_lod import LodView, NODE_BUDGET, build_lod_view, is_super_node, community_of
+
+# Acima deste número de nós a rede é desenhada com WebGL (Scattergl)
+SCATTERGL_NODE_THRESHOLD = 300
+
+
+@dataclass(frozen=True)
+class FigureSpec:
+    """Figura da rede serializada, com o mapa de cores e a ordem dos nós"""
+    figure_json: str
+    color_map: Dict[str, str]
+    node_ids: Tuple[str, ...]
+
+
+class FigureSpecCache:
+    """Cache LRU das figuras serializadas por combinação de controles"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, FigureSpec]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[FigureSpec]:
+        with self._lock:
+            spec = self._entries.get(key)
+            if spec is not None:
+                self._entries.move_to_end(key)
+            return spec
+
+    def put(self, key: tuple, spec: FigureSpec) -> None:
+        with self._lock:
+            self._entries[key] = spec
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache() -> FigureSpecCache:
+    """Cache de figuras compartilhado por todas as sessões do processo"""
+    return FigureSpecCache()
+
 
 class EcosystemNetworkRenderer:
     """
@@ -14,9 +66,13 @@ class EcosystemNetworkRenderer:
 
     def __init__(self):
         self.graph = None
+        self.graph_version = None
+        self.content_version = None
+        self._metrics_version = None
         self.pos = None
         self.node_data = {}
         self.edge_data = {}
+        self.edge_index = {}
         self.clusters = {}
 
     def load_json_ontology(self, json_file_path: str = None, json_data: dict = None, root_node: str = None) -> None:
@@ -39,8 +95,25 @@ class EcosystemNetworkRenderer:
 
         self._process_data()
 
-    def _process_data(self) -> None:
-        """Process the ontology data and create NetworkX graph."""
+    def load_ontology_store(self, store: OntologyStore) -> None:
+        """
+        Load the ontology from the normalized store (any of the ontology schemas).
+
+        Args:
+            store (OntologyStore): Ontology parsed by the dataset registry
+        """
+        self.ontology_data = store.as_dict()
+
+        self._process_data(store.version or None)
+
+    def _process_data(self, content_version: Optional[str] = None) -> None:
+        """
+        Process the ontology data and create NetworkX graph.
+
+        Args:
+            content_version (str): Hash of the ontology content (names, attributes,
+                edge types); computed from the data when not given
+        """
         self.graph = nx.Graph()
 
         # Process nodes
@@ -49,14 +122,17 @@ class EcosystemNetworkRenderer:
             self.graph.add_node(node_id)
             self.node_data[node_id] = node
 
-        # Process edges
+        # Process edges (parallel relationships share one graph edge and are
+        # kept together in the undirected edge index)
         for edge in self.ontology_data['edges']:
             source = edge['source']
             target = edge['target']
             edge_id = edge['id']
 
-            self.graph.add_edge(source, target)
             self.edge_data[edge_id] = edge
+            records = self.edge_index.setdefault(self._edge_key(source, target), [])
+            records.append(edge)
+            self.graph.add_edge(source, target, multiplicity=len(records))
 
         # Process clusters
         try:
@@ -65,9 +141,48 @@ class EcosystemNetworkRenderer:
         except:
             pass
 
+        # Versão do grafo (só estrutura): chave dos caches de layout e de métricas.
+        # A figura também depende do conteúdo (nomes, atributos, tipos de aresta)
+        self.graph_version = graph_fingerprint(self.graph)
+        if not content_version:
+            payload = json.dumps(self.ontology_data, sort_keys=True, default=str).encode('utf-8')
+            content_version = hashlib.sha256(payload).hexdigest()
+        self.content_version = content_version
+
+    @staticmethod
+    def _edge_key(source: str, target: str) -> Tuple[str, str]:
+        """Undirected key of the edge index"""
+        return (source, target) if source <= target else (target, source)
+
+    def get_edge_records(self, source: str, target: str) -> List[dict]:
+        """All relationship records between two nodes, in either direction."""
+        return self.edge_index.get(self._edge_key(source, target), [])
+
+    def get_metrics(self) -> NetworkMetrics:
+        """
+        Network metrics of the current graph version (computed once per version
+        by the metrics service) and attached to the graph as node attributes.
+        """
+        metrics = get_network_metrics_service().get_metrics(self.graph, self.graph_version)
+        if self._metrics_version != metrics.version:
+            nx.set_node_attributes(self.graph, metrics.nodes.to_dict('index'))
+            self._metrics_version = metrics.version
+        return metrics
+
+    def _node_attribute(self, node_id: str, attribute: str, default=None):
+        """Value of an ontology attribute or of a computed metric for a node."""
+        if attribute in METRIC_ATTRIBUTES:
+            self.get_metrics()
+            return self.graph.nodes[node_id].get(attribute, default)
+        return self.node_data[node_id].get('attributes', {}).get(attribute, default)
+
     def _calculate_layout(self, layout_type: str = 'spring') -> Dict:
         """
-        Calculate node positions using various layout algorithms.
+        Get node positions for a layout algorithm.
+
+        Positions come from the process-wide layout cache, keyed by graph
+        fingerprint and algorithm; they are only computed when the graph
+        changes (warm-started from the previous layout).
 
         Args:
             layout_type (str): Type of layout ('spring', 'circular', 'random', 'kamada_kawai')
@@ -75,18 +190,10 @@ class EcosystemNetworkRenderer:
         Returns:
             Dict: Node positions
         """
-        if layout_type == 'spring':
-            pos = nx.spring_layout(self.graph, k=3, iterations=50, seed=42)
-        elif layout_type == 'circular':
-            pos = nx.circular_layout(self.graph)
-        elif layout_type == 'random':
-            pos = nx.random_layout(self.graph, seed=42)
-        elif layout_type == 'kamada_kawai':
-            pos = nx.kamada_kawai_layout(self.graph)
-        else:
-            pos = nx.spring_layout(self.graph, k=3, iterations=50, seed=42)
+        if layout_type not in ('spring', 'circular', 'random', 'kamada_kawai'):
+            layout_type = 'spring'
 
-        return pos
+        return get_layout_cache().get_layout(self.graph, layout_type, fingerprint=self.graph_version)
 
     def _get_node_colors_by_attribute(self, attribute: str) -> Tuple[List[str], Dict[str, str]]:
         """
@@ -168,10 +275,22 @@ class EcosystemNetworkRenderer:
                        show_edge_labels: bool = True,
                        filter_by_cluster: Optional[str] = None,
                        width: int = 1000,
-                       height: int = 800) -> go.Figure:
+                       height: int = 800,
+                       selected_node: Optional[str] = None,
+                       aggregate: bool = False,
+                       expanded: Tuple[str, ...] = ()) -> go.Figure:
         """
         Render the network as an interactive Plotly figure.
 
+        The figure is built once per (graph version, ontology content version,
+        layout, color, size, cluster, dimensions, level of detail) and kept
+        serialized in the figure cache; reruns only rebuild it from that spec
+        and patch the selection highlight.
+
+        Without a cluster filter, graphs above the node budget (or any graph
+        when `aggregate` is set) are drawn at community level: each community
+        is a super-node, and only the `expanded` ones show their actors.
+
         Args:
             layout_type (str): Layout algorithm to use
             color_by (str): Attribute to color nodes by
@@ -180,6 +299,9 @@ class EcosystemNetworkRenderer:
             filter_by_cluster (str): Filter nodes by specific cluster
             width (int): Figure width
             height (int): Figure height
+            selected_node (str): Node to highlight
+            aggregate (bool): Collapse communities into super-nodes
+            expanded (tuple): Communities shown actor by actor
 
         Returns:
             go.Figure: Plotly figure object
@@ -188,8 +310,61 @@ class EcosystemNetworkRenderer:
             st.markdown("No graph data loaded. Call load_json_ontology() first.")
             raise ValueError("No graph data loaded. Call load_json_ontology() first.")
 
+        lod = None
+        if not (filter_by_cluster and filter_by_cluster in self.clusters):
+            if aggregate or self.graph.number_of_nodes() > NODE_BUDGET:
+                lod = tuple(sorted(set(expanded)))
+
+        key = (self.graph_version, self.content_version, layout_type, color_by, node_size_by, show_edge_labels,
+               filter_by_cluster, width, height, lod)
+        cache = get_figure_cache()
+        spec = cache.get(key)
+        if spec is None:
+            fig, node_ids = self._build_network_figure(layout_type, color_by, node_size_by,
+                                                       filter_by_cluster, width, height, lod)
+            spec = FigureSpec(
+                figure_json=fig.to_json(),
+                color_map=dict(self.current_color_map),
+                node_ids=tuple(node_ids)
+            )
+            cache.put(key, spec)
+
+        self.current_color_map = dict(spec.color_map)
+        fig = go.Figure(json.loads(spec.figure_json))
+
+        if selected_node:
+            self._highlight_selection(fig, spec.node_ids, selected_node)
+
+        return fig
+
+    @staticmethod
+    def _highlight_selection(fig: go.Figure, node_ids: Tuple[str, ...], selected_node: str) -> None:
+        """Destaca o nó selecionado (único ajuste feito sobre a figura em cache)"""
+        if selected_node not in node_ids:
+            return
+        node_trace = fig.data[-1]
+        node_trace.selectedpoints = [node_ids.index(selected_node)]
+        node_trace.selected = dict(marker=dict(opacity=1.0))
+        node_trace.unselected = dict(marker=dict(opacity=0.35))
+
+    def get_lod_view(self, expanded: Tuple[str, ...] = ()) -> LodView:
+        """Community-level view of the graph with the given communities expanded."""
+        return build_lod_view(self.graph, self.get_metrics(), expanded)
+
+    def _build_network_figure(self, layout_type: str, color_by: str, node_size_by: str,
+                              filter_by_cluster: Optional[str], width: int, height: int,
+                              lod: Optional[Tuple[str, ...]] = None) -> Tuple[go.Figure, List[str]]:
+        """Build the network figure; returns it with the node order of the node trace."""
+        view = None
+        if lod is not None:
+            # Nível de detalhe: atores das comunidades expandidas + super-nós
+            view = self.get_lod_view(lod)
+            subgraph = view.graph.subgraph(view.actors)
+            if layout_type not in ('spring', 'circular', 'random', 'kamada_kawai'):
+                layout_type = 'spring'
+            pos = get_layout_cache().get_layout(view.graph, layout_type)
         # Filter by cluster if specified
-        if filter_by_cluster and filter_by_cluster in self.clusters:
+        elif filter_by_cluster and filter_by_cluster in self.clusters:
             cluster_nodes = self.clusters[filter_by_cluster]['nodes']
             subgraph = self.graph.subgraph(cluster_nodes)
             pos = self._calculate_layout(layout_type)
@@ -201,17 +376,20 @@ class EcosystemNetworkRenderer:
         # Get node colors and sizes for the current subgraph
         subgraph_nodes = list(subgraph.nodes())
 
-        # Use consistent color mapping
-        self.current_color_map = self._get_consistent_color_mapping(subgraph_nodes, color_by)
+        # WebGL para redes grandes (o SVG trava o navegador com centenas de nós)
+        use_webgl = len(subgraph_nodes) > SCATTERGL_NODE_THRESHOLD
+        scatter = go.Scattergl if use_webgl else go.Scatter
+
+        # Use consistent color mapping (over the whole graph in the LOD view, so
+        # colors stay the same when communities are expanded)
+        color_nodes = list(self.graph.nodes()) if view is not None else subgraph_nodes
+        self.current_color_map = self._get_consistent_color_mapping(color_nodes, color_by)
 
         # Get colors for subgraph nodes only
         node_colors = []
         for node_id in subgraph_nodes:
-            node = self.node_data[node_id]
-            if color_by in node.get('attributes', {}):
-                color_value = str(node['attributes'][color_by])
-            else:
-                color_value = 'Unknown'
+            color_value = self._node_attribute(node_id, color_by)
+            color_value = 'Unknown' if color_value is None else str(color_value)
 
             if color_value in self.current_color_map:
                 node_colors.append(self.current_color_map[color_value])
@@ -220,16 +398,20 @@ class EcosystemNetworkRenderer:
 
         # Get node sizes for subgraph nodes only
         node_sizes = []
-        for node_id in subgraph_nodes:
-            node = self.node_data[node_id]
-            if node_size_by in node.get('attributes', {}):
-                size_val = node['attributes'][node_size_by]
+        if node_size_by in METRIC_ATTRIBUTES:
+            # Computed metrics: min-max scaled over the whole graph to 10-40
+            values = self.get_metrics().nodes[node_size_by].astype(float)
+            span = values.max() - values.min()
+            for node_id in subgraph_nodes:
+                scaled = (values[node_id] - values.min()) / span if span > 0 else 0.5
+                node_sizes.append(10 + 30 * scaled)
+        else:
+            for node_id in subgraph_nodes:
+                size_val = self._node_attribute(node_id, node_size_by)
                 if isinstance(size_val, (int, float)):
                     node_sizes.append(max(10, size_val * 5))  # Scale size
                 else:
                     node_sizes.append(20)
-            else:
-                node_sizes.append(20)
 
         # Create figure
         fig = go.Figure()
@@ -243,7 +425,7 @@ class EcosystemNetworkRenderer:
             edge_x.extend([x0, x1, None])
             edge_y.extend([y0, y1, None])
 
-        fig.add_trace(go.Scatter(
+        fig.add_trace(scatter(
             x=edge_x, y=edge_y,
             line=dict(width=1, color='rgba(136,136,136,0.5)'),
             hoverinfo='none',
@@ -268,21 +450,16 @@ class EcosystemNetworkRenderer:
             edge_mid_x.append(mid_x)
             edge_mid_y.append(mid_y)
 
-            # Find edge data
-            edge_data = None
-            for edge_id, data in self.edge_data.items():
-                if (data['source'] == edge[0] and data['target'] == edge[1]) or \
-                        (data['source'] == edge[1] and data['target'] == edge[0]):
-                    edge_data = data
-                    break
+            # Find edge data (all parallel relationships)
+            edge_records = self.get_edge_records(edge[0], edge[1])
 
             # Create hover text and label for this edge
-            if edge_data:
-                hover_text = self._create_edge_hover_text(edge_data)
+            if edge_records:
+                hover_text = "<br>".join(self._create_edge_hover_text(data) for data in edge_records)
                 source_name = self.node_data[edge[0]]['name']
                 target_name = self.node_data[edge[1]]['name']
                 full_hover = f"<b>{source_name} ↔ {target_name}</b><br>{hover_text}"
-                edge_labels.append(edge_data['type'])
+                edge_labels.append(", ".join(data['type'] for data in edge_records))
             else:
                 source_name = self.node_data[edge[0]]['name']
                 target_name = self.node_data[edge[1]]['name']
@@ -293,7 +470,7 @@ class EcosystemNetworkRenderer:
 
         # Add edge hover points (invisible markers at edge midpoints)
         if edge_mid_x:  # Only add if there are edges
-            fig.add_trace(go.Scatter(
+            fig.add_trace(scatter(
                 x=edge_mid_x,
                 y=edge_mid_y,
                 mode='markers',
@@ -304,15 +481,19 @@ class EcosystemNetworkRenderer:
                 name='Edge Info'
             ))
 
+        if view is not None and view.super_nodes:
+            self._add_super_node_traces(fig, view, pos, scatter, color_by)
+
         # Add nodes
         node_x = [pos[node][0] for node in subgraph.nodes()]
         node_y = [pos[node][1] for node in subgraph.nodes()]
         node_text = [self.node_data[node]['name'] for node in subgraph.nodes()]
         hover_text = [self._create_node_hover_text(node) for node in subgraph.nodes()]
 
-        fig.add_trace(go.Scatter(
+        fig.add_trace(scatter(
             x=node_x, y=node_y,
-            mode='markers+text',
+            # Rótulos fixos só em redes pequenas; nas grandes o nome fica no hover
+            mode='markers' if use_webgl else 'markers+text',
             hoverinfo='text',
             hovertext=hover_text,
             text=node_text,
@@ -355,30 +536,93 @@ class EcosystemNetworkRenderer:
             plot_bgcolor='white'
         )
 
-        return fig
+        return fig, subgraph_nodes
+
+    def _add_super_node_traces(self, fig: go.Figure, view: LodView, pos: Dict, scatter, color_by: str) -> None:
+        """Add the aggregated edges and the community super-nodes of a LOD view."""
+        # Arestas ligadas a super-nós, com espessura pelo peso agregado
+        by_width: Dict[int, Tuple[List, List]] = {}
+        mid_x, mid_y, hover = [], [], []
+        for u, v, weight in view.graph.edges(data='weight'):
+            if u not in view.super_nodes and v not in view.super_nodes:
+                continue
+            (x0, y0), (x1, y1) = pos[u], pos[v]
+            xs, ys = by_width.setdefault(min(4, 1 + int(np.log2(max(weight, 1)))), ([], []))
+            xs.extend([x0, x1, None])
+            ys.extend([y0, y1, None])
+            mid_x.append((x0 + x1) / 2)
+            mid_y.append((y0 + y1) / 2)
+            hover.append(f"<b>{self._lod_label(view, u)} ↔ {self._lod_label(view, v)}</b><br>"
+                         f"{int(weight)} conexões")
+
+        for width, (xs, ys) in sorted(by_width.items()):
+            fig.add_trace(scatter(
+                x=xs, y=ys,
+                line=dict(width=width, color='rgba(136,136,136,0.4)'),
+                hoverinfo='none',
+                mode='lines',
+                showlegend=False,
+                name='Community connections'
+            ))
+        if mid_x:
+            fig.add_trace(scatter(
+                x=mid_x, y=mid_y,
+                mode='markers',
+                marker=dict(size=8, color='rgba(0,0,0,0)'),
+                hoverinfo='text',
+                hovertext=hover,
+                showlegend=False,
+                name='Community connection info'
+            ))
+
+        super_nodes = list(view.super_nodes.values())
+        largest = max(sn.total_members for sn in super_nodes)
+        colors = [self.current_color_map.get(sn.community, '#BBBBBB') if color_by == 'community' else '#BBBBBB'
+                  for sn in super_nodes]
+        fig.add_trace(scatter(
+            x=[pos[sn.id][0] for sn in super_nodes],
+            y=[pos[sn.id][1] for sn in super_nodes],
+            mode='markers+text',
+            text=[sn.label for sn in super_nodes],
+            textposition="middle center",
+            hoverinfo='text',
+            hovertext=[f"<b>Comunidade {sn.community}</b><br>"
+                       f"Atores ocultos: {len(sn.members)} de {sn.total_members}<br>"
+                       f"Conexões internas: {sn.internal_edges}<br>"
+                       f"Clique para expandir" for sn in super_nodes],
+            marker=dict(
+                color=colors,
+                size=[20 + 40 * np.sqrt(sn.total_members / largest) for sn in super_nodes],
+                symbol='circle',
+                line=dict(width=3, color='DarkSlateGrey')
+            ),
+            customdata=[sn.id for sn in super_nodes],
+            showlegend=False,
+            name='Communities'
+        ))
+
+    def _lod_label(self, view: LodView, node_id: str) -> str:
+        if node_id in view.super_nodes:
+            return f"Comunidade {view.super_nodes[node_id].community}"
+        return self.node_data[node_id]['name']
 
     def get_network_statistics(self) -> Dict:
         """Get basic network statistics."""
         if self.graph is None:
             return {}
 
-        stats = {
-            'num_nodes': self.graph.number_of_nodes(),
-            'num_edges': self.graph.number_of_edges(),
-            'density': nx.density(self.graph),
-            'avg_clustering': nx.average_clustering(self.graph),
-            'num_clusters': len(self.clusters)
-        }
+        # Precomputed once per graph version by the metrics service
+        metrics = self.get_metrics()
+        stats = dict(metrics.summary)
+        stats['num_clusters'] = len(self.clusters)
 
         # Centrality measures
-        try:
-            betweenness = nx.betweenness_centrality(self.graph)
-            degree_centrality = nx.degree_centrality(self.graph)
-
-            stats['most_central_actor'] = max(betweenness.items(), key=lambda x: x[1])
-            stats['most_connected_actor'] = max(degree_centrality.items(), key=lambda x: x[1])
-        except:
-            pass
+        most_central = metrics.top('betweenness')
+        most_connected = metrics.top('degree_centrality')
+        if most_central:
+            stats['most_central_actor'] = most_central
+        if most_connected:
+            stats['most_connected_actor'] = most_connected
 
         return stats
 
@@ -427,6 +671,17 @@ class EcosystemNetworkRenderer:
             "Escala de Impacto": attrs.get('impact_scale', 'N/A')
         }
 
+        # Métricas da rede (pré-calculadas por versão do grafo)
+        metrics = self.get_metrics().nodes
+        if node_id in metrics.index:
+            row = metrics.loc[node_id]
+            info_data.update({
+                METRIC_ATTRIBUTES['degree_centrality']: f"{row['degree_centrality']:.3f}",
+                METRIC_ATTRIBUTES['betweenness']: f"{row['betweenness']:.3f}",
+                METRIC_ATTRIBUTES['pagerank']: f"{row['pagerank']:.4f}",
+                METRIC_ATTRIBUTES['community']: row['community'],
+            })
+
         # Exibir como tabela
         info_df = pd.DataFrame(list(info_data.items()), columns=["Atributo", "Valor"])
         st.dataframe(info_df, hide_index=True)
@@ -529,6 +784,10 @@ class EcosystemNetworkRenderer:
 
         #st.divider()
 
+        # Handle click events: the selection of the last click is read before
+        # the controls so a click on a community expands it in this same run
+        self._update_selected_node(st.session_state.get("network_chart"))
+
         # Sidebar controls
         st.markdown("🎛️ Controles de visualização")
 
@@ -543,13 +802,15 @@ class EcosystemNetworkRenderer:
         with col_controls[1]:
             color_by = st.selectbox(
                 "Colorir por",
-                ['main_city', 'impact_scale', 'leadership_type', 'relevance_degree'],
+                ['main_city', 'impact_scale', 'leadership_type', 'relevance_degree', 'community', 'core_number'],
+                format_func=lambda x: METRIC_ATTRIBUTES.get(x, x),
                 index=0
             )
         with col_controls[2]:
             node_size_by = st.selectbox(
                 "Tamanho por",
-                ['relevance_degree', 'impact_scale'],
+                ['relevance_degree', 'impact_scale', 'degree_centrality', 'betweenness', 'pagerank'],
+                format_func=lambda x: METRIC_ATTRIBUTES.get(x, x),
                 index=0
             )
         with col_controls[3]:
@@ -566,28 +827,43 @@ class EcosystemNetworkRenderer:
             if 'selected_node' not in st.session_state:
                 st.session_state.selected_node = None
 
+        # Nível de detalhe: redes acima do orçamento são sempre agrupadas
+        large_network = self.graph.number_of_nodes() > NODE_BUDGET
+        col_lod = st.columns([1, 3])
+        with col_lod[0]:
+            aggregate = st.toggle("Agrupar por comunidade", value=large_network, disabled=large_network,
+                                  key="network_aggregate")
+        expanded = ()
+        if (aggregate or large_network) and filter_cluster is None:
+            with col_lod[1]:
+                communities = sorted(self.get_metrics().nodes['community'].unique())
+                expanded = tuple(st.multiselect(
+                    "Comunidades expandidas",
+                    options=communities,
+                    key="network_expanded",
+                    help="Clique em uma comunidade na rede para expandi-la"
+                ))
+
         col_map, col_detail = st.columns([3, 1])
         with col_map:
             # Display network
             st.markdown("Legenda cores")
             self.create_color_legend(color_by, filter_cluster)
+
             fig = self.render_network(
                 layout_type=layout_type,
                 color_by=color_by,
                 node_size_by=node_size_by,
                 filter_by_cluster=filter_cluster,
                 width=1200,
-                height=800
+                height=800,
+                selected_node=st.session_state.selected_node,
+                aggregate=aggregate,
+                expanded=expanded
             )
 
-            # Handle click events
-            clicked_data = st.plotly_chart(fig, use_container_width=True, on_select="rerun", selection_mode="points")
-            # Check if a node was clicked
-            if clicked_data and 'selection' in clicked_data and 'points' in clicked_data['selection']:
-                if clicked_data['selection']['points']:
-                    point = clicked_data['selection']['points'][0]
-                    if 'customdata' in point:
-                        st.session_state.selected_node = point['customdata']
+            st.plotly_chart(fig, use_container_width=True, on_select="rerun",
+                            selection_mode="points", key="network_chart")
 
 
             # with stat_cols[5]:
@@ -605,6 +881,27 @@ class EcosystemNetworkRenderer:
 
 
 
+    @staticmethod
+    def _update_selected_node(clicked_data) -> None:
+        """
+        Store the clicked node id (customdata of the node trace) in the session;
+        a click on a community super-node adds it to the expanded communities.
+        """
+        # Check if a node was clicked
+        if clicked_data and 'selection' in clicked_data and 'points' in clicked_data['selection']:
+            points = clicked_data['selection']['points']
+            clicked = points[0].get('customdata') if points else None
+            if clicked is None or not is_super_node(clicked):
+                st.session_state.pop('network_last_expanded', None)
+                if clicked is not None:
+                    st.session_state.selected_node = clicked
+            elif st.session_state.get('network_last_expanded') != clicked:
+                # A seleção persiste entre reruns: expandir só uma vez por clique
+                st.session_state.network_last_expanded = clicked
+                expanded = list(st.session_state.get('network_expanded', []))
+                if community_of(clicked) not in expanded:
+                    st.session_state.network_expanded = expanded + [community_of(clicked)]
+
     def create_detail_panel(self, filter_cluster):
         st.info("💡 **Dica:** Clique em qualquer nó da rede para visualizar as informações detalhadas do mesmo!")
 
@@ -652,11 +949,8 @@ class EcosystemNetworkRenderer:
         color_values = []
         for node_id in nodes:
             node = self.node_data[node_id]
-            if color_by in node.get('attributes', {}):
-                color_value = str(node['attributes'][color_by])
-            else:
-                color_value = 'Unknown'
-            color_values.append(color_value)
+            color_value = self._node_attribute(node_id, color_by)
+            color_values.append('Unknown' if color_value is None else str(color_value))
 
         unique_color_values = sorted(list(set(color_values)))
 
@@ -0,0 +1,210 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import cached_property
+from typing import Dict, Any, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Escala padrão de severidade e probabilidade (1 a RISK_SCALE)
+RISK_SCALE = 5
+
+PRIORITY_LEVELS = ('Crítica', 'Significativa', 'Moderada', 'Baixa')
+
+# Valor mínimo (severidade × probabilidade) de cada prioridade, usado quando o risco não tem prioridade
+PRIORITY_THRESHOLDS = ((16, 'Crítica'), (12, 'Significativa'), (6, 'Moderada'))
+
+DEFAULT_MATRIX = 'produto'
+
+TEXT_COLUMNS = ('id', 'risco', 'descricao', 'mitigacao')
+CATEGORY_COLUMNS = ('categoria', 'municipio')
+
+# Colunas com índice de posições (além dos stakeholders)
+INDEXED_COLUMNS = ('categoria', 'prioridade', 'municipio')
+
+
+def product_matrix(scale: int = RISK_SCALE) -> np.ndarray:
+    """Matriz severidade × probabilidade (linha = severidade, coluna = probabilidade)"""
+    levels = np.arange(1, scale + 1, dtype=float)
+    return np.outer(levels, levels)
+
+
+def classify_priority(values: np.ndarray) -> np.ndarray:
+    """Prioridade a partir do valor de risco, conforme PRIORITY_THRESHOLDS"""
+    return np.select([values >= limit for limit, _ in PRIORITY_THRESHOLDS],
+                     [label for _, label in PRIORITY_THRESHOLDS], default=PRIORITY_LEVELS[-1])
+
+
+def _parse_matrices(raw: Any, scale: int) -> Dict[str, Tuple[str, np.ndarray]]:
+    """Matriz padrão mais as matrizes personalizadas do arquivo (as de formato inválido são ignoradas)"""
+    matrices = {DEFAULT_MATRIX: ('Severidade × Probabilidade', product_matrix(scale))}
+    for name, spec in (raw or {}).items():
+        try:
+            values = np.asarray(spec['valores'], dtype=float)
+        except (KeyError, TypeError, ValueError):
+            values = None
+        if values is None or values.shape != (scale, scale):
+            print(f"{datetime.now().isoformat()} - Matriz de risco '{name}' ignorada: esperado {scale}x{scale}")
+            continue
+        matrices[name] = (spec.get('rotulo') or name, values)
+    return matrices
+
+
+def _stakeholder_lists(values: pd.Series) -> List[List[str]]:
+    """Aceita listas ou textos separados por vírgula"""
+    lists = []
+    for value in values:
+        if isinstance(value, str):
+            value = value.split(',')
+        elif not isinstance(value, (list, tuple)):
+            value = []
+        lists.append([str(item).strip() for item in value if str(item).strip()])
+    return lists
+
+
+@dataclass(frozen=True)
+class RiskRegister:
+    """Registro de riscos em formato colunar, com pontuação vetorizada e índices.
+
+    `data` tem um risco por linha (severidade e probabilidade inteiras,
+    categoria/prioridade/município categóricos e os stakeholders em texto);
+    `stakeholder_links` liga cada posição de risco a cada stakeholder. O
+    valor de risco de uma matriz é uma indexação `matriz[sev - 1, prob - 1]`
+    sobre todas as linhas, e os filtros combinam os índices de posições por
+    categoria, prioridade, município e stakeholder.
+    """
+    data: pd.DataFrame
+    stakeholder_links: pd.DataFrame  # posicao, stakeholder
+    matrices: Mapping[str, Tuple[str, np.ndarray]]
+    metadata: Mapping[str, Any] = field(default_factory=dict)
+    scale: int = RISK_SCALE
+    version: str = ''
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def matrix_labels(self) -> Dict[str, str]:
+        return {name: label for name, (label, _) in self.matrices.items()}
+
+    @property
+    def categories(self) -> List[str]:
+        return sorted(self._indexes['categoria'])
+
+    @property
+    def priorities(self) -> List[str]:
+        return [level for level in self.data['prioridade'].cat.categories if level in self._indexes['prioridade']]
+
+    @property
+    def stakeholders(self) -> List[str]:
+        return sorted(self._indexes['stakeholder'])
+
+    @cached_property
+    def scores(self) -> pd.DataFrame:
+        """Valor de risco de cada risco em cada matriz (riscos × matrizes)"""
+        rows = self.data['severidade'].to_numpy(dtype=np.intp) - 1
+        cols = self.data['probabilidade'].to_numpy(dtype=np.intp) - 1
+        return pd.DataFrame({name: values[rows, cols] for name, (_, values) in self.matrices.items()},
+                            index=self.data.index)
+
+    @cached_property
+    def _indexes(self) -> Dict[str, Dict[str, np.ndarray]]:
+        indexes = {
+            column: self.data.groupby(column, observed=True, sort=False).indices for column in INDEXED_COLUMNS
+        }
+        links = self.stakeholder_links
+        groups = links.groupby('stakeholder', observed=True, sort=False).indices
+        indexes['stakeholder'] = {name: links['posicao'].to_numpy()[rows] for name, rows in groups.items()}
+        return indexes
+
+    def positions(self, column: str, values: Iterable[str]) -> np.ndarray:
+        """Posições dos riscos com algum dos valores na coluna indexada (ou 'stakeholder')"""
+        index = self._indexes[column]
+        parts = [index[value] for value in values if value in index]
+        return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.intp)
+
+    def mask(self, categories: Optional[Iterable[str]] = None, priorities: Optional[Iterable[str]] = None,
+             stakeholders: Optional[Iterable[str]] = None,
+             municipalities: Optional[Iterable[str]] = None) -> np.ndarray:
+        """Máscara dos riscos que atendem a todos os filtros informados (None = sem filtro)"""
+        selected = np.ones(len(self.data), dtype=bool)
+        filters = (('categoria', categories), ('prioridade', priorities),
+                   ('stakeholder', stakeholders), ('municipio', municipalities))
+        for column, values in filters:
+            if values is not None:
+                allowed = np.zeros(len(self.data), dtype=bool)
+                allowed[self.positions(column, values)] = True
+                selected &= allowed
+        return selected
+
+    def select(self, categories: Optional[Iterable[str]] = None, priorities: Optional[Iterable[str]] = None,
+               stakeholders: Optional[Iterable[str]] = None, municipalities: Optional[Iterable[str]] = None,
+               min_value: Optional[float] = None, matrix: str = DEFAULT_MATRIX) -> pd.DataFrame:
+        """Riscos filtrados com a coluna `valor_risco` da matriz escolhida"""
+        selected = self.mask(categories, priorities, stakeholders, municipalities)
+        values = self.scores[matrix].to_numpy()
+        if min_value is not None:
+            selected &= values >= min_value
+        frame = self.data[selected].copy()
+        frame['valor_risco'] = values[selected]
+        return frame
+
+
+def parse_risk_register(raw: Mapping[str, Any], version: str = '') -> Optional[RiskRegister]:
+    """Monta o RiskRegister a partir do arquivo de riscos (metadata, matrizes, riscos)
+
+    Riscos sem severidade/probabilidade válidas na escala são descartados;
+    riscos sem prioridade são classificados pelo valor severidade × probabilidade.
+    """
+    if not isinstance(raw, Mapping) or not isinstance(raw.get('riscos'), list):
+        return None
+
+    metadata = dict(raw.get('metadata') or {})
+    scale = int(metadata.get('escala', RISK_SCALE))
+    records = [record for record in raw['riscos'] if isinstance(record, Mapping)]
+    columns = TEXT_COLUMNS + CATEGORY_COLUMNS + ('severidade', 'probabilidade', 'prioridade', 'stakeholders')
+    frame = pd.DataFrame.from_records(records).reindex(columns=list(columns))
+
+    severity = pd.to_numeric(frame['severidade'], errors='coerce')
+    probability = pd.to_numeric(frame['probabilidade'], errors='coerce')
+    valid = severity.between(1, scale) & probability.between(1, scale) & frame['risco'].notna()
+    if not valid.all():
+        print(f"{datetime.now().isoformat()} - {int((~valid).sum())} riscos ignorados por severidade ou "
+              f"probabilidade fora da escala 1-{scale}")
+    frame = frame[valid].reset_index(drop=True)
+    severity = severity[valid].to_numpy(dtype=np.int8)
+    probability = probability[valid].to_numpy(dtype=np.int8)
+
+    priority = frame['prioridade'].where(frame['prioridade'].notna(),
+                                         pd.Series(classify_priority(severity * probability.astype(int))))
+    levels = list(PRIORITY_LEVELS) + sorted(set(priority.dropna()) - set(PRIORITY_LEVELS))
+    stakeholder_lists = _stakeholder_lists(frame['stakeholders'])
+    ids = frame['id'].where(frame['id'].notna(), pd.Series([f"R{i + 1:03d}" for i in range(len(frame))]))
+
+    data = pd.DataFrame({
+        'id': ids.astype(str),
+        'categoria': frame['categoria'].astype('category'),
+        'risco': frame['risco'].astype(str),
+        'severidade': severity,
+        'probabilidade': probability,
+        'prioridade': pd.Categorical(priority, categories=levels, ordered=True),
+        'descricao': frame['descricao'].fillna('').astype(str),
+        'stakeholders': [', '.join(names) for names in stakeholder_lists],
+        'mitigacao': frame['mitigacao'].fillna('').astype(str),
+        'municipio': frame['municipio'].astype('category'),
+    })
+
+    counts = np.array([len(names) for names in stakeholder_lists], dtype=np.intp)
+    links = pd.DataFrame({
+        'posicao': np.repeat(np.arange(len(data)), counts),
+        'stakeholder': pd.Categorical([name for names in stakeholder_lists for name in names]),
+    })
+
+    return RiskRegister(
+        data=data,
+        stakeholder_links=links,
+        matrices=_parse_matrices(raw.get('matrizes'), scale),
+        metadata=metadata,
+        scale=scale,
+        version=version,
+    )
@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.nm.job_runner import report_progress
+
+BASE_YEAR = 2024
+DEFAULT_RUNS = 10000
+DEFAULT_SEED = 42
+PERCENTILES = (5, 50, 95)
+
+# Volatilidade anual padrão (desvio dos choques de crescimento, em %/ano)
+DEFAULT_VOLATILITY = 3.0
+
+# Grupos de indicadores que compartilham o mesmo parâmetro de crescimento;
+# os choques de uma trajetória são comuns aos indicadores do grupo na cidade
+GROUPS = ('economic', 'innovation', 'sustainability', 'social', 'other')
+
+# Elementos por bloco de cidades no array (execuções, anos, cidades, grupos):
+# limita a memória da simulação independentemente do número de cidades
+BLOCK_BUDGET = 4_000_000
+
+
+def metric_group(column: str) -> str:
+    """Grupo de crescimento de um indicador (mesmas regras do simulador original)"""
+    if 'faturamento' in column or 'pib' in column:
+        return 'economic'
+    if 'inovacao' in column or 'ecommerce' in column:
+        return 'innovation'
+    if 'ambiental' in column or 'energia' in column:
+        return 'sustainability'
+    if 'idh' in column or 'pobreza' in column:
+        return 'social'
+    return 'other'
+
+
+def group_growth_rates(params: Dict[str, float]) -> np.ndarray:
+    """Taxa anual média de cada grupo a partir dos parâmetros do cenário"""
+    return np.array([
+        params['economic_growth'] / 100,
+        params['innovation_factor'] - 1,
+        params['sustainability_improvement'] / 100,
+        params['social_development'] / 100,
+        params['economic_growth'] / 200,  # Crescimento mais conservador
+    ])
+
+
+@dataclass(frozen=True)
+class ScenarioResult:
+    """Bandas de percentis das trajetórias simuladas.
+
+    `bands` tem forma (percentis, anos, cidades, indicadores), na ordem de
+    `PERCENTILES`, `years`, `cities` e `metrics`.
+    """
+    years: np.ndarray
+    cities: Tuple[str, ...]
+    metrics: Tuple[str, ...]
+    bands: np.ndarray
+    runs: int
+    seed: int
+    params: Dict[str, float]
+
+    def band(self, percentile: int) -> np.ndarray:
+        return self.bands[PERCENTILES.index(percentile)]
+
+    def city_frame(self, city: str) -> pd.DataFrame:
+        """Formato longo de uma cidade: year, metric, p5, p50, p95"""
+        c = self.cities.index(city)
+        years, metrics = np.meshgrid(self.years, np.array(self.metrics, dtype=object), indexing='ij')
+        frame = pd.DataFrame({'year': years.ravel(), 'metric': metrics.ravel()})
+        for i, p in enumerate(PERCENTILES):
+            frame[f'p{p}'] = self.bands[i, :, c, :].ravel()
+        return frame
+
+    def median_frame(self, city: str) -> pd.DataFrame:
+        """Trajetória mediana de uma cidade: uma linha por ano, uma coluna por indicador"""
+        c = self.cities.index(city)
+        frame = pd.DataFrame(self.band(50)[:, c, :], columns=list(self.metrics))
+        frame.insert(0, 'year', self.years)
+        return frame
+
+
+def simulate_scenarios(df: pd.DataFrame, metrics: Sequence[str], params: Dict[str, float],
+                       years: int, runs: int = DEFAULT_RUNS, seed: int = DEFAULT_SEED,
+                       volatility: Optional[float] = None, city_column: str = 'cidade') -> ScenarioResult:
+    """Simula `runs` trajetórias para todas as cidades e indicadores.
+
+    Cada trajetória compõe, ano a ano, a taxa do grupo do indicador mais um
+    choque normal de desvio `volatility` (%/ano). Os choques são sorteados
+    por (execução, ano, cidade, grupo) em blocos de cidades de até
+    `BLOCK_BUDGET` elementos, e os percentis de cada indicador saem dos
+    percentis dos fatores de crescimento acumulados multiplicados pelo valor
+    base (exato, pois a escala é monotônica; valores negativos invertem a banda).
+    No JobRunner, cada bloco informa o progresso e atende ao cancelamento.
+    """
+    volatility = params.get('volatility', DEFAULT_VOLATILITY) if volatility is None else volatility
+    metrics = [m for m in metrics if m in df.columns]
+    cities = tuple(df[city_column].astype(str))
+    base = df[metrics].to_numpy(dtype=float)                        # (cidades, indicadores)
+    group_index = np.array([GROUPS.index(metric_group(m)) for m in metrics], dtype=int)
+
+    # Só os grupos usados pelos indicadores recebem choques
+    groups, group_index = np.unique(group_index, return_inverse=True)
+    rng = np.random.default_rng(seed)
+    rates = group_growth_rates(params)[groups]                      # (grupos,)
+    factor_bands = np.empty((len(PERCENTILES), years + 1, len(cities), len(groups)))
+
+    # Os percentis precisam de todas as execuções de uma cidade: o bloco é de cidades
+    block = max(1, BLOCK_BUDGET // max(runs * (years + 1) * len(groups), 1))
+    for start in range(0, len(cities), block):
+        stop = min(start + block, len(cities))
+        shocks = rng.normal(0.0, volatility / 100, size=(runs, years, stop - start, len(groups)))
+        growth = np.maximum(1 + rates + shocks, 0.0)                # sem valores negativos
+        factors = np.ones((runs, years + 1, stop - start, len(groups)))
+        np.cumprod(growth, axis=1, out=factors[:, 1:])
+        factor_bands[:, :, start:stop] = np.percentile(factors, PERCENTILES, axis=0)
+        report_progress(stop / len(cities))  # Também interrompe o job se o cancelamento foi pedido
+
+    bands = factor_bands[..., group_index] * base[np.newaxis, np.newaxis, :, :]
+    negative = base < 0
+    if negative.any():
+        bands[:, :, negative] = bands[::-1][:, :, negative]
+
+    return ScenarioResult(
+        years=BASE_YEAR + np.arange(years + 1),
+        cities=cities,
+        metrics=tuple(metrics),
+        bands=bands,
+        runs=runs,
+        seed=seed,
+        params=dict(params, volatility=volatility),
+    )
@@ -0,0 +1,83 @@
+import hashlib
+import json
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import streamlit as st
+
+from src.nm.ontology_store import OntologyStore
+
+
+class StakeholderDirectory:
+    """Relaciona os stakeholders recomendados no catálogo de oportunidades aos atores da ontologia.
+
+    Cada nome do catálogo é resolvido uma única vez pelo índice de nomes do
+    store (com aproximação), e o diretório mantém o caminho inverso: as
+    oportunidades em que cada ator é recomendado.
+    """
+
+    def __init__(self, store: OntologyStore, opportunities: Sequence[Dict[str, Any]]):
+        self.store = store
+        self._resolved: Dict[str, Optional[int]] = {}
+        self._opportunities: Dict[int, List[str]] = {}
+
+        for opp in opportunities:
+            for name in opp.get('stakeholders_recomendados', []):
+                if name not in self._resolved:
+                    self._resolved[name] = store.name_index.match(name)
+                position = self._resolved[name]
+                if position is not None:
+                    opp_ids = self._opportunities.setdefault(position, [])
+                    if opp['id'] not in opp_ids:
+                        opp_ids.append(opp['id'])
+
+    def actor(self, name: str) -> Optional[Dict[str, Any]]:
+        """Registro do ator correspondente a um nome do catálogo"""
+        position = self._resolved.get(name)
+        if position is None and name not in self._resolved:
+            position = self.store.name_index.match(name)
+        return self.store.records[position] if position is not None else None
+
+    def info(self, name: str) -> Optional[Dict[str, Any]]:
+        """Resumo do ator usado na recomendação de stakeholders"""
+        actor = self.actor(name)
+        if actor is None:
+            return None
+        attrs = actor['attributes']
+        return {
+            'id': actor.get('id', ''),
+            'name': actor.get('name', ''),
+            'position': actor.get('position', ''),
+            'main_city': attrs.get('main_city', ''),
+            'activity_area': attrs.get('activity_area', ''),
+            'leadership_type': attrs.get('leadership_type', ''),
+            'relevance_degree': attrs.get('relevance_degree', ''),
+            'impact_scale': attrs.get('impact_scale', ''),
+            'main_contribution': attrs.get('main_contribution', '')
+        }
+
+    def opportunities_for(self, actor_id: str) -> List[str]:
+        """Ids das oportunidades em que o ator é recomendado"""
+        position = self.store.position(actor_id)
+        return list(self._opportunities.get(position, [])) if position is not None else []
+
+    @property
+    def unresolved(self) -> Tuple[str, ...]:
+        return tuple(name for name, position in self._resolved.items() if position is None)
+
+
+def catalogue_fingerprint(opportunities: Sequence[Dict[str, Any]]) -> str:
+    """Hash dos ids e stakeholders do catálogo de oportunidades"""
+    payload = [(opp['id'], list(opp.get('stakeholders_recomendados', []))) for opp in opportunities]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode()).hexdigest()
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _cached_directory(_store: OntologyStore, _opportunities: Sequence[Dict[str, Any]],
+                      store_version: str, catalogue: str) -> StakeholderDirectory:
+    return StakeholderDirectory(_store, _opportunities)
+
+
+def get_stakeholder_directory(store: OntologyStore, opportunities: Sequence[Dict[str, Any]]) -> StakeholderDirectory:
+    """Diretório compartilhado por versão da ontologia e do catálogo"""
+    return _cached_directory(store, opportunities, store.version or str(id(store)),
+                             catalogue_fingerprint(opportunities))
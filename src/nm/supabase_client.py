@@ -0,0 +1,174 @@
+import datetime
+import os
+import threading
+from typing import Any, Optional, Union
+
+import streamlit as st
+
+try:
+    import httpx
+    from postgrest import SyncPostgrestClient
+    from postgrest.utils import SyncClient
+    SUPABASE_AVAILABLE = True
+except ImportError:
+    SUPABASE_AVAILABLE = False
+    SyncPostgrestClient = None
+
+
+if SUPABASE_AVAILABLE:
+    class PooledPostgrestClient(SyncPostgrestClient):
+        """Cliente PostgREST cuja sessão HTTP mantém um pool de conexões keep-alive"""
+
+        def __init__(self, base_url: str, *, limits: httpx.Limits,
+                     transport: Optional[httpx.BaseTransport] = None, **kwargs):
+            self._limits = limits
+            self._transport = transport
+            super().__init__(base_url, **kwargs)
+
+        def create_session(self, base_url, headers, timeout, verify=True, proxy=None) -> SyncClient:
+            return SyncClient(
+                base_url=base_url,
+                headers=headers,
+                timeout=timeout,
+                verify=verify,
+                proxy=proxy,
+                follow_redirects=True,
+                http2=True,
+                limits=self._limits,
+                transport=self._transport,
+            )
+
+
+class SupabaseClientFactory:
+    """Fábrica do cliente Supabase (PostgREST) compartilhado pelo processo.
+
+    O cliente é criado sob demanda, uma única vez, e reaproveitado por todas
+    as sessões e threads; a sessão httpx subjacente mantém as conexões abertas
+    (keep-alive) em vez de abrir uma conexão TLS por operação.
+
+    URL e chave vêm, nesta ordem, dos argumentos (ou de `configure`), das
+    variáveis de ambiente SUPABASE_URL/SUPABASE_KEY e de `st.secrets`; assim
+    a fábrica pode apontar para um servidor HTTP local que simula o PostgREST.
+    `transport` substitui o transporte httpx (por exemplo, `httpx.MockTransport`).
+    """
+
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None,
+                 timeout: Union[int, float] = 10, max_connections: int = 10,
+                 max_keepalive_connections: int = 5, keepalive_expiry: float = 60.0,
+                 transport: Optional[Any] = None):
+        self.url = url
+        self.key = key
+        self.transport = transport
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self._client: Optional[SyncPostgrestClient] = None
+        self._secrets_loaded = False
+        self._lock = threading.Lock()
+
+    def configure(self, url: str, key: str, transport: Optional[Any] = None) -> None:
+        """Define o endpoint e a chave (e o transporte httpx), descartando o cliente atual"""
+        with self._lock:
+            self.url = url
+            self.key = key
+            self.transport = transport
+            self._close_locked()
+
+    @property
+    def configured(self) -> bool:
+        if self.url and self.key:
+            return True
+        self._load_secrets()
+        return bool(self.url and self.key)
+
+    def get_client(self) -> Optional[SyncPostgrestClient]:
+        """Retorna o cliente compartilhado (None se o Supabase não estiver disponível)"""
+        client = self._client
+        if client is not None:
+            return client
+
+        if not SUPABASE_AVAILABLE or not self.configured:
+            return None
+
+        with self._lock:
+            if self._client is None:
+                self._client = self._create_client()
+            return self._client
+
+    def health_check(self) -> bool:
+        """Verifica se o endpoint responde; em caso de falha o cliente é recriado"""
+        client = self.get_client()
+        if client is None:
+            return False
+        try:
+            response = client.session.get("/")
+            return response.status_code < 500
+        except Exception as e:
+            print(f"{datetime.datetime.now().isoformat()} - Supabase indisponível: {str(e)}")
+            self.reset(client)
+            return False
+
+    def reset(self, failed: Optional[SyncPostgrestClient] = None) -> None:
+        """Fecha a sessão atual; a próxima chamada a get_client reconecta.
+
+        Com `failed`, só reconecta se o cliente atual ainda for o que falhou
+        (outra thread pode já ter reconectado).
+        """
+        with self._lock:
+            if failed is None or failed is self._client:
+                self._close_locked()
+
+    def reset_if_disconnected(self, client: Optional[SyncPostgrestClient], error: Exception) -> None:
+        """Reconecta quando o erro é de transporte (conexão, timeout, TLS)"""
+        if SUPABASE_AVAILABLE and isinstance(error, httpx.TransportError):
+            self.reset(client)
+
+    def _create_client(self) -> SyncPostgrestClient:
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        return PooledPostgrestClient(
+            f"{self.url.rstrip('/')}/rest/v1",
+            headers={
+                "apiKey": self.key,
+                "Authorization": f"Bearer {self.key}",
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+            },
+            timeout=self.timeout,
+            limits=limits,
+            transport=self.transport,
+        )
+
+    def _close_locked(self) -> None:
+        if self._client is not None:
+            try:
+                self._client.session.close()
+            except Exception:
+                pass
+            self._client = None
+
+    def _load_secrets(self) -> None:
+        if self._secrets_loaded:
+            return
+        self._secrets_loaded = True
+        self.url = self.url or os.environ.get("SUPABASE_URL")
+        self.key = self.key or os.environ.get("SUPABASE_KEY")
+        if self.url and self.key:
+            return
+        try:
+            if "SUPABASE_URL" in st.secrets and "SUPABASE_KEY" in st.secrets:
+                self.url = self.url or st.secrets["SUPABASE_URL"]
+                self.key = self.key or st.secrets["SUPABASE_KEY"]
+        except Exception:
+            # Sem secrets configurados
+            pass
+
+
+@st.cache_resource(show_spinner=False)
+def get_supabase_factory() -> SupabaseClientFactory:
+    """Retorna a fábrica de clientes Supabase compartilhada pelo processo"""
+    return SupabaseClientFactory()
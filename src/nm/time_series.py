@@ -0,0 +1,157 @@
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, Any, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.nm.city_table import base_numeric_columns, build_city_facts
+
+# Ano a que se referem os valores atuais das tabelas de indicadores
+REFERENCE_YEAR = 2024
+
+# Colunas do arquivo histórico (formato longo)
+HISTORY_COLUMNS = ('cidade', 'indicador', 'ano', 'valor')
+
+
+def history_from_city_table(df: Optional[pd.DataFrame], year: int = REFERENCE_YEAR) -> pd.DataFrame:
+    """Valores atuais da tabela fato como observações do ano de referência"""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=list(HISTORY_COLUMNS))
+    columns = base_numeric_columns(df)
+    long = df[['cidade'] + columns].melt(id_vars='cidade', var_name='indicador', value_name='valor')
+    long['ano'] = year
+    return long.dropna(subset=['valor'])[list(HISTORY_COLUMNS)]
+
+
+def _normalize_history(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Valida o arquivo histórico e descarta linhas sem ano ou valor numérico"""
+    if df is None or df.empty or not set(HISTORY_COLUMNS).issubset(df.columns):
+        return pd.DataFrame(columns=list(HISTORY_COLUMNS))
+    history = df[list(HISTORY_COLUMNS)].copy()
+    history['ano'] = pd.to_numeric(history['ano'], errors='coerce')
+    history['valor'] = pd.to_numeric(history['valor'], errors='coerce')
+    return history.dropna(subset=['ano', 'valor'])
+
+
+@dataclass(frozen=True)
+class TimeSeriesStore:
+    """Séries anuais por (cidade, indicador, ano) em formato colunar.
+
+    As observações ficam ordenadas por (indicador, cidade, ano), com cidade e
+    indicador categóricos; `_slices` guarda o intervalo de linhas de cada par
+    (indicador, cidade), de modo que uma série é um recorte contíguo e um
+    intervalo de anos é uma busca binária dentro dele.
+    """
+    data: pd.DataFrame
+    version: str = ''
+
+    @classmethod
+    def build(cls, history: Optional[pd.DataFrame] = None, current: Optional[pd.DataFrame] = None,
+              version: str = '') -> 'TimeSeriesStore':
+        """Combina o histórico com os valores atuais (que prevalecem no mesmo ano)"""
+        frames = [_normalize_history(history), current if current is not None else history_from_city_table(None)]
+        data = pd.concat([frame for frame in frames if not frame.empty] or frames[:1], ignore_index=True)
+        data = data.drop_duplicates(['indicador', 'cidade', 'ano'], keep='last')
+        data = data.sort_values(['indicador', 'cidade', 'ano'], kind='stable').reset_index(drop=True)
+        data = pd.DataFrame({
+            'cidade': data['cidade'].astype(str).astype('category'),
+            'indicador': data['indicador'].astype(str).astype('category'),
+            'ano': data['ano'].astype(np.int16),
+            'valor': data['valor'].astype(float),
+        })
+        return cls(data=data, version=version)
+
+    @cached_property
+    def _slices(self) -> Dict[Tuple[str, str], Tuple[int, int]]:
+        indicators = self.data['indicador'].cat
+        cities = self.data['cidade'].cat
+        pairs = indicators.codes.to_numpy(dtype=np.int64) * len(cities.categories) + cities.codes.to_numpy()
+        starts = np.flatnonzero(np.diff(pairs, prepend=-1))
+        stops = np.append(starts[1:], len(pairs))
+        return {
+            (indicators.categories[indicators.codes.iat[start]], cities.categories[cities.codes.iat[start]]):
+                (int(start), int(stop))
+            for start, stop in zip(starts, stops)
+        }
+
+    @property
+    def indicators(self) -> List[str]:
+        return list(self.data['indicador'].cat.categories)
+
+    @property
+    def cities(self) -> List[str]:
+        return list(self.data['cidade'].cat.categories)
+
+    def years(self, indicator: Optional[str] = None) -> np.ndarray:
+        """Anos com observações (de um indicador ou de todos)"""
+        years = self.data['ano'] if indicator is None else self.data.loc[self.data['indicador'] == indicator, 'ano']
+        return np.unique(years.to_numpy())
+
+    def has_history(self, indicator: str, min_years: int = 2) -> bool:
+        """Se alguma cidade tem pelo menos `min_years` anos observados no indicador"""
+        return any(stop - start >= min_years for (ind, _), (start, stop) in self._slices.items() if ind == indicator)
+
+    def series(self, city: str, indicator: str, start: Optional[int] = None, end: Optional[int] = None) -> pd.Series:
+        """Série anual de uma cidade (índice = ano), restrita a [start, end]"""
+        bounds = self._slices.get((indicator, city))
+        if bounds is None:
+            return pd.Series(dtype=float, name=indicator)
+        lo, hi = bounds
+        years = self.data['ano'].to_numpy()[lo:hi]
+        if start is not None:
+            lo += int(np.searchsorted(years, start, side='left'))
+        if end is not None:
+            hi = bounds[0] + int(np.searchsorted(years, end, side='right'))
+        rows = self.data.iloc[lo:hi]
+        return pd.Series(rows['valor'].to_numpy(), index=rows['ano'].to_numpy(dtype=int), name=indicator)
+
+    def frame(self, indicator: str, cities: Optional[Iterable[str]] = None,
+              start: Optional[int] = None, end: Optional[int] = None) -> pd.DataFrame:
+        """Observações de um indicador em formato longo: cidade, ano, valor"""
+        cities = self.cities if cities is None else list(cities)
+        parts = []
+        for city in cities:
+            series = self.series(city, indicator, start, end)
+            if not series.empty:
+                parts.append(pd.DataFrame({'cidade': city, 'ano': series.index, 'valor': series.to_numpy()}))
+        if not parts:
+            return pd.DataFrame(columns=['cidade', 'ano', 'valor'])
+        return pd.concat(parts, ignore_index=True)
+
+    def wide(self, indicator: str, cities: Optional[Iterable[str]] = None,
+             start: Optional[int] = None, end: Optional[int] = None) -> pd.DataFrame:
+        """Uma linha por ano e uma coluna por cidade"""
+        frame = self.frame(indicator, cities, start, end)
+        return frame.pivot(index='ano', columns='cidade', values='valor')
+
+    def resample(self, indicator: str, step: int = 1, how: str = 'interpolate',
+                 cities: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Reamostra as séries em uma grade regular de anos.
+
+        `step=1` com `how='interpolate'` preenche os anos faltantes por
+        interpolação linear dentro do intervalo observado (sem extrapolar);
+        `step>1` agrega em períodos de `step` anos com `how` ('mean', 'last',
+        'first', 'sum'), rotulados pelo primeiro ano do período.
+        """
+        wide = self.wide(indicator, cities)
+        if wide.empty:
+            return wide
+        if step == 1 and how == 'interpolate':
+            grid = np.arange(wide.index.min(), wide.index.max() + 1)
+            return wide.reindex(grid).interpolate(method='index', limit_area='inside')
+        periods = wide.index - (wide.index - wide.index.min()) % step
+        return wide.groupby(periods).agg(how)
+
+
+def build_time_series_store(data: Mapping[str, Any], version: str = '',
+                            reference_year: int = REFERENCE_YEAR) -> TimeSeriesStore:
+    """Store a partir do histórico registrado (`historico`) e da tabela fato atual"""
+    facts = data.get('cidades')
+    if facts is None:
+        facts, _ = build_city_facts(data)
+    return TimeSeriesStore.build(
+        history=data.get('historico'),
+        current=history_from_city_table(facts, reference_year),
+        version=version
+    )
@@ -0,0 +1,135 @@
+from dataclasses import dataclass
+from itertools import combinations
+from math import comb
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.nm.composite_index import weighted_scores
+from src.nm.job_runner import report_progress
+
+SAMPLING_METHODS = {
+    'dirichlet': 'Dirichlet (aleatório)',
+    'grid': 'Grade regular',
+}
+
+DEFAULT_SAMPLES = 5000
+DEFAULT_SEED = 42
+TOP_K = 3
+
+# Esquemas de pesos avaliados por bloco (limita a memória de esquemas × cidades)
+CHUNK_SIZE = 2000
+
+
+def grid_weights(n_indicators: int, samples: int) -> np.ndarray:
+    """Pontos de uma grade regular no simplex de pesos (somam 1), com até `samples` pontos"""
+    if n_indicators == 1:
+        return np.ones((1, 1))
+    steps = 1
+    while comb(steps + n_indicators, n_indicators - 1) <= samples:
+        steps += 1
+    # Composições de `steps` em n partes: posições das barras entre as estrelas
+    bars = np.array(list(combinations(range(steps + n_indicators - 1), n_indicators - 1)), dtype=int)
+    bars = bars.reshape(len(bars), n_indicators - 1)
+    edges = np.column_stack([np.full(len(bars), -1), bars, np.full(len(bars), steps + n_indicators - 1)])
+    return (np.diff(edges, axis=1) - 1) / steps
+
+
+def sample_weights(base_weights: Sequence[float], samples: int = DEFAULT_SAMPLES, method: str = 'dirichlet',
+                   concentration: float = 1.0, seed: int = DEFAULT_SEED) -> np.ndarray:
+    """Esquemas de pesos (esquemas × indicadores), cada linha somando 1.
+
+    No Dirichlet, a média é o vetor de pesos base e `concentration` controla
+    a dispersão: 1 espalha uniformemente pelo simplex quando os pesos base
+    são iguais; valores maiores ficam mais perto dos pesos base.
+    """
+    base = np.asarray(base_weights, dtype=float)
+    base = base / base.sum()
+    if method == 'grid':
+        return grid_weights(len(base), samples)
+    rng = np.random.default_rng(seed)
+    return rng.dirichlet(np.clip(concentration * len(base) * base, 1e-3, None), size=samples)
+
+
+def ranks_from_scores(scores: np.ndarray) -> np.ndarray:
+    """Posição (1 = maior nota) de cada cidade em cada esquema; notas ausentes ficam no fim"""
+    order = np.argsort(-np.nan_to_num(scores, nan=-np.inf), axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(1, scores.shape[1] + 1), axis=1)
+    return ranks
+
+
+def _rank_percentile(counts: np.ndarray, q: float) -> np.ndarray:
+    """Percentil da posição de cada cidade a partir do histograma (cidades × posições)"""
+    cumulative = np.cumsum(counts, axis=1)
+    target = q * cumulative[:, -1:]
+    return np.argmax(cumulative >= np.maximum(target, 1), axis=1) + 1
+
+
+@dataclass(frozen=True)
+class SensitivityResult:
+    """Estabilidade do ranking sob variação dos pesos.
+
+    `rank_counts[c, r]` conta em quantos esquemas a cidade c ficou na posição
+    r + 1; `stats` resume, por cidade, a posição com os pesos base, a
+    probabilidade de ficar no top 1 e no top 3 e o intervalo de posições
+    (percentis 5 e 95).
+    """
+    cities: Tuple[str, ...]
+    indicators: Tuple[str, ...]
+    samples: int
+    method: str
+    seed: int
+    base_weights: np.ndarray
+    rank_counts: np.ndarray
+    stats: pd.DataFrame
+
+
+def run_weight_sensitivity(components: pd.DataFrame, base_weights: Optional[Sequence[float]] = None,
+                           samples: int = DEFAULT_SAMPLES, method: str = 'dirichlet', concentration: float = 1.0,
+                           seed: int = DEFAULT_SEED) -> SensitivityResult:
+    """Avalia o ranking em milhares de esquemas de pesos (executável no JobRunner).
+
+    `components` tem uma linha por cidade e uma coluna por indicador já
+    normalizado (como `CompositeIndex.components`). Os esquemas são avaliados
+    em blocos de `CHUNK_SIZE` com produtos de matrizes, e apenas o histograma
+    de posições é acumulado.
+    """
+    scores = components.to_numpy(dtype=float)
+    n_cities, n_indicators = scores.shape
+    base = np.ones(n_indicators) if base_weights is None else np.asarray(base_weights, dtype=float)
+    weights = sample_weights(base, samples, method, concentration, seed)
+
+    counts = np.zeros((n_cities, n_cities), dtype=np.int64)
+    city_index = np.arange(n_cities)
+    for start in range(0, len(weights), CHUNK_SIZE):
+        ranks = ranks_from_scores(weighted_scores(scores, weights[start:start + CHUNK_SIZE]))
+        np.add.at(counts, (np.broadcast_to(city_index, ranks.shape), ranks - 1), 1)
+        report_progress((start + len(ranks)) / len(weights))
+
+    total = counts.sum(axis=1)
+    positions = np.arange(1, n_cities + 1)
+    base_rank = ranks_from_scores(weighted_scores(scores, base[np.newaxis, :]))[0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_rank = (counts * positions).sum(axis=1) / total
+    stats = pd.DataFrame({
+        'cidade': components.index.astype(str),
+        'posicao_base': base_rank,
+        'posicao_media': mean_rank,
+        'posicao_p5': _rank_percentile(counts, 0.05),
+        'posicao_p95': _rank_percentile(counts, 0.95),
+        'prob_top1': counts[:, 0] / total,
+        f'prob_top{TOP_K}': counts[:, :TOP_K].sum(axis=1) / total,
+    }).sort_values(['posicao_base', 'posicao_media']).reset_index(drop=True)
+
+    return SensitivityResult(
+        cities=tuple(components.index.astype(str)),
+        indicators=tuple(components.columns.astype(str)),
+        samples=len(weights),
+        method=method,
+        seed=seed,
+        base_weights=base / base.sum(),
+        rank_counts=counts,
+        stats=stats,
+    )
@@ -2,14 +2,29 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import numpy as np
 
 from src.utils.page_utils import (Page, ChartGenerator, UIComponents, FilterManager, format_number, validate_data,
                        get_cities_list, filter_data_by_cities)
 from src.nm.analytics import Analytics
+from src.nm.city_table import build_city_facts, base_numeric_columns, NORM_SUFFIX
+from src.nm.composite_index import rankable_components
+from src.nm.job_runner import get_job_runner, job_key, DONE, FAILED
+from src.nm.weight_sensitivity import run_weight_sensitivity, TOP_K
 from src.state import StateManager
 
+# Esquemas de pesos sorteados para avaliar a robustez do ranking de cidades
+RANKING_STABILITY_SAMPLES = 2000
+
+# Até este número de cidades a análise leva poucos ms e é feita na própria renderização
+RANKING_STABILITY_INLINE_CITIES = 100
+
+
+@st.cache_data(show_spinner=False)
+def _ranking_stability_inline(components: pd.DataFrame) -> pd.DataFrame:
+    return run_weight_sensitivity(components, samples=RANKING_STABILITY_SAMPLES).stats
+
 
 class GeographicMapboxPage(Page):
     """Página de Análise Geográfica com Mapbox"""
@@ -219,28 +234,13 @@ class GeographicMapboxPage(Page):
 
     def _combine_datasets(self, data: Dict[str, Any]) -> pd.DataFrame:
         """Combina datasets para visualização unificada"""
-        df_econ = data['economicos'].copy()
-        df_social = data.get('sociais', pd.DataFrame())
-        df_env = data.get('ambientais', pd.DataFrame())
-        df_innov = data.get('inovacao', pd.DataFrame())
-
-        # Adicionar colunas calculadas
-        if 'empresas_formais' in df_econ.columns and 'empresas_informais' in df_econ.columns:
-            df_econ['empresas_totais'] = df_econ['empresas_formais'] + df_econ['empresas_informais']
+        # Tabela fato pré-calculada (já filtrada pelas cidades selecionadas);
+        # copiada porque as análises abaixo acrescentam colunas
+        df_econ = data.get('cidades')
+        if df_econ is None:
+            df_econ, _ = build_city_facts(data)
 
-        # Mesclar com dados sociais
-        if not df_social.empty:
-            df_econ = df_econ.merge(df_social, on='cidade', how='left', suffixes=('', '_social'))
-
-        # Mesclar com dados ambientais
-        if not df_env.empty:
-            df_econ = df_econ.merge(df_env, on='cidade', how='left', suffixes=('', '_env'))
-
-        # Mesclar com dados de inovação
-        if not df_innov.empty:
-            df_econ = df_econ.merge(df_innov, on='cidade', how='left', suffixes=('', '_innov'))
-
-        return df_econ
+        return df_econ.copy()
 
     def _render_mapbox_visualization(self, data: Dict[str, Any]):
         """Renderiza visualização principal com Mapbox"""
@@ -540,7 +540,7 @@ class GeographicMapboxPage(Page):
         """Renderiza análise de correlação entre indicadores"""
         st.markdown("#### 🔗 Correlação entre Indicadores")
 
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+        numeric_cols = base_numeric_columns(df)
         if 'lat' in numeric_cols:
             numeric_cols.remove('lat')
         if 'lon' in numeric_cols:
@@ -596,13 +596,11 @@ class GeographicMapboxPage(Page):
         available_cols = [col for col in criteria_cols if col in df.columns]
 
         if available_cols:
-            # Calcular score composto (média normalizada)
-            df_ranking = df.copy()
-            for col in available_cols:
-                # Normalizar entre 0 e 1
-                df_ranking[f"{col}_norm"] = (df_ranking[col] - df_ranking[col].min()) / (df_ranking[col].max() - df_ranking[col].min())
-
-            norm_cols = [f"{col}_norm" for col in available_cols]
+            # Calcular score composto (média das colunas normalizadas da tabela fato) dos
+            # municípios com cobertura suficiente, sem as linhas agregadas
+            norm_cols = [f"{col}{NORM_SUFFIX}" for col in available_cols if f"{col}{NORM_SUFFIX}" in df.columns]
+            components = rankable_components(df.set_index('cidade')[norm_cols] * 100)
+            df_ranking = df[df['cidade'].isin(components.index)].copy()
             df_ranking['score_composto'] = df_ranking[norm_cols].mean(axis=1)
 
             # Ordenar por score
@@ -628,11 +626,53 @@ class GeographicMapboxPage(Page):
 
             st.plotly_chart(fig, use_container_width=True)
 
+            # Robustez do ranking: o mesmo score com pesos aleatórios entre os indicadores (job em cache)
+            stability = self._get_ranking_stability(components)
+            prob_top = stability.set_index('cidade')[f'prob_top{TOP_K}'] if stability is not None else None
+
             # Mostrar top 3
             st.markdown("**🥇 Top 3:**")
             for i, (_, row) in enumerate(df_ranking.head(3).iterrows()):
                 medal = ["🥇", "🥈", "🥉"][i]
-                st.write(f"{medal} {row['cidade']} - Score: {row['score_composto']:.3f}")
+                robustness = f" (top {TOP_K} em {prob_top[row['cidade']]:.0%} dos pesos)" if prob_top is not None else ""
+                st.write(f"{medal} {row['cidade']} - Score: {row['score_composto']:.3f}{robustness}")
+
+    def _get_ranking_stability(self, components: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """Estatísticas de estabilidade do ranking, ou None enquanto o job não terminou"""
+        if components.shape[1] < 2:
+            return None
+        if len(components) <= RANKING_STABILITY_INLINE_CITIES:
+            return _ranking_stability_inline(components)
+
+        # Cada conjunto de parâmetros é submetido uma única vez por sessão: um job
+        # que falhou não é reenviado a cada renderização
+        runner = get_job_runner()
+        jobs = st.session_state.setdefault('ranking_stability_jobs', {})
+        key = job_key(run_weight_sensitivity, (components,), {'samples': RANKING_STABILITY_SAMPLES})
+        job = jobs.get(key)
+        if job is None:
+            job = runner.submit(run_weight_sensitivity, components, samples=RANKING_STABILITY_SAMPLES,
+                                kind="sensitivity")
+            jobs[key] = job
+
+        status = runner.poll(job)
+        if status.state == DONE:
+            result = runner.result(job)
+            return result.stats if result is not None else None
+        if status.state == FAILED:
+            st.error(f"Erro na análise de robustez do ranking: {status.error}")
+            return None
+        if status.finished:
+            return None
+
+        @st.fragment(run_every=1.0)
+        def job_progress():
+            if runner.poll(job).finished:
+                st.rerun()
+            st.caption("⏳ Avaliando a robustez do ranking aos pesos...")
+
+        job_progress()
+        return None
 
     def _render_density_analysis(self, df: pd.DataFrame):
         """Renderiza análise de densidade territorial"""
@@ -700,7 +740,7 @@ class GeographicMapboxPage(Page):
         df['regiao'] = df['cidade'].map(city_to_region).fillna('Outras')
 
         # Agregar dados por região
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+        numeric_cols = base_numeric_columns(df)
         exclude_cols = ['lat', 'lon']
         numeric_cols = [col for col in numeric_cols if col not in exclude_cols]
 
@@ -3,12 +3,20 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
-from typing import Dict, Any, List
+from dataclasses import replace
+from typing import Dict, Any, List, Optional
 import random
 
 from src.utils.page_utils import Page, ChartGenerator, UIComponents, FilterManager, format_number, validate_data, \
     get_cities_list, filter_data_by_cities
 from src.nm.analytics import  Analytics
+from src.nm.city_table import build_city_facts
+from src.nm.composite_index import (CompositeIndex, IndicatorSpec, DEFAULT_SPECS, NORMALIZATION_METHODS,
+                                    get_composite_index_engine, spec_hash)
+from src.nm.job_runner import JobHandle, get_job_runner, DONE, FAILED, CANCELLED
+from src.nm.time_series import TimeSeriesStore, build_time_series_store
+from src.nm.weight_sensitivity import (SensitivityResult, SAMPLING_METHODS, DEFAULT_SAMPLES, TOP_K,
+                                       run_weight_sensitivity)
 
 from src.state import StateManager
 
@@ -30,13 +38,13 @@ class IndicatorsPage(Page):
         # Seleção de tipo de análise
         analysis_type = st.selectbox(
             "Tipo de Análise:",
-            ["Comparativo entre Cidades", "Evolução Temporal (Simulada)", "Análise Multidimensional", "Benchmarking"],
+            ["Comparativo entre Cidades", "Evolução Temporal", "Análise Multidimensional", "Benchmarking"],
             key="indicators_analysis_type"
         )
 
         if analysis_type == "Comparativo entre Cidades":
             self._render_comparative_analysis(data)
-        elif analysis_type == "Evolução Temporal (Simulada)":
+        elif analysis_type == "Evolução Temporal":
             self._render_temporal_analysis(data)
         elif analysis_type == "Análise Multidimensional":
             self._render_multidimensional_analysis(data)
@@ -269,9 +277,8 @@ class IndicatorsPage(Page):
                 st.plotly_chart(fig, use_container_width=True)
 
     def _render_temporal_analysis(self, data: Dict[str, Any]):
-        """Renderiza análise temporal simulada"""
-        st.subheader("📈 Evolução Temporal (Simulada)")
-        st.info("Esta análise utiliza dados simulados para demonstrar como seria a evolução temporal dos indicadores.")
+        """Renderiza a evolução temporal a partir do store de séries"""
+        st.subheader("📈 Evolução Temporal")
 
         # Seletor de indicador para análise temporal
         indicator_options = {
@@ -288,11 +295,19 @@ class IndicatorsPage(Page):
             key="temporal_indicator"
         )
 
-        # Gerar dados temporais simulados
-        years = list(range(2020, 2026))
-        df_temporal = self._generate_temporal_data(data, indicator_options[selected_indicator], years)
+        store = data.get('series')
+        if store is None:
+            store = build_time_series_store(data)
+        df_temporal = self._generate_temporal_data(store, indicator_options[selected_indicator])
 
         if df_temporal is not None:
+            first_year, last_year = int(df_temporal['ano'].min()), int(df_temporal['ano'].max())
+            has_history = store.has_history(indicator_options[selected_indicator][1])
+            if not has_history:
+                st.info(f"Ainda não há série histórica para este indicador; o gráfico mostra apenas os valores "
+                        f"atuais ({last_year}). Para incluir anos anteriores, adicione "
+                        f"`static/datasets/indicadores_historicos.csv` com as colunas cidade, indicador, ano e valor.")
+
             # Gráfico de linha temporal
             fig = px.line(
                 df_temporal,
@@ -300,16 +315,18 @@ class IndicatorsPage(Page):
                 y='valor',
                 color='cidade',
                 markers=True,
-                title=f"Evolução de {selected_indicator} (2020-2025)",
+                title=f"Evolução de {selected_indicator} ({first_year}-{last_year})",
                 labels={'valor': selected_indicator, 'ano': 'Ano'}
             )
 
             # Adicionar linha de tendência
             fig.update_layout(height=500)
+            fig.update_xaxes(dtick=1)
             st.plotly_chart(fig, use_container_width=True)
 
             # Análise de crescimento
-            self._render_growth_analysis(df_temporal, selected_indicator)
+            if has_history:
+                self._render_growth_analysis(df_temporal, selected_indicator)
 
     def _render_multidimensional_analysis(self, data: Dict[str, Any]):
         """Renderiza análise multidimensional"""
@@ -372,24 +389,165 @@ class IndicatorsPage(Page):
         """Renderiza análise de benchmarking"""
         st.subheader("🏆 Análise de Benchmarking")
 
+        # Pesos e normalização dos indicadores do índice
+        with st.expander("⚖️ Pesos e Normalização"):
+            normalization = st.selectbox(
+                "Normalização:",
+                options=list(NORMALIZATION_METHODS),
+                format_func=lambda x: NORMALIZATION_METHODS[x],
+                key="benchmark_normalization"
+            )
+            cols = st.columns(len(DEFAULT_SPECS))
+            specs = []
+            for col, spec in zip(cols, DEFAULT_SPECS):
+                with col:
+                    weight = st.slider(spec.name, min_value=0.0, max_value=3.0, value=spec.weight, step=0.5,
+                                       key=f"benchmark_weight_{spec.column}")
+                specs.append(replace(spec, weight=weight, normalization=normalization))
+
         # Criar índice composto para ranking
-        composite_index = self._calculate_composite_index(data)
+        composite_index = self._calculate_composite_index(data, specs)
 
         if composite_index is not None:
             # Gráfico de ranking
             fig = px.bar(
-                composite_index.sort_values('indice_composto', ascending=True),
+                composite_index.ranking.sort_values('indice_composto', ascending=True),
                 x='indice_composto',
                 y='cidade',
                 orientation='h',
                 title="Índice Composto de Desenvolvimento",
                 labels={'indice_composto': 'Índice Composto', 'cidade': 'Cidade'}
             )
+            fig.update_layout(height=max(400, 24 * len(composite_index.ranking)))
             st.plotly_chart(fig, use_container_width=True)
 
             # Análise detalhada por dimensão
             self._render_dimensional_breakdown(composite_index)
 
+            # Robustez do ranking à escolha dos pesos
+            self._render_rank_stability(composite_index)
+        else:
+            st.info("Defina peso maior que zero para pelo menos um indicador disponível.")
+
+    def _render_rank_stability(self, composite_index: CompositeIndex):
+        """Avalia a estabilidade do ranking em milhares de esquemas de pesos (job em segundo plano)"""
+        st.markdown("#### 🎲 Robustez do Ranking")
+        current_specs = spec_hash(composite_index.specs)
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            method = st.selectbox(
+                "Amostragem dos pesos:",
+                options=list(SAMPLING_METHODS),
+                format_func=lambda x: SAMPLING_METHODS[x],
+                key="stability_method"
+            )
+        with col2:
+            samples = st.select_slider(
+                "Esquemas de pesos:",
+                options=[1000, 2000, 5000, 10000, 20000],
+                value=DEFAULT_SAMPLES,
+                key="stability_samples"
+            )
+        with col3:
+            concentration = st.slider(
+                "Concentração em torno dos pesos atuais:",
+                min_value=0.5,
+                max_value=10.0,
+                value=1.0,
+                step=0.5,
+                disabled=method != 'dirichlet',
+                help="1 = pesos espalhados por todas as combinações; valores maiores = variações menores",
+                key="stability_concentration"
+            )
+
+        if st.button("🎲 Analisar Robustez", key="run_stability"):
+            # Mesmos parâmetros reaproveitam o job em andamento ou o resultado em cache
+            job = get_job_runner().submit(
+                run_weight_sensitivity, composite_index.ranked_components,
+                [spec.weight for spec in composite_index.specs],
+                samples=samples, method=method, concentration=concentration, kind="sensitivity"
+            )
+            st.session_state.rank_stability = {'job': job, 'specs': current_specs}
+
+        stability = st.session_state.get('rank_stability')
+        if not stability:
+            return
+        if stability['specs'] != current_specs:
+            st.info("Os pesos ou a normalização mudaram; execute a análise novamente.")
+            return
+
+        runner = get_job_runner()
+        job: JobHandle = stability['job']
+        status = runner.poll(job)
+        if status.state == DONE:
+            result = runner.result(job)
+            if result is not None:
+                self._render_rank_stability_results(result)
+            return
+        if status.state == FAILED:
+            st.error(f"Erro na análise de robustez: {status.error}")
+            return
+        if status.state == CANCELLED:
+            st.warning("Análise de robustez cancelada.")
+            return
+
+        @st.fragment(run_every=1.0)
+        def job_progress():
+            status = runner.poll(job)
+            if status.finished:
+                # Rerun completo para exibir o resultado e parar a atualização periódica
+                st.rerun()
+            st.progress(status.progress, text=f"⏳ Avaliando esquemas de pesos... ({status.elapsed:.0f}s)")
+            if st.button("⏹️ Cancelar", key="cancel_stability"):
+                runner.cancel(job)
+                st.rerun()
+
+        job_progress()
+
+    def _render_rank_stability_results(self, result: SensitivityResult):
+        """Renderiza intervalos de posição e probabilidades de top 3"""
+        stats = result.stats
+        top_column = f'prob_top{TOP_K}'
+        st.caption(f"{result.samples:,} esquemas de pesos ({SAMPLING_METHODS[result.method]}); "
+                   f"barras entre os percentis 5 e 95 da posição.")
+
+        fig = go.Figure(go.Scatter(
+            x=stats['posicao_media'],
+            y=stats['cidade'],
+            mode='markers',
+            marker=dict(size=10, color=stats[top_column], colorscale='Viridis', cmin=0, cmax=1,
+                        colorbar=dict(title=f"P(top {TOP_K})")),
+            error_x=dict(
+                type='data',
+                symmetric=False,
+                array=stats['posicao_p95'] - stats['posicao_media'],
+                arrayminus=stats['posicao_media'] - stats['posicao_p5']
+            ),
+            customdata=stats[['posicao_base', 'posicao_p5', 'posicao_p95', top_column]],
+            hovertemplate="<b>%{y}</b><br>Posição com os pesos atuais: %{customdata[0]}<br>"
+                          "Intervalo: %{customdata[1]}–%{customdata[2]}<br>"
+                          f"P(top {TOP_K}): %{{customdata[3]:.1%}}<extra></extra>"
+        ))
+        fig.update_layout(
+            title="Intervalo de Posições no Ranking",
+            xaxis_title="Posição (1 = melhor)",
+            yaxis=dict(autorange='reversed'),
+            height=max(350, 28 * len(stats))
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        table = stats.rename(columns={
+            'cidade': 'Cidade',
+            'posicao_base': 'Posição Atual',
+            'posicao_media': 'Posição Média',
+            'posicao_p5': 'Melhor (p5)',
+            'posicao_p95': 'Pior (p95)',
+            'prob_top1': 'P(1º lugar)',
+            top_column: f'P(top {TOP_K})'
+        })
+        st.dataframe(table.round(3), use_container_width=True, hide_index=True)
+
     def _prepare_data_for_viz(self, df: pd.DataFrame, columns: List[str], normalize: bool) -> pd.DataFrame:
         """Prepara dados para visualização"""
         df_viz = df.copy()
@@ -423,37 +581,13 @@ class IndicatorsPage(Page):
                 )
                 st.plotly_chart(fig, use_container_width=True)
 
-    def _generate_temporal_data(self, data: Dict[str, Any], indicator_info: tuple, years: List[int]) -> pd.DataFrame:
-        """Gera dados temporais simulados"""
-        category, column = indicator_info
-        df_base = data.get(category)
-
-        if df_base is None or column not in df_base.columns:
+    def _generate_temporal_data(self, store: TimeSeriesStore, indicator_info: tuple) -> pd.DataFrame:
+        """Série observada do indicador (formato longo: cidade, ano, valor)"""
+        _, column = indicator_info
+        if column not in store.indicators:
             return None
 
-        temporal_data = []
-
-        for _, row in df_base.iterrows():
-            cidade = row['cidade']
-            base_value = row[column]
-
-            for year in years:
-                # Simular variação temporal com tendência e ruído
-                if year == 2025:  # Valor atual
-                    value = base_value
-                else:
-                    # Adicionar tendência e variação aleatória
-                    trend = (year - 2025) * np.random.uniform(-0.02, 0.03)  # -2% a +3% por ano
-                    noise = np.random.uniform(-0.05, 0.05)  # ±5% de ruído
-                    value = base_value * (1 + trend + noise)
-
-                temporal_data.append({
-                    'cidade': cidade,
-                    'ano': year,
-                    'valor': value
-                })
-
-        return pd.DataFrame(temporal_data)
+        return store.frame(column)
 
     def _render_growth_analysis(self, df_temporal: pd.DataFrame, indicator: str):
         """Renderiza análise de crescimento"""
@@ -480,7 +614,8 @@ class IndicatorsPage(Page):
                 growth_df,
                 x='cidade',
                 y='crescimento_percentual',
-                title=f"Taxa de Crescimento - {indicator} (2020-2025)",
+                title=f"Taxa de Crescimento - {indicator} "
+                      f"({int(df_temporal['ano'].min())}-{int(df_temporal['ano'].max())})",
                 labels={'crescimento_percentual': 'Crescimento (%)'}
             )
             st.plotly_chart(fig, use_container_width=True)
@@ -532,75 +667,43 @@ class IndicatorsPage(Page):
 
                 st.markdown(f"**{cidade}**: {quadrant}")
 
-    def _calculate_composite_index(self, data: Dict[str, Any]) -> pd.DataFrame:
-        """Calcula índice composto para benchmarking"""
-        # Selecionar indicadores-chave
-        key_indicators = [
-            ("economicos", "pib_per_capita", 1),  # Positivo
-            ("economicos", "taxa_informalidade", -1),  # Negativo
-            ("sociais", "idh", 1),  # Positivo
-            ("sociais", "evasao_escolar", -1),  # Negativo
-            ("inovacao", "investimento_inovacao_percentual", 1)  # Positivo
-        ]
-
-        composite_data = []
-        cities = get_cities_list(None)
-
-        for cidade in cities:
-            city_score = 0
-            valid_indicators = 0
-
-            for category, column, weight in key_indicators:
-                df = data.get(category)
-                if df is not None and column in df.columns:
-                    city_data = df[df['cidade'] == cidade]
-                    if not city_data.empty:
-                        value = city_data[column].iloc[0]
-                        # Normalizar e aplicar peso
-                        normalized = self._normalize_indicator(df[column], value, weight > 0)
-                        city_score += normalized * abs(weight)
-                        valid_indicators += 1
-
-            if valid_indicators > 0:
-                composite_data.append({
-                    'cidade': cidade,
-                    'indice_composto': city_score / valid_indicators,
-                    'indicadores_validos': valid_indicators
-                })
-
-        return pd.DataFrame(composite_data) if composite_data else None
-
-    def _normalize_indicator(self, series: pd.Series, value: float, is_positive: bool) -> float:
-        """Normaliza indicador para índice composto"""
-        min_val = series.min()
-        max_val = series.max()
-
-        if max_val == min_val:
-            return 50  # Valor neutro se não há variação
-
-        normalized = ((value - min_val) / (max_val - min_val)) * 100
-
-        # Inverter se indicador é negativo (menor é melhor)
-        if not is_positive:
-            normalized = 100 - normalized
+    def _calculate_composite_index(self, data: Dict[str, Any],
+                                   specs: List[IndicatorSpec] = DEFAULT_SPECS) -> Optional[CompositeIndex]:
+        """Calcula índice composto para benchmarking (municípios da tabela fato, sem as linhas agregadas)"""
+        facts = data.get('cidades')
+        if facts is None:
+            facts, _ = build_city_facts(data)
+        if facts is None:
+            return None
 
-        return normalized
+        return get_composite_index_engine().get_index(facts, specs)
 
-    def _render_dimensional_breakdown(self, composite_index: pd.DataFrame):
+    def _render_dimensional_breakdown(self, composite_index: CompositeIndex):
         """Renderiza breakdown dimensional do índice composto"""
         with st.expander("📋 Detalhamento por Dimensões"):
-            st.markdown("""
-            **Componentes do Índice Composto:**
-            - 📈 PIB per capita (peso positivo)
-            - 📉 Taxa de informalidade (peso negativo)
-            - 👥 IDH (peso positivo)
-            - 🎓 Evasão escolar (peso negativo)
-            - 💡 Investimento em inovação (peso positivo)
-            """)
-
-            st.dataframe(composite_index)
+            components = "\n".join(
+                f"- {spec.name} ({spec.group}, peso {spec.weight:g}, "
+                f"{'maior é melhor' if spec.direction > 0 else 'menor é melhor'})"
+                for spec in composite_index.specs
+            )
+            st.markdown(f"**Componentes do Índice Composto:**\n{components}")
+
+            breakdown = composite_index.breakdown.loc[composite_index.ranking['cidade']]
+            fig = px.imshow(
+                breakdown.round(1),
+                text_auto=True,
+                aspect="auto",
+                color_continuous_scale="RdYlGn",
+                zmin=0,
+                zmax=100,
+                title="Nota por Dimensão (0-100)"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+            ranking = composite_index.ranking.merge(breakdown.round(1), left_on='cidade', right_index=True)
+            st.dataframe(ranking, use_container_width=True, hide_index=True)
             UIComponents.create_download_button(
-                composite_index,
+                ranking,
                 "ranking_composite.csv",
                 label="📥 Download Ranking"
-            )
\ No newline at end of file
+            )
@@ -4,20 +4,45 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import json
 from datetime import datetime, timedelta
-import random
 
 from src.utils.page_utils import (Page, ChartGenerator, UIComponents, FilterManager, format_number, validate_data,
                        get_cities_list, filter_data_by_cities)
 from src.nm.analytics import Analytics
+from src.nm.city_similarity import SIMILARITY_METHODS, compute_similarity_graph, group_columns
+from src.nm.city_table import build_city_facts, base_numeric_columns, NORM_SUFFIX
+from src.nm.correlation_service import CORRELATION_METHODS, CorrelationResult, get_correlation_service
+from src.nm.forecasting import FORECAST_MODELS, MIN_OBSERVATIONS, get_forecast_service
+from src.nm.layout_cache import get_layout_cache
+from src.nm.job_runner import JobHandle, get_job_runner, DONE, FAILED, CANCELLED
+from src.nm.time_series import TimeSeriesStore, build_time_series_store
+from src.nm.scenario_engine import (simulate_scenarios, ScenarioResult, DEFAULT_RUNS, DEFAULT_SEED,
+                                    DEFAULT_VOLATILITY, PERCENTILES)
 from src.state import StateManager
 
 
 class InteractiveAnalysisPage(Page):
     """Página de Análise Interativa Avançada"""
 
+    # Opções da rede de similaridade -> tabela de indicadores comparada (None = todas)
+    NETWORK_METRIC_GROUPS = {
+        "💰 Similaridade Econômica": 'economicos',
+        "👥 Similaridade Social": 'sociais',
+        "🌱 Similaridade Ambiental": 'ambientais',
+        "🚀 Similaridade em Inovação": 'inovacao',
+        "🔄 Similaridade Geral": None
+    }
+
+    # Horizonte da simulação -> número de anos
+    TIME_HORIZONS = {
+        "📅 1 ano": 1,
+        "📅 3 anos": 3,
+        "📅 5 anos": 5,
+        "📅 10 anos": 10
+    }
+
     def __init__(self):
         # Inicializar dados de sessão se não existirem
         if 'simulation_data' not in st.session_state:
@@ -170,7 +195,7 @@ class InteractiveAnalysisPage(Page):
                 elif viz_types[viz_type] == "scatter_matrix":
                     self._render_scatter_matrix(df_filtered, available_metrics, selected_cities)
                 elif viz_types[viz_type] == "time_series":
-                    self._render_simulated_time_series(df_filtered, available_metrics, selected_cities)
+                    self._render_time_series(self._get_time_series(data), available_metrics, selected_cities)
 
                 # Insights automáticos
                 self._render_automatic_insights(df_filtered, available_metrics, selected_cities)
@@ -179,11 +204,11 @@ class InteractiveAnalysisPage(Page):
         """Renderiza comparação dinâmica em barras"""
         st.markdown("#### 📊 Comparação Dinâmica")
         
-        # Normalizar dados para comparação
-        df_normalized = df.copy()
+        # Normalização 0-100 a partir das colunas pré-calculadas da tabela fato
+        df_normalized = df[['cidade'] + metrics].copy()
         for metric in metrics:
-            if metric in df.columns:
-                df_normalized[f"{metric}_norm"] = (df[metric] - df[metric].min()) / (df[metric].max() - df[metric].min()) * 100
+            if f"{metric}{NORM_SUFFIX}" in df.columns:
+                df_normalized[f"{metric}_norm"] = df[f"{metric}{NORM_SUFFIX}"] * 100
 
         # Criar visualização interativa
         fig = go.Figure()
@@ -283,7 +308,7 @@ class InteractiveAnalysisPage(Page):
             # Horizonte temporal
             time_horizon = st.selectbox(
                 "⏰ Horizonte de Simulação:",
-                options=["📅 1 ano", "📅 3 anos", "📅 5 anos", "📅 10 anos"],
+                options=list(self.TIME_HORIZONS),
                 key="time_horizon"
             )
             
@@ -327,28 +352,43 @@ class InteractiveAnalysisPage(Page):
                 simulation_params['social_development'] = st.slider(
                     "👥 Desenvolvimento Social (%/ano)", -5, 15, 3, 1, key="social_dev"
                 )
+
+            simulation_params['volatility'] = st.slider(
+                "🎲 Volatilidade (%/ano)", 0.0, 15.0, DEFAULT_VOLATILITY, 0.5, key="volatility"
+            )
         else:
             # Parâmetros predefinidos por tipo de cenário
             simulation_params = self._get_predefined_scenario_params(scenario_type)
 
-        # Executar simulação
+        # Monte Carlo: número de trajetórias e semente (reprodutível)
+        mc_cols = st.columns(2)
+        with mc_cols[0]:
+            runs = st.select_slider(
+                "🔁 Número de simulações",
+                options=[1000, 2000, 5000, 10000, 20000],
+                value=DEFAULT_RUNS,
+                key="simulation_runs"
+            )
+        with mc_cols[1]:
+            seed = int(st.number_input("🌱 Semente", min_value=0, value=DEFAULT_SEED, step=1,
+                                       key="simulation_seed"))
+
+        # Executar simulação (em segundo plano; a sessão guarda só o handle do job)
         if st.button("🚀 Executar Simulação", key="run_simulation"):
-            simulated_data = self._run_scenario_simulation(
-                df_combined, base_city, time_horizon, simulation_params
+            st.session_state.simulation_data = self._run_scenario_simulation(
+                df_combined, base_city, time_horizon, simulation_params, runs=runs, seed=seed
             )
             
-            # Armazenar na sessão
-            st.session_state.simulation_data = simulated_data
-            
             Analytics.log_event("scenario_simulation", {
                 "base_city": base_city,
                 "scenario_type": scenario_type,
-                "time_horizon": time_horizon
+                "time_horizon": time_horizon,
+                "runs": runs
             })
 
         # Exibir resultados da simulação
         if 'simulation_data' in st.session_state and st.session_state.simulation_data:
-            self._render_simulation_results(st.session_state.simulation_data)
+            self._render_simulation_job(st.session_state.simulation_data)
 
     def _render_correlation_explorer(self, data: Dict[str, Any]):
         """Explorador de correlações interativo"""
@@ -356,7 +396,7 @@ class InteractiveAnalysisPage(Page):
         st.markdown("## 🎲 Explorador de Correlações")
         
         df_combined = self._combine_all_datasets(data)
-        numeric_cols = df_combined.select_dtypes(include=[np.number]).columns.tolist()
+        numeric_cols = base_numeric_columns(df_combined)
         
         # Remover colunas não relevantes
         exclude_cols = ['lat', 'lon']
@@ -382,7 +422,7 @@ class InteractiveAnalysisPage(Page):
             # Método de correlação
             correlation_method = st.selectbox(
                 "🔢 Método de Correlação:",
-                options=["pearson", "spearman", "kendall"],
+                options=list(CORRELATION_METHODS),
                 key="correlation_method"
             )
             
@@ -398,14 +438,15 @@ class InteractiveAnalysisPage(Page):
             )
 
         if selected_vars and len(selected_vars) >= 2:
-            # Calcular matriz de correlação
-            corr_matrix = df_combined[selected_vars].corr(method=correlation_method)
+            # Matriz completa (calculada uma vez por versão e método) recortada nas variáveis selecionadas
+            correlations = get_correlation_service().get_correlations(df_combined, numeric_cols, correlation_method)
+            corr_matrix = correlations.subset(selected_vars)
             
             # Visualização da matriz de correlação
             self._render_interactive_correlation_matrix(corr_matrix, min_correlation)
             
             # Análise de correlações fortes
-            self._render_strong_correlations_analysis(corr_matrix, min_correlation, selected_vars)
+            self._render_strong_correlations_analysis(correlations, min_correlation, selected_vars)
             
             # Explorador de relações específicas
             self._render_relationship_explorer(df_combined, selected_vars)
@@ -485,25 +526,42 @@ class InteractiveAnalysisPage(Page):
         with col1:
             network_metric = st.selectbox(
                 "📏 Métrica para Conexões:",
-                options=[
-                    "💰 Similaridade Econômica",
-                    "👥 Similaridade Social",
-                    "🌱 Similaridade Ambiental",
-                    "🚀 Similaridade em Inovação",
-                    "🔄 Similaridade Geral"
-                ],
+                options=list(self.NETWORK_METRIC_GROUPS),
                 key="network_metric"
             )
+            similarity_method = st.selectbox(
+                "📐 Medida de Similaridade:",
+                options=list(SIMILARITY_METHODS),
+                format_func=lambda x: SIMILARITY_METHODS[x],
+                key="similarity_method"
+            )
             
         with col2:
-            similarity_threshold = st.slider(
-                "🎯 Threshold de Similaridade:",
-                min_value=0.1,
-                max_value=0.9,
-                value=0.6,
-                step=0.1,
-                key="similarity_threshold"
+            connection_mode = st.radio(
+                "🔗 Conexões:",
+                options=["Vizinhos mais próximos", "Threshold"],
+                horizontal=True,
+                key="similarity_mode"
             )
+            if connection_mode == "Threshold":
+                similarity_threshold = st.slider(
+                    "🎯 Threshold de Similaridade:",
+                    min_value=0.1,
+                    max_value=0.9,
+                    value=0.6,
+                    step=0.1,
+                    key="similarity_threshold"
+                )
+                neighbors = None
+            else:
+                neighbors = st.slider(
+                    "👥 Vizinhos por Cidade:",
+                    min_value=1,
+                    max_value=15,
+                    value=5,
+                    key="similarity_neighbors"
+                )
+                similarity_threshold = None
             
         with col3:
             network_layout = st.selectbox(
@@ -513,7 +571,10 @@ class InteractiveAnalysisPage(Page):
             )
 
         # Gerar e visualizar rede
-        network_data = self._generate_similarity_network(df_combined, network_metric, similarity_threshold)
+        network_data = self._generate_similarity_network(
+            data, df_combined, network_metric, similarity_threshold,
+            method=similarity_method, neighbors=neighbors
+        )
         self._render_interactive_network(network_data, network_layout)
 
     def _render_trend_predictor(self, data: Dict[str, Any]):
@@ -521,7 +582,6 @@ class InteractiveAnalysisPage(Page):
         st.markdown("---")
         st.markdown("## 📈 Predictor de Tendências")
         
-        # Simular dados históricos e projeções
         df_combined = self._combine_all_datasets(data)
         
         col1, col2 = st.columns(2)
@@ -557,50 +617,65 @@ class InteractiveAnalysisPage(Page):
             confidence_level = st.selectbox(
                 "📊 Nível de Confiança:",
                 options=["90%", "95%", "99%"],
+                index=1,
                 key="confidence_level"
             )
-
-        if st.button("🔮 Gerar Previsão", key="generate_prediction"):
-            # Gerar dados históricos simulados e previsão
-            historical_data, prediction_data = self._generate_trend_prediction(
-                df_combined, target_city, target_metric, prediction_years
-            )
             
-            # Visualizar tendência e previsão
+            forecast_model = st.selectbox(
+                "🧮 Modelo de Previsão:",
+                options=list(FORECAST_MODELS),
+                format_func=lambda x: FORECAST_MODELS[x],
+                key="forecast_model"
+            )
+
+        # Histórico observado e previsão (modelos ajustados uma vez por versão dos dados)
+        historical_data, prediction_data = self._generate_trend_prediction(
+            self._get_time_series(data), target_city, target_metric, prediction_years,
+            model=forecast_model, confidence=float(confidence_level.rstrip('%')) / 100
+        )
+        
+        # Visualizar tendência e previsão
+        if historical_data is None:
+            st.warning(f"Sem dados de {target_metric} para {target_city}.")
+        elif prediction_data is None:
+            self._render_trend_visualization(historical_data, None, target_metric, target_city)
+            st.info(f"A série de {target_metric} em {target_city} tem {len(historical_data)} ano(s) observado(s); "
+                    f"são necessários pelo menos {MIN_OBSERVATIONS.get(forecast_model, min(MIN_OBSERVATIONS.values()))} "
+                    f"para ajustar o modelo selecionado.")
+        else:
             self._render_trend_visualization(historical_data, prediction_data, target_metric, target_city)
 
     # Métodos auxiliares para as análises
 
     def _combine_all_datasets(self, data: Dict[str, Any]) -> pd.DataFrame:
-        """Combina todos os datasets disponíveis"""
-        df_base = data['economicos'].copy()
-        
-        # Adicionar empresas totais
-        if 'empresas_formais' in df_base.columns and 'empresas_informais' in df_base.columns:
-            df_base['empresas_totais'] = df_base['empresas_formais'] + df_base['empresas_informais']
-        
-        # Mesclar outros datasets
-        for key in ['sociais', 'ambientais', 'inovacao']:
-            if key in data and not data[key].empty:
-                df_base = df_base.merge(data[key], on='cidade', how='left', suffixes=('', f'_{key}'))
+        """Retorna a tabela fato de cidades (somente leitura; copiar antes de alterar)"""
+        # Tabela fato pré-calculada pelo registro de datasets
+        df_base = data.get('cidades')
+        if df_base is None:
+            df_base, _ = build_city_facts(data)
         
         return df_base
 
+    def _get_time_series(self, data: Dict[str, Any]) -> TimeSeriesStore:
+        """Retorna o store de séries temporais (histórico registrado + valores atuais)"""
+        store = data.get('series')
+        if store is None:
+            store = build_time_series_store(data)
+        
+        return store
+
     def _render_radar_comparison(self, df: pd.DataFrame, metrics: List[str], cities: List[str]):
         """Renderiza comparação em radar chart"""
-        # Normalizar dados
-        df_norm = df.copy()
-        for metric in metrics:
-            if metric in df.columns:
-                df_norm[metric] = (df[metric] - df[metric].min()) / (df[metric].max() - df[metric].min())
+        # Valores normalizados (0-1) pré-calculados na tabela fato
+        df_norm = df.set_index('cidade')
+        norm_cols = {metric: f"{metric}{NORM_SUFFIX}" for metric in metrics if f"{metric}{NORM_SUFFIX}" in df.columns}
 
         fig = go.Figure()
         colors = px.colors.qualitative.Set1
 
         for i, city in enumerate(cities):
-            city_data = df_norm[df_norm['cidade'] == city]
-            if not city_data.empty:
-                values = [city_data[metric].iloc[0] if metric in city_data.columns else 0 for metric in metrics]
+            if city in df_norm.index:
+                values = [df_norm.at[city, norm_cols[metric]] if metric in norm_cols else 0 for metric in metrics]
                 values.append(values[0])  # Fechar o radar
                 
                 labels = [metric.replace('_', ' ').title() for metric in metrics]
@@ -653,120 +728,153 @@ class InteractiveAnalysisPage(Page):
                 'economic_growth': 15,
                 'innovation_factor': 2.0,
                 'sustainability_improvement': 8,
-                'social_development': 10
+                'social_development': 10,
+                'volatility': 4
             },
             "📊 Crescimento Moderado": {
                 'economic_growth': 5,
                 'innovation_factor': 1.2,
                 'sustainability_improvement': 3,
-                'social_development': 4
+                'social_development': 4,
+                'volatility': 3
             },
             "⚖️ Cenário Conservador": {
                 'economic_growth': 2,
                 'innovation_factor': 1.0,
                 'sustainability_improvement': 1,
-                'social_development': 2
+                'social_development': 2,
+                'volatility': 2
             },
             "⚠️ Cenário de Crise": {
                 'economic_growth': -5,
                 'innovation_factor': 0.8,
                 'sustainability_improvement': -2,
-                'social_development': -1
+                'social_development': -1,
+                'volatility': 6
             }
         }
         return scenarios.get(scenario_type, scenarios["📊 Crescimento Moderado"])
 
-    def _run_scenario_simulation(self, df: pd.DataFrame, base_city: str, time_horizon: str, params: Dict[str, float]) -> Dict[str, Any]:
-        """Executa simulação de cenário"""
-        years = int(time_horizon.split()[0])
-        city_data = df[df['cidade'] == base_city].iloc[0].to_dict()
-        
-        # Simular evolução ao longo dos anos
-        simulation_results = []
-        
-        for year in range(years + 1):
-            year_data = {'year': 2024 + year}
-            
-            for key, value in city_data.items():
-                if isinstance(value, (int, float)) and key != 'cidade':
-                    # Aplicar crescimento/mudança baseado nos parâmetros
-                    if 'faturamento' in key or 'pib' in key:
-                        growth_rate = params['economic_growth'] / 100
-                    elif 'inovacao' in key or 'ecommerce' in key:
-                        growth_rate = params['innovation_factor'] - 1
-                    elif 'ambiental' in key or 'energia' in key:
-                        growth_rate = params['sustainability_improvement'] / 100
-                    elif 'idh' in key or 'pobreza' in key:
-                        growth_rate = params['social_development'] / 100
-                    else:
-                        growth_rate = params['economic_growth'] / 200  # Crescimento mais conservador
-                    
-                    # Aplicar variabilidade aleatória
-                    random_factor = 1 + random.uniform(-0.1, 0.1)
-                    year_data[key] = value * ((1 + growth_rate) ** year) * random_factor
-            
-            simulation_results.append(year_data)
-        
+    def _run_scenario_simulation(self, df: pd.DataFrame, base_city: str, time_horizon: str, params: Dict[str, float],
+                                 runs: int = DEFAULT_RUNS, seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+        """Agenda a simulação de Monte Carlo do cenário para todas as cidades"""
+        years = self.TIME_HORIZONS[time_horizon]
+        # Mesmos parâmetros reaproveitam o job em andamento ou o resultado em cache
+        job = get_job_runner().submit(
+            simulate_scenarios, df, base_numeric_columns(df), params, years,
+            runs=runs, seed=seed, kind="scenario"
+        )
+
         return {
             'base_city': base_city,
             'scenario_params': params,
-            'results': simulation_results
+            'job': job
         }
 
-    def _render_simulation_results(self, simulation_data: Dict[str, Any]):
+    def _render_simulation_job(self, simulation_data: Dict[str, Any]):
+        """Acompanha o job da simulação e exibe o resultado quando concluído"""
+        runner = get_job_runner()
+        job: JobHandle = simulation_data['job']
+
+        status = runner.poll(job)
+        if status.state == DONE:
+            result = runner.result(job)
+            if result is not None:
+                self._render_simulation_results(simulation_data, result)
+            return
+        if status.state == FAILED:
+            st.error(f"Erro na simulação: {status.error}")
+            return
+        if status.state == CANCELLED:
+            st.warning("Simulação cancelada.")
+            return
+
+        @st.fragment(run_every=1.0)
+        def job_progress():
+            status = runner.poll(job)
+            if status.finished:
+                # Rerun completo para exibir o resultado e parar a atualização periódica
+                st.rerun()
+            st.progress(status.progress, text=f"⏳ Simulando... ({status.elapsed:.0f}s)")
+            if st.button("⏹️ Cancelar", key="cancel_simulation"):
+                runner.cancel(job)
+                st.rerun()
+
+        job_progress()
+
+    def _render_simulation_results(self, simulation_data: Dict[str, Any], result: ScenarioResult):
         """Renderiza resultados da simulação"""
         st.markdown("#### 📊 Resultados da Simulação")
-        
-        results_df = pd.DataFrame(simulation_data['results'])
+
         base_city = simulation_data['base_city']
-        
+        if base_city not in result.cities:
+            return
+        bands = result.city_frame(base_city)
+        low, mid, high = (f"p{p}" for p in PERCENTILES)
+
+        st.caption(f"{result.runs:,} trajetórias simuladas (semente {result.seed}); "
+                   f"faixa sombreada entre os percentis {PERCENTILES[0]} e {PERCENTILES[-1]}, linha na mediana.")
+
         # Métricas principais para visualizar
         key_metrics = [
             'faturamento_anual_milhoes',
-            'empresas_totais', 
+            'empresas_totais',
             'empregos_diretos',
             'idh'
         ]
-        
-        available_metrics = [m for m in key_metrics if m in results_df.columns]
-        
+
+        available_metrics = [m for m in key_metrics if m in result.metrics]
+
         if available_metrics:
-            # Gráfico de evolução temporal
+            # Gráfico de evolução temporal com bandas de percentis
             fig = make_subplots(
                 rows=2, cols=2,
                 subplot_titles=[metric.replace('_', ' ').title() for metric in available_metrics[:4]],
                 vertical_spacing=0.1
             )
-            
+
             for i, metric in enumerate(available_metrics[:4]):
                 row = (i // 2) + 1
                 col = (i % 2) + 1
-                
+                metric_bands = bands[bands['metric'] == metric]
+
+                fig.add_trace(
+                    go.Scatter(
+                        x=list(metric_bands['year']) + list(metric_bands['year'][::-1]),
+                        y=list(metric_bands[high]) + list(metric_bands[low][::-1]),
+                        fill='toself',
+                        fillcolor='rgba(31,119,180,0.2)',
+                        line=dict(width=0),
+                        hoverinfo='skip',
+                        name=f"P{PERCENTILES[0]}-P{PERCENTILES[-1]}"
+                    ),
+                    row=row, col=col
+                )
                 fig.add_trace(
                     go.Scatter(
-                        x=results_df['year'],
-                        y=results_df[metric],
+                        x=metric_bands['year'],
+                        y=metric_bands[mid],
                         mode='lines+markers',
                         name=metric.replace('_', ' ').title(),
                         line=dict(width=3)
                     ),
                     row=row, col=col
                 )
-            
+
             fig.update_layout(
                 title=f"🔮 Projeção para {base_city}",
                 height=600,
                 showlegend=False
             )
-            
+
             st.plotly_chart(fig, use_container_width=True)
-            
+
             # Tabela de resultados
-            st.markdown("#### 📋 Dados Detalhados da Simulação")
-            st.dataframe(results_df.round(2), use_container_width=True)
-            
-            # Download dos resultados
-            csv_data = results_df.to_csv(index=False)
+            st.markdown("#### 📋 Dados Detalhados da Simulação (mediana)")
+            st.dataframe(result.median_frame(base_city).round(2), use_container_width=True)
+
+            # Download dos resultados (percentis de todos os indicadores)
+            csv_data = bands.to_csv(index=False)
             st.download_button(
                 label="📥 Download Resultados CSV",
                 data=csv_data.encode('utf-8'),
@@ -833,105 +941,117 @@ class InteractiveAnalysisPage(Page):
                 elif widget == "📋 Tabela de Dados":
                     st.dataframe(df_combined.head(), use_container_width=True)
 
-    def _generate_similarity_network(self, df: pd.DataFrame, metric_type: str, threshold: float) -> Dict[str, Any]:
-        """Gera rede baseada em similaridades"""
-        # Implementação simplificada - retorna dados estruturados para visualização
-        cities = df['cidade'].tolist()
-        
-        # Calcular similaridades (simulado)
-        edges = []
-        for i, city1 in enumerate(cities):
-            for j, city2 in enumerate(cities[i+1:], i+1):
-                similarity = random.uniform(0, 1)  # Simulado
-                if similarity >= threshold:
-                    edges.append({
-                        'source': city1,
-                        'target': city2,
-                        'weight': similarity
-                    })
-        
+    def _generate_similarity_network(self, data: Dict[str, Any], df: pd.DataFrame, metric_type: str,
+                                     threshold: Optional[float], method: str = 'cosine',
+                                     neighbors: Optional[int] = None) -> Dict[str, Any]:
+        """Gera a rede de similaridade entre cidades no grupo de indicadores escolhido"""
+        columns = group_columns(data, df, self.NETWORK_METRIC_GROUPS.get(metric_type))
+        graph = compute_similarity_graph(df, columns, method=method, k=neighbors, threshold=threshold)
         return {
-            'nodes': [{'id': city, 'label': city} for city in cities],
-            'edges': edges
+            'graph': graph,
+            'columns': columns,
+            'method': method
         }
 
     def _render_interactive_network(self, network_data: Dict[str, Any], layout: str):
         """Renderiza rede interativa"""
         st.markdown("#### 🕸️ Rede de Similaridades")
+        graph = network_data['graph']
         
-        if network_data['edges']:
-            # Criar visualização de rede simplificada
-            fig = go.Figure()
-            
-            # Adicionar edges
-            for edge in network_data['edges']:
+        if not network_data['columns']:
+            st.warning("Nenhum indicador numérico disponível para o grupo selecionado.")
+            return
+        if graph.number_of_edges() == 0:
+            st.info("Nenhuma conexão forte encontrada com o threshold atual.")
+            return
+
+        pos = get_layout_cache().get_layout(graph, layout)
+        edges = list(graph.edges(data='weight'))
+        weights = np.array([w for _, _, w in edges])
+        w_min, w_max = weights.min(), weights.max()
+        span = w_max - w_min if w_max > w_min else 1.0
+
+        fig = go.Figure()
+
+        # Arestas agrupadas em faixas de similaridade (um trace por faixa)
+        bands = np.minimum(((weights - w_min) / span * 4).astype(int), 3)
+        for band in range(4):
+            x, y = [], []
+            for (u, v, _), edge_band in zip(edges, bands):
+                if edge_band == band:
+                    x.extend([pos[u][0], pos[v][0], None])
+                    y.extend([pos[u][1], pos[v][1], None])
+            if x:
                 fig.add_trace(go.Scatter(
-                    x=[0, 1], y=[0, 1],  # Posições simplificadas
+                    x=x, y=y,
                     mode='lines',
-                    line=dict(width=edge['weight']*5),
+                    line=dict(width=0.5 + band, color='rgba(120, 120, 120, 0.5)'),
                     showlegend=False,
                     hoverinfo='skip'
                 ))
-            
-            # Adicionar nós
-            fig.add_trace(go.Scatter(
-                x=[0.5] * len(network_data['nodes']),
-                y=list(range(len(network_data['nodes']))),
-                mode='markers+text',
-                text=[node['label'] for node in network_data['nodes']],
-                textposition="middle center",
-                marker=dict(size=20, color='lightblue'),
-                showlegend=False
-            ))
-            
-            fig.update_layout(
-                title="Rede de Conexões entre Cidades",
-                height=400,
-                showlegend=False
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("Nenhuma conexão forte encontrada com o threshold atual.")
 
-    def _generate_trend_prediction(self, df: pd.DataFrame, city: str, metric: str, years: int):
-        """Gera dados históricos simulados e previsão"""
-        # Dados históricos simulados (últimos 5 anos)
-        current_value = df[df['cidade'] == city][metric].iloc[0]
-        
-        historical_years = list(range(2019, 2024))
-        historical_values = []
-        
-        # Simular histórico com tendência crescente e variabilidade
-        for i, year in enumerate(historical_years):
-            base_value = current_value * (0.85 + i * 0.05)  # Crescimento gradual
-            noise = random.uniform(-0.1, 0.1) * base_value
-            historical_values.append(base_value + noise)
+        # Pontos médios das arestas com a similaridade no hover
+        fig.add_trace(go.Scatter(
+            x=[(pos[u][0] + pos[v][0]) / 2 for u, v, _ in edges],
+            y=[(pos[u][1] + pos[v][1]) / 2 for u, v, _ in edges],
+            mode='markers',
+            marker=dict(size=4, opacity=0),
+            text=[f"{u} ↔ {v}<br>Similaridade: {w:.3f}" for u, v, w in edges],
+            hoverinfo='text',
+            showlegend=False
+        ))
+
+        # Nós com tamanho pela soma das similaridades
+        nodes = list(graph.nodes())
+        strength = np.array([graph.nodes[node].get('strength', 0.0) for node in nodes], dtype=float)
+        sizes = 10 + 20 * (strength - strength.min()) / (np.ptp(strength) or 1.0)
+        fig.add_trace(go.Scatter(
+            x=[pos[node][0] for node in nodes],
+            y=[pos[node][1] for node in nodes],
+            mode='markers+text',
+            text=nodes,
+            textposition="top center",
+            customdata=np.column_stack([[graph.degree(node) for node in nodes], strength]),
+            hovertemplate="<b>%{text}</b><br>Conexões: %{customdata[0]}<br>"
+                          "Similaridade total: %{customdata[1]:.2f}<extra></extra>",
+            marker=dict(size=sizes, color=strength, colorscale='Viridis', line=dict(width=1, color='white')),
+            showlegend=False
+        ))
         
-        # Previsão futura
-        future_years = list(range(2024, 2024 + years + 1))
-        future_values = []
+        fig.update_layout(
+            title=f"Rede de Conexões entre Cidades ({SIMILARITY_METHODS[network_data['method']]})",
+            height=500,
+            showlegend=False,
+            xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+            yaxis=dict(showgrid=False, zeroline=False, showticklabels=False)
+        )
         
-        growth_rate = 0.05  # 5% ao ano
-        for i, year in enumerate(future_years):
-            predicted_value = current_value * ((1 + growth_rate) ** i)
-            future_values.append(predicted_value)
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption(f"{graph.number_of_nodes()} cidades, {graph.number_of_edges()} conexões, "
+                   f"{len(network_data['columns'])} indicadores comparados")
+
+    def _generate_trend_prediction(self, store: TimeSeriesStore, city: str, metric: str, years: int,
+                                   model: str = 'auto', confidence: float = 0.95):
+        """Histórico observado da cidade e previsão do modelo ajustado com intervalo de confiança"""
+        history = store.series(city, metric).dropna()
+        if history.empty:
+            return None, None
         
         historical_data = pd.DataFrame({
-            'year': historical_years,
-            'value': historical_values,
+            'year': history.index,
+            'value': history.to_numpy(),
             'type': 'Histórico'
         })
         
-        prediction_data = pd.DataFrame({
-            'year': future_years,
-            'value': future_values,
-            'type': 'Previsão'
-        })
+        fits = get_forecast_service().get_fits(store)
+        prediction_data = fits.forecast(city, metric, years, model=model, confidence=confidence)
+        if prediction_data is not None:
+            prediction_data['type'] = 'Previsão'
+            prediction_data['model'] = fits.model_for(city, metric, model)
         
         return historical_data, prediction_data
 
-    def _render_trend_visualization(self, historical_data: pd.DataFrame, prediction_data: pd.DataFrame, 
+    def _render_trend_visualization(self, historical_data: pd.DataFrame, prediction_data: Optional[pd.DataFrame],
                                   metric: str, city: str):
         """Renderiza visualização de tendência e previsão"""
         st.markdown("#### 📈 Análise de Tendência e Previsão")
@@ -947,24 +1067,40 @@ class InteractiveAnalysisPage(Page):
             line=dict(color='blue', width=3)
         ))
         
-        # Previsão
-        fig.add_trace(go.Scatter(
-            x=prediction_data['year'],
-            y=prediction_data['value'],
-            mode='lines+markers',
-            name='Previsão',
-            line=dict(color='red', width=3, dash='dash')
-        ))
+        if prediction_data is not None:
+            # Intervalo de confiança
+            fig.add_trace(go.Scatter(
+                x=pd.concat([prediction_data['year'], prediction_data['year'][::-1]]),
+                y=pd.concat([prediction_data['upper'], prediction_data['lower'][::-1]]),
+                fill='toself',
+                fillcolor='rgba(255, 0, 0, 0.15)',
+                line=dict(color='rgba(255, 0, 0, 0)'),
+                hoverinfo='skip',
+                name='Intervalo de Confiança'
+            ))
+            
+            # Previsão
+            fig.add_trace(go.Scatter(
+                x=prediction_data['year'],
+                y=prediction_data['value'],
+                mode='lines+markers',
+                name=f"Previsão ({FORECAST_MODELS[prediction_data['model'].iloc[0]]})",
+                line=dict(color='red', width=3, dash='dash')
+            ))
         
         fig.update_layout(
             title=f"📊 Tendência e Previsão: {metric.replace('_', ' ').title()} - {city}",
             xaxis_title="Ano",
             yaxis_title=metric.replace('_', ' ').title(),
+            xaxis=dict(dtick=1),
             height=500
         )
         
         st.plotly_chart(fig, use_container_width=True)
         
+        if prediction_data is None:
+            return
+        
         # Métricas da previsão
         col1, col2, col3 = st.columns(3)
         
@@ -976,6 +1112,7 @@ class InteractiveAnalysisPage(Page):
             future_val = prediction_data['value'].iloc[-1]
             growth = ((future_val - current_val) / current_val) * 100
             st.metric("🔮 Valor Projetado", f"{future_val:.2f}", f"{growth:.1f}%")
+            st.caption(f"Intervalo: {prediction_data['lower'].iloc[-1]:.2f} – {prediction_data['upper'].iloc[-1]:.2f}")
             
         with col3:
             avg_growth = (prediction_data['value'].pct_change().mean()) * 100
@@ -1015,39 +1152,32 @@ class InteractiveAnalysisPage(Page):
         fig.update_layout(height=600, title="🎯 Matriz de Dispersão")
         st.plotly_chart(fig, use_container_width=True)
 
-    def _render_simulated_time_series(self, df: pd.DataFrame, metrics: List[str], cities: List[str]):
-        """Renderiza séries temporais simuladas"""
-        st.markdown("#### 📈 Evolução Temporal Simulada")
+    def _render_time_series(self, store: TimeSeriesStore, metrics: List[str], cities: List[str]):
+        """Renderiza as séries temporais observadas"""
+        st.markdown("#### 📈 Evolução Temporal")
         
-        # Gerar dados temporais simulados
-        years = list(range(2020, 2025))
+        metric = metrics[0]
+        df_temporal = store.frame(metric, cities)
+        if not store.has_history(metric):
+            st.caption("Sem série histórica registrada para este indicador; exibindo apenas os valores atuais.")
         
         fig = go.Figure()
         colors = px.colors.qualitative.Set1
         
-        for i, city in enumerate(cities):
-            city_data = df[df['cidade'] == city]
-            if not city_data.empty and metrics[0] in city_data.columns:
-                base_value = city_data[metrics[0]].iloc[0]
-                
-                # Simular evolução temporal
-                values = []
-                for j, year in enumerate(years):
-                    growth_factor = 1 + (j * 0.05) + random.uniform(-0.1, 0.1)
-                    values.append(base_value * growth_factor)
-                
-                fig.add_trace(go.Scatter(
-                    x=years,
-                    y=values,
-                    mode='lines+markers',
-                    name=city,
-                    line=dict(color=colors[i % len(colors)], width=3)
-                ))
+        for i, (city, city_data) in enumerate(df_temporal.groupby('cidade', sort=False)):
+            fig.add_trace(go.Scatter(
+                x=city_data['ano'],
+                y=city_data['valor'],
+                mode='lines+markers',
+                name=city,
+                line=dict(color=colors[i % len(colors)], width=3)
+            ))
         
         fig.update_layout(
-            title=f"Evolução de {metrics[0].replace('_', ' ').title()}",
+            title=f"Evolução de {metric.replace('_', ' ').title()}",
             xaxis_title="Ano",
-            yaxis_title=metrics[0].replace('_', ' ').title(),
+            yaxis_title=metric.replace('_', ' ').title(),
+            xaxis=dict(dtick=1),
             height=400
         )
         
@@ -1094,27 +1224,23 @@ class InteractiveAnalysisPage(Page):
                 direction = "Positiva" if correlation > 0 else "Negativa"
                 st.metric("🔄 Direção", direction)
 
-    def _render_strong_correlations_analysis(self, corr_matrix: pd.DataFrame, min_correlation: float, variables: List[str]):
+    def _render_strong_correlations_analysis(self, correlations: CorrelationResult, min_correlation: float,
+                                             variables: List[str]):
         """Análise de correlações fortes"""
         st.markdown("#### 🔥 Correlações Mais Fortes")
         
-        # Encontrar correlações fortes
-        strong_correlations = []
-        
-        for i in range(len(corr_matrix.columns)):
-            for j in range(i+1, len(corr_matrix.columns)):
-                corr_value = corr_matrix.iloc[i, j]
-                if abs(corr_value) >= min_correlation:
-                    strong_correlations.append({
-                        'Variável 1': corr_matrix.columns[i],
-                        'Variável 2': corr_matrix.columns[j],
-                        'Correlação': corr_value,
-                        'Força': abs(corr_value)
-                    })
-        
-        if strong_correlations:
-            strong_corr_df = pd.DataFrame(strong_correlations)
-            strong_corr_df = strong_corr_df.sort_values('Força', ascending=False)
+        # Filtrar o índice de pares pré-calculado
+        strong_pairs = correlations.strong_pairs(min_correlation, variables)
+        
+        if not strong_pairs.empty:
+            strong_corr_df = strong_pairs.rename(columns={
+                'var1': 'Variável 1',
+                'var2': 'Variável 2',
+                'correlation': 'Correlação',
+                'strength': 'Força',
+                'p_value': 'p-valor',
+                'n': 'Cidades'
+            })
             
             # Top 5 correlações
             st.dataframe(
@@ -1124,9 +1250,10 @@ class InteractiveAnalysisPage(Page):
             )
             
             # Visualização das top correlações
-            if len(strong_corr_df) > 0:
-                top_corr = strong_corr_df.iloc[0]
-                st.markdown(f"**🏆 Correlação Mais Forte:** {top_corr['Variável 1']} ↔ {top_corr['Variável 2']} ({top_corr['Correlação']:.3f})")
+            top_corr = strong_corr_df.iloc[0]
+            significance = " — significativa a 5%" if top_corr['p-valor'] < 0.05 else ""
+            st.markdown(f"**🏆 Correlação Mais Forte:** {top_corr['Variável 1']} ↔ {top_corr['Variável 2']} "
+                        f"({top_corr['Correlação']:.3f}, p = {top_corr['p-valor']:.3g}{significance})")
         else:
             st.info("Nenhuma correlação forte encontrada com o threshold atual.")
 
@@ -3,12 +3,15 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import networkx as nx
+import numpy as np
 from typing import Dict, Any, List, Optional
 
 from src.utils.page_utils import Page, UIComponents, FilterManager, format_number
 from src.state import StateManager
 
 from src.nm.analytics import  Analytics
+from src.nm.name_index import normalize_name
+from src.nm.ontology_store import OntologyStore
 
 
 class NetworkPage(Page):
@@ -22,62 +25,49 @@ class NetworkPage(Page):
         st.markdown('<h2 class="page-header">🔄 Rede de Atores e Relacionamentos</h2>',
                     unsafe_allow_html=True)
 
-        # Verificar se dados da ontologia estão disponíveis
-        ontology_data = data.get('ontologia')
-        if not ontology_data:
+        # Ontologia normalizada uma única vez pelo registro de datasets
+        store: Optional[OntologyStore] = data.get('ontologia_store')
+        if store is None:
             st.warning("Dados da ontologia não estão disponíveis.")
             self._render_placeholder_content()
             return
 
-        # Extrair dados da ontologia
-        actors_data = self._extract_actors_data(ontology_data)
-        if not actors_data:
+        if store.num_nodes == 0:
             st.warning("Não foi possível extrair dados dos atores.")
             return
 
         # Filtros da página
-        filtered_actors = self._render_page_filters(actors_data)
+        mask = self._render_page_filters(store)
+        filtered_actors = store.actors(np.flatnonzero(mask))
 
         # Layout principal
         col1, col2 = st.columns([2, 1])
 
         with col1:
-            self._render_network_visualization(filtered_actors, ontology_data)
+            self._render_network_visualization(store, mask)
             self._render_network_analysis(filtered_actors)
 
         with col2:
             self._render_actor_details(filtered_actors)
             self._render_network_stats(filtered_actors)
 
-    def _extract_actors_data(self, ontology_data: Dict[str, Any]) -> Optional[List[Dict]]:
-        """Extrai dados dos atores da ontologia"""
-        try:
-            # Tentar diferentes estruturas de ontologia
-            if 'textile_ecosystem_network_ontology' in ontology_data:
-                return ontology_data['textile_ecosystem_network_ontology'].get('nodes', [])
-            elif 'ontologia_pessoas_ecossistema_textil_pernambuco' in ontology_data:
-                return ontology_data['ontologia_pessoas_ecossistema_textil_pernambuco'].get('nos', [])
-            elif 'nodes' in ontology_data:
-                return ontology_data['nodes']
-            elif 'nos' in ontology_data:
-                return ontology_data['nos']
-            else:
-                return None
-        except Exception as e:
-            st.error(f"Erro ao extrair dados dos atores: {str(e)}")
-            return None
+    @staticmethod
+    def _text_column(store: OntologyStore, attribute: str, default: str = 'Não especificado') -> pd.Series:
+        """Atributo textual dos atores com valor padrão para ausentes"""
+        return store.attribute(attribute).astype(object).fillna(default)
+
+    def _render_page_filters(self, store: OntologyStore) -> np.ndarray:
+        """Renderiza filtros específicos da página e retorna a máscara dos atores"""
+        leadership = self._text_column(store, 'leadership_type')
+        city = self._text_column(store, 'main_city')
+        relevance = pd.to_numeric(store.attribute('relevance_degree'), errors='coerce')
 
-    def _render_page_filters(self, actors_data: List[Dict]) -> List[Dict]:
-        """Renderiza filtros específicos da página"""
         with st.expander("🎛️ Filtros de Rede", expanded=True):
             col1, col2, col3 = st.columns(3)
 
             with col1:
                 # Filtro por tipo de liderança
-                leadership_types = list(set([
-                    actor.get('attributes', {}).get('leadership_type', 'Não especificado')
-                    for actor in actors_data
-                ]))
+                leadership_types = list(leadership.unique())
 
                 selected_leadership = st.multiselect(
                     "Tipo de Liderança:",
@@ -88,10 +78,7 @@ class NetworkPage(Page):
 
             with col2:
                 # Filtro por cidade
-                cities = list(set([
-                    actor.get('attributes', {}).get('main_city', 'Não especificado')
-                    for actor in actors_data
-                ]))
+                cities = list(city.unique())
 
                 selected_cities = st.multiselect(
                     "Cidade:",
@@ -102,48 +89,35 @@ class NetworkPage(Page):
 
             with col3:
                 # Filtro por relevância mínima
-                relevance_values = [
-                    actor.get('attributes', {}).get('relevance_degree', 0)
-                    for actor in actors_data
-                    if isinstance(actor.get('attributes', {}).get('relevance_degree'), (int, float))
-                ]
+                relevance_values = relevance.dropna()
 
-                if relevance_values:
+                if not relevance_values.empty:
                     min_relevance = st.slider(
                         "Relevância Mínima:",
-                        min_value=int(min(relevance_values)),
-                        max_value=int(max(relevance_values)),
-                        value=int(min(relevance_values)),
+                        min_value=int(relevance_values.min()),
+                        max_value=int(relevance_values.max()),
+                        value=int(relevance_values.min()),
                         key="network_relevance_filter"
                     )
                 else:
                     min_relevance = 0
 
         # Filtrar atores
-        filtered_actors = []
-        for actor in actors_data:
-            attrs = actor.get('attributes', {})
-
-            # Verificar filtros
-            leadership_match = attrs.get('leadership_type', 'Não especificado') in selected_leadership
-            city_match = attrs.get('main_city', 'Não especificado') in selected_cities
-            relevance_match = attrs.get('relevance_degree', 0) >= min_relevance
+        mask = (leadership.isin(selected_leadership)
+                & city.isin(selected_cities)
+                & (relevance.fillna(0) >= min_relevance))
+        return mask.to_numpy()
 
-            if leadership_match and city_match and relevance_match:
-                filtered_actors.append(actor)
-
-        return filtered_actors
-
-    def _render_network_visualization(self, actors_data: List[Dict], ontology_data: Dict[str, Any]):
+    def _render_network_visualization(self, store: OntologyStore, mask: np.ndarray):
         """Renderiza visualização da rede"""
         st.subheader("🕸️ Visualização da Rede")
 
-        if len(actors_data) < 2:
+        if mask.sum() < 2:
             st.warning("Dados insuficientes para visualização da rede.")
             return
 
         # Criar grafo NetworkX
-        G = self._create_networkx_graph(actors_data, ontology_data)
+        G = self._create_networkx_graph(store, mask)
 
         if G.number_of_nodes() == 0:
             st.warning("Nenhum nó disponível para visualização.")
@@ -160,61 +134,24 @@ class NetworkPage(Page):
             except Exception as e:
                 st.error(f"Erro ao exportar: {str(e)}")
 
-    def _create_networkx_graph(self, actors_data: List[Dict], ontology_data: Dict[str, Any]) -> nx.Graph:
-        """Cria grafo NetworkX a partir dos dados"""
-        G = nx.Graph()
-
-        # Adicionar nós
-        for actor in actors_data:
-            actor_id = actor.get('id', actor.get('name', ''))
-            if actor_id:
-                attrs = actor.get('attributes', {})
-                G.add_node(
-                    actor_id,
-                    name=actor.get('name', ''),
-                    position=actor.get('position', ''),
-                    city=attrs.get('main_city', ''),
-                    leadership_type=attrs.get('leadership_type', ''),
-                    relevance=attrs.get('relevance_degree', 0),
-                    impact_scale=attrs.get('impact_scale', '')
-                )
-
-        # Adicionar arestas se disponíveis
-        edges = self._extract_edges_data(ontology_data)
-        if edges:
-            actor_ids = [actor.get('id', actor.get('name', '')) for actor in actors_data]
-
-            for edge in edges:
-                source = edge.get('source', edge.get('origem', ''))
-                target = edge.get('target', edge.get('destino', ''))
-
-                if source in actor_ids and target in actor_ids:
-                    edge_attrs = edge.get('attributes', {})
-                    G.add_edge(
-                        source,
-                        target,
-                        relationship=edge.get('type', ''),
-                        intensity=edge_attrs.get('intensity', edge_attrs.get('intensidade', '')),
-                        context=edge_attrs.get('context', edge_attrs.get('contexto', ''))
-                    )
-
-        return G
-
-    def _extract_edges_data(self, ontology_data: Dict[str, Any]) -> Optional[List[Dict]]:
-        """Extrai dados das arestas da ontologia"""
-        try:
-            if 'textile_ecosystem_network_ontology' in ontology_data:
-                return ontology_data['textile_ecosystem_network_ontology'].get('edges', [])
-            elif 'ontologia_pessoas_ecossistema_textil_pernambuco' in ontology_data:
-                return ontology_data['ontologia_pessoas_ecossistema_textil_pernambuco'].get('arestas', [])
-            elif 'edges' in ontology_data:
-                return ontology_data['edges']
-            elif 'arestas' in ontology_data:
-                return ontology_data['arestas']
-            else:
-                return []
-        except Exception:
-            return []
+    def _create_networkx_graph(self, store: OntologyStore, mask: np.ndarray) -> nx.Graph:
+        """Cria grafo NetworkX dos atores selecionados a partir do store"""
+        return store.to_networkx(
+            mask,
+            node_columns={
+                'name': 'name',
+                'position': 'position',
+                'city': 'main_city',
+                'leadership_type': 'leadership_type',
+                'relevance': 'relevance_degree',
+                'impact_scale': 'impact_scale',
+            },
+            edge_columns={
+                'relationship': 'type',
+                'intensity': 'intensity',
+                'context': 'context',
+            }
+        )
 
     def _render_plotly_network(self, G: nx.Graph):
         """Renderiza rede usando Plotly"""
@@ -350,9 +287,11 @@ class NetworkPage(Page):
 
         # Filtrar atores pela busca
         if search_term:
+            # Busca sem diferenciar acentos e maiúsculas
+            term = normalize_name(search_term)
             filtered_actors = [
                 actor for actor in actors_data
-                if search_term.lower() in actor.get('name', '').lower()
+                if term in normalize_name(actor.get('name', ''))
             ]
 
             if filtered_actors:
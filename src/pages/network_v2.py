@@ -21,11 +21,11 @@ class NetworkPageV2(Page):
         renderer = EcosystemNetworkRenderer()
 
         # Verificar se dados da ontologia estão disponíveis
-        ontology_data = data.get('ontologia')
-        if not ontology_data:
+        store = data.get('ontologia_store')
+        if store is None:
             st.warning("Dados da ontologia não estão disponíveis.")
             return
 
-        renderer.load_json_ontology(json_data=ontology_data, root_node = 'textile_ecosystem_network_ontology')
+        renderer.load_ontology_store(store)
 
         renderer.create_network_map()
\ No newline at end of file
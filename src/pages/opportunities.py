@@ -8,6 +8,7 @@ from src.utils.page_utils import Page, UIComponents, FilterManager, format_numbe
 from src.state import StateManager
 
 from src.nm.analytics import  Analytics
+from src.nm.stakeholders import StakeholderDirectory, get_stakeholder_directory
 
 
 class OpportunitiesPage(Page):
@@ -24,6 +25,11 @@ class OpportunitiesPage(Page):
         # Carregar dados de oportunidades
         opportunities_data = self._load_opportunities_data()
 
+        # Stakeholders do catálogo resolvidos uma vez contra a ontologia
+        store = data.get('ontologia_store')
+        directory = get_stakeholder_directory(store, opportunities_data) if store is not None else None
+        opportunity_names = {opp['id']: opp['oportunidade'] for opp in opportunities_data}
+
         # Filtros da página
         filtered_opportunities = self._render_page_filters(opportunities_data)
 
@@ -36,7 +42,7 @@ class OpportunitiesPage(Page):
 
         with col2:
             self._render_priority_opportunities(filtered_opportunities, data)
-            self._render_stakeholder_recommendations(filtered_opportunities, data)
+            self._render_stakeholder_recommendations(filtered_opportunities, directory, opportunity_names)
 
     def _load_opportunities_data(self) -> List[Dict[str, Any]]:
         """Carrega dados de oportunidades estruturadas"""
@@ -360,7 +366,9 @@ class OpportunitiesPage(Page):
                 for stakeholder in opp['stakeholders_recomendados']:
                     st.markdown(f"- {stakeholder}")
 
-    def _render_stakeholder_recommendations(self, opportunities_data: List[Dict], data: Dict[str, Any]):
+    def _render_stakeholder_recommendations(self, opportunities_data: List[Dict],
+                                            directory: Optional[StakeholderDirectory],
+                                            opportunity_names: Dict[str, str]):
         """Renderiza recomendações de stakeholders"""
         st.subheader("👥 Stakeholders-Chave por Oportunidade")
 
@@ -392,7 +400,7 @@ class OpportunitiesPage(Page):
 
             for stakeholder in selected_opp['stakeholders_recomendados']:
                 # Buscar informações do stakeholder na ontologia
-                stakeholder_info = self._get_stakeholder_info(stakeholder, data)
+                stakeholder_info = self._get_stakeholder_info(stakeholder, directory)
 
                 if stakeholder_info:
                     with st.expander(f"👤 {stakeholder}"):
@@ -414,6 +422,13 @@ class OpportunitiesPage(Page):
                         # Justificativa da recomendação
                         justification = self._generate_stakeholder_justification(selected_opp, stakeholder_info)
                         st.markdown(f"**Por que este stakeholder?** {justification}")
+
+                        # Outras oportunidades em que o ator é recomendado
+                        others = [opportunity_names[opp_id]
+                                  for opp_id in directory.opportunities_for(stakeholder_info['id'])
+                                  if opp_id != selected_opp['id'] and opp_id in opportunity_names]
+                        if others:
+                            st.markdown(f"**Também recomendado em:** {', '.join(others)}")
                 else:
                     st.markdown(f"- **{stakeholder}** (informações detalhadas não disponíveis)")
 
@@ -423,40 +438,12 @@ class OpportunitiesPage(Page):
             for step in next_steps:
                 st.markdown(f"- {step}")
 
-    def _get_stakeholder_info(self, stakeholder_name: str, data: Dict[str, Any]) -> Optional[Dict]:
-        """Busca informações de um stakeholder específico"""
-        ontology_data = data.get('ontologia')
-        if not ontology_data:
-            return None
-
-        # Extrair dados dos atores
-        try:
-            if 'textile_ecosystem_network_ontology' in ontology_data:
-                actors = ontology_data['textile_ecosystem_network_ontology'].get('nodes', [])
-            elif 'ontologia_pessoas_ecossistema_textil_pernambuco' in ontology_data:
-                actors = ontology_data['ontologia_pessoas_ecossistema_textil_pernambuco'].get('nos', [])
-            else:
-                return None
-
-            # Buscar por nome
-            for actor in actors:
-                if actor.get('name', '') == stakeholder_name:
-                    attrs = actor.get('attributes', {})
-                    return {
-                        'name': actor.get('name', ''),
-                        'position': actor.get('position', ''),
-                        'main_city': attrs.get('main_city', ''),
-                        'activity_area': attrs.get('activity_area', ''),
-                        'leadership_type': attrs.get('leadership_type', ''),
-                        'relevance_degree': attrs.get('relevance_degree', ''),
-                        'impact_scale': attrs.get('impact_scale', ''),
-                        'main_contribution': attrs.get('main_contribution', '')
-                    }
-
-            return None
-
-        except Exception:
+    def _get_stakeholder_info(self, stakeholder_name: str,
+                              directory: Optional[StakeholderDirectory]) -> Optional[Dict]:
+        """Busca informações de um stakeholder específico no diretório pré-montado"""
+        if directory is None:
             return None
+        return directory.info(stakeholder_name)
 
     def _generate_stakeholder_justification(self, opportunity: Dict, stakeholder_info: Dict) -> str:
         """Gera justificativa para recomendação do stakeholder"""
@@ -1,4 +1,5 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -21,156 +22,16 @@ class RisksPage(Page):
                     unsafe_allow_html=True)
 
 
-        # Função para carregar dados de riscos
-        @st.cache_data
-        def load_risk_data():
-            """Carrega dados de riscos baseados no mapeamento detalhado"""
-
-            # Dados dos riscos baseados no documento de mapeamento
-            risk_data = [
-                # Riscos Críticos (Alta Severidade e Alta Probabilidade)
-                {"categoria": "Social", "risco": "Trabalho infantil", "severidade": 5, "probabilidade": 5,
-                 "prioridade": "Crítica",
-                 "descricao": "Utilização de mão de obra infantil nas facções e unidades produtivas",
-                 "stakeholders": "Crianças e adolescentes, famílias, comunidade",
-                 "mitigacao": "Fiscalização educativa, alternativas de renda, sensibilização"},
-
-                {"categoria": "Social", "risco": "Precarização do trabalho", "severidade": 5, "probabilidade": 5,
-                 "prioridade": "Crítica",
-                 "descricao": "Condições inadequadas de trabalho, jornadas excessivas, remuneração insuficiente",
-                 "stakeholders": "Costureiras autônomas, trabalhadores informais",
-                 "mitigacao": "Formalização gradual, melhoria de condições, fiscalização"},
-
-                {"categoria": "Social", "risco": "Evasão escolar", "severidade": 4, "probabilidade": 5, "prioridade": "Crítica",
-                 "descricao": "Abandono da educação formal em favor do trabalho precoce",
-                 "stakeholders": "Jovens, comunidade, futuro do polo",
-                 "mitigacao": "Educação dual, incentivos à permanência escolar"},
-
-                {"categoria": "Econômico", "risco": "Concorrência com produtos importados", "severidade": 5, "probabilidade": 4,
-                 "prioridade": "Crítica",
-                 "descricao": "Entrada massiva de produtos têxteis importados de baixo custo",
-                 "stakeholders": "Todos os produtores, especialmente pequenas facções",
-                 "mitigacao": "Inovação, diferenciação, agregação de valor"},
-
-                {"categoria": "Econômico", "risco": "Dependência de intermediários", "severidade": 4, "probabilidade": 5,
-                 "prioridade": "Crítica",
-                 "descricao": "Estrutura de mercado com múltiplos intermediários que capturam valor significativo",
-                 "stakeholders": "Costureiras autônomas, facções, pequenos produtores",
-                 "mitigacao": "Plataformas digitais, cooperação, vendas diretas"},
-
-                {"categoria": "Ambiental", "risco": "Escassez hídrica", "severidade": 5, "probabilidade": 4,
-                 "prioridade": "Crítica",
-                 "descricao": "Redução da disponibilidade de água para processos produtivos",
-                 "stakeholders": "Lavanderias, produtores de jeans, comunidade",
-                 "mitigacao": "Tecnologias de economia de água, reuso, captação de chuva"},
-
-                {"categoria": "Ambiental", "risco": "Poluição de recursos hídricos", "severidade": 5, "probabilidade": 4,
-                 "prioridade": "Crítica",
-                 "descricao": "Contaminação de rios e lençóis freáticos por efluentes não tratados",
-                 "stakeholders": "Comunidade, meio ambiente, lavanderias",
-                 "mitigacao": "Sistemas de tratamento, fiscalização, cooperação"},
-
-                {"categoria": "Tecnológico", "risco": "Exclusão da transformação digital", "severidade": 4, "probabilidade": 5,
-                 "prioridade": "Crítica",
-                 "descricao": "Incapacidade de pequenos produtores de acompanhar a digitalização",
-                 "stakeholders": "Pequenos produtores, facções, comerciantes tradicionais",
-                 "mitigacao": "Inclusão digital, capacitação, tecnologias acessíveis"},
-
-                # Riscos Significativos (Média Severidade e Alta Probabilidade)
-                {"categoria": "Econômico", "risco": "Sazonalidade acentuada", "severidade": 3, "probabilidade": 4,
-                 "prioridade": "Significativa",
-                 "descricao": "Concentração de vendas em períodos específicos",
-                 "stakeholders": "Produtores e comerciantes",
-                 "mitigacao": "Diversificação de mercados, planejamento estratégico"},
-
-                {"categoria": "Econômico", "risco": "Limitações logísticas", "severidade": 3, "probabilidade": 4,
-                 "prioridade": "Significativa",
-                 "descricao": "Infraestrutura de transporte deficiente, elevando custos",
-                 "stakeholders": "Toda a cadeia, especialmente exportadores",
-                 "mitigacao": "Investimento em infraestrutura, logística compartilhada"},
-
-                {"categoria": "Econômico", "risco": "Acesso limitado a crédito", "severidade": 3, "probabilidade": 4,
-                 "prioridade": "Significativa",
-                 "descricao": "Dificuldade de acesso a financiamento adequado",
-                 "stakeholders": "Pequenos e médios produtores, empreendedores jovens",
-                 "mitigacao": "Microcrédito, garantias coletivas, formalização"},
-
-                {"categoria": "Social", "risco": "Desigualdade de gênero", "severidade": 3, "probabilidade": 4,
-                 "prioridade": "Significativa",
-                 "descricao": "Disparidades de remuneração e oportunidades entre homens e mulheres",
-                 "stakeholders": "Mulheres trabalhadoras, comunidade",
-                 "mitigacao": "Programas de empoderamento feminino, capacitação"},
-
-                {"categoria": "Social", "risco": "Problemas de saúde ocupacional", "severidade": 3, "probabilidade": 4,
-                 "prioridade": "Significativa",
-                 "descricao": "Doenças e lesões relacionadas ao trabalho",
-                 "stakeholders": "Trabalhadores, especialmente costureiras",
-                 "mitigacao": "Equipamentos de segurança, ergonomia, prevenção"},
-
-                {"categoria": "Ambiental", "risco": "Gestão inadequada de resíduos sólidos", "severidade": 3,
-                 "probabilidade": 4, "prioridade": "Significativa",
-                 "descricao": "Descarte inadequado de retalhos, embalagens e outros resíduos",
-                 "stakeholders": "Comunidade, meio ambiente, produtores",
-                 "mitigacao": "Economia circular, reciclagem, reaproveitamento"},
-
-                {"categoria": "Ambiental", "risco": "Uso de produtos químicos tóxicos", "severidade": 3, "probabilidade": 4,
-                 "prioridade": "Significativa",
-                 "descricao": "Utilização de corantes, alvejantes e outros produtos nocivos",
-                 "stakeholders": "Trabalhadores, comunidade, meio ambiente",
-                 "mitigacao": "Produtos alternativos, capacitação, regulamentação"},
-
-                {"categoria": "Tecnológico", "risco": "Resistência cultural à digitalização", "severidade": 3,
-                 "probabilidade": 4, "prioridade": "Significativa",
-                 "descricao": "Rejeição de novas tecnologias e modelos de negócio digitais",
-                 "stakeholders": "Produtores tradicionais, trabalhadores mais velhos",
-                 "mitigacao": "Sensibilização, demonstrações práticas, capacitação gradual"},
-
-                {"categoria": "Político", "risco": "Burocracia excessiva", "severidade": 3, "probabilidade": 4,
-                 "prioridade": "Significativa",
-                 "descricao": "Processos complexos e demorados para licenciamentos",
-                 "stakeholders": "Empreendedores, especialmente pequenos",
-                 "mitigacao": "Simplificação de processos, balcão único, digitalização"},
-
-                # Alguns riscos moderados para completar o conjunto
-                {"categoria": "Econômico", "risco": "Volatilidade de preços de insumos", "severidade": 3, "probabilidade": 3,
-                 "prioridade": "Moderada",
-                 "descricao": "Flutuações significativas nos preços de tecidos e aviamentos",
-                 "stakeholders": "Toda a cadeia produtiva, especialmente pequenos produtores",
-                 "mitigacao": "Compras coletivas, contratos de longo prazo, diversificação"},
-
-                {"categoria": "Tecnológico", "risco": "Ciberataques e segurança digital", "severidade": 4, "probabilidade": 2,
-                 "prioridade": "Moderada",
-                 "descricao": "Vulnerabilidade a ataques cibernéticos em sistemas digitais",
-                 "stakeholders": "Empresas digitalizadas, plataforma B2B",
-                 "mitigacao": "Segurança digital, backups, treinamento em segurança"},
-
-                {"categoria": "Político", "risco": "Descontinuidade de políticas públicas", "severidade": 4, "probabilidade": 3,
-                 "prioridade": "Moderada",
-                 "descricao": "Interrupção ou alteração significativa de programas governamentais",
-                 "stakeholders": "Beneficiários de programas, instituições implementadoras",
-                 "mitigacao": "Diversificação de fontes de apoio, sustentabilidade própria"}
-            ]
-
-            return pd.DataFrame(risk_data)
-
-
-        # Função para calcular valor de risco
-        def calculate_risk_value(severidade, probabilidade):
-            return severidade * probabilidade
-
-
-        # Carregar dados
-        df_risks = load_risk_data()
-
-        # Calcular valor de risco
-        df_risks['valor_risco'] = df_risks.apply(lambda row: calculate_risk_value(row['severidade'], row['probabilidade']),
-                                                 axis=1)
+        register = data.get('riscos_store')
+        if register is None or len(register) == 0:
+            st.error("Registro de riscos não disponível.")
+            return
 
         # Sidebar para filtros
         st.header("Filtros de Análise")
 
         # Filtro por categoria
-        categorias = sorted(df_risks['categoria'].unique())
+        categorias = register.categories
         selected_categories = st.multiselect(
             "Categorias de Risco:",
             options=categorias,
@@ -184,7 +45,7 @@ class RisksPage(Page):
                                 {"selected_values": selected_categories})
 
         # Filtro por prioridade
-        prioridades = ["Crítica", "Significativa", "Moderada"]
+        prioridades = register.priorities
         selected_priorities = st.multiselect(
             "Níveis de Prioridade:",
             options=prioridades,
@@ -197,13 +58,34 @@ class RisksPage(Page):
             Analytics.log_event("risks-filter_priorities",
                                 {"selected_values": selected_priorities})
 
+        # Filtro por stakeholder (vazio = todos)
+        selected_stakeholders = st.multiselect(
+            "Stakeholders Afetados:",
+            options=register.stakeholders,
+            default=[],
+            key="risk_stakeholders"
+        )
+
+        if selected_stakeholders:
+            Analytics.log_event("risks-filter_stakeholders",
+                                {"selected_values": selected_stakeholders})
+
+        # Matriz usada para calcular o valor de risco
+        matrix_labels = register.matrix_labels
+        selected_matrix = st.selectbox(
+            "Matriz de Pontuação:",
+            options=list(matrix_labels),
+            format_func=lambda x: matrix_labels[x],
+            key="risk_matrix"
+        )
+        max_risk_value = int(np.ceil(register.matrices[selected_matrix][1].max()))
 
         # Filtro por valor mínimo de risco
         min_risk_value = st.slider(
             "Valor Mínimo de Risco:",
             min_value=1,
-            max_value=25,
-            value=5,
+            max_value=max_risk_value,
+            value=min(5, max_risk_value),
             key="min_risk_value"
         )
 
@@ -217,12 +99,14 @@ class RisksPage(Page):
 
             st.session_state.min_risk_value_last = min_risk_value
 
-        # Filtrar dados
-        df_filtered = df_risks[
-            (df_risks['categoria'].isin(selected_categories)) &
-            (df_risks['prioridade'].isin(selected_priorities)) &
-            (df_risks['valor_risco'] >= min_risk_value)
-            ].copy()
+        # Filtrar dados pelos índices do registro
+        df_filtered = register.select(
+            categories=selected_categories,
+            priorities=selected_priorities,
+            stakeholders=selected_stakeholders or None,
+            min_value=min_risk_value,
+            matrix=selected_matrix
+        )
 
         # Layout em colunas
         col1, col2 = st.columns([2, 1])
@@ -240,22 +124,21 @@ class RisksPage(Page):
                 'Moderada': '#FFD700'
             }
 
-            for prioridade in df_filtered['prioridade'].unique():
-                df_priority = df_filtered[df_filtered['prioridade'] == prioridade]
-
+            for prioridade, df_priority in df_filtered.groupby('prioridade', observed=True):
                 fig.add_trace(go.Scatter(
                     x=df_priority['probabilidade'],
                     y=df_priority['severidade'],
                     mode='markers',
                     marker=dict(
-                        size=[val * 3 for val in df_priority['valor_risco']],
+                        size=df_priority['valor_risco'] * 3,
                         color=color_map.get(prioridade, '#1f77b4'),
                         line=dict(width=2, color='white'),
                         opacity=0.8
                     ),
                     text=df_priority['risco'],
+                    customdata=df_priority['valor_risco'],
                     name=f'Prioridade {prioridade}',
-                    hovertemplate="<b>%{text}</b><br>Severidade: %{y}<br>Probabilidade: %{x}<br>Valor de Risco: %{marker.size}<extra></extra>"
+                    hovertemplate="<b>%{text}</b><br>Severidade: %{y}<br>Probabilidade: %{x}<br>Valor de Risco: %{customdata:.1f}<extra></extra>"
                 ))
 
             # Adicionar linhas de grade para os quadrantes
@@ -294,7 +177,7 @@ class RisksPage(Page):
                                     {"chart_type": "risk_matrix"})
 
             # Gráfico de barras por categoria
-            category_risk = df_filtered.groupby('categoria')['valor_risco'].agg(['mean', 'count']).reset_index()
+            category_risk = df_filtered.groupby('categoria', observed=True)['valor_risco'].agg(['mean', 'count']).reset_index()
             category_risk.columns = ['categoria', 'risco_medio', 'quantidade']
 
             if not category_risk.empty:
@@ -321,15 +204,15 @@ class RisksPage(Page):
             # Ordenar por valor de risco
             df_priority = df_filtered.sort_values(by='valor_risco', ascending=False).head(10)
 
-            for i, risk in df_priority.iterrows():
-                with st.expander(f"{risk['risco']} (Risco: {risk['valor_risco']})"):
-                    st.markdown(f"**Categoria:** {risk['categoria']}")
-                    st.markdown(f"**Prioridade:** {risk['prioridade']}")
-                    st.markdown(f"**Severidade:** {risk['severidade']}/5")
-                    st.markdown(f"**Probabilidade:** {risk['probabilidade']}/5")
-                    st.markdown(f"**Descrição:** {risk['descricao']}")
-                    st.markdown(f"**Stakeholders Afetados:** {risk['stakeholders']}")
-                    st.markdown(f"**Estratégias de Mitigação:** {risk['mitigacao']}")
+            for risk in df_priority.itertuples(index=False):
+                with st.expander(f"{risk.risco} (Risco: {risk.valor_risco:g})"):
+                    st.markdown(f"**Categoria:** {risk.categoria}")
+                    st.markdown(f"**Prioridade:** {risk.prioridade}")
+                    st.markdown(f"**Severidade:** {risk.severidade}/{register.scale}")
+                    st.markdown(f"**Probabilidade:** {risk.probabilidade}/{register.scale}")
+                    st.markdown(f"**Descrição:** {risk.descricao}")
+                    st.markdown(f"**Stakeholders Afetados:** {risk.stakeholders}")
+                    st.markdown(f"**Estratégias de Mitigação:** {risk.mitigacao}")
 
             Analytics.log_event("priority_risks",
                                 {"count": len(df_priority)})
@@ -464,7 +347,7 @@ class RisksPage(Page):
         - Valor médio de risco: {df_filtered['valor_risco'].mean():.2f}
         
         ## Riscos por Categoria
-        {df_filtered.groupby('categoria')['valor_risco'].agg(['count', 'mean']).round(2).to_string()}
+        {df_filtered.groupby('categoria', observed=True)['valor_risco'].agg(['count', 'mean']).round(2).to_string()}
         
         ## Recomendações Prioritárias
         Com base na análise, recomenda-se focar inicialmente nos riscos críticos, especialmente:
@@ -493,7 +376,7 @@ class RisksPage(Page):
         **Metodologia:**
         - **Severidade**: Impacto potencial do risco (1-5)
         - **Probabilidade**: Chance de ocorrência do risco (1-5)
-        - **Valor de Risco**: Severidade × Probabilidade
+        - **Valor de Risco**: Severidade × Probabilidade, ou uma matriz personalizada do registro de riscos
         - **Prioridade**: Classificação baseada no valor de risco
         
         **Dicas de uso:**
@@ -3,7 +3,7 @@ import streamlit.components.v1 as components
 from typing import Optional, Dict, Any, List
 import json
 
-from src.nm.comments import CommentsManager
+from src.nm.comments import CommentsManager, COMMENTS_REFRESH_INTERVAL
 
 
 @st.dialog("💬 Adicionar Comentário")
@@ -122,9 +122,21 @@ def interactive_card_component(card_id: str, title: str, content: str, comments:
     return None
 
 
+def _comment_locations(available_items: Dict[str, any]) -> List[str]:
+    """List every comment location id selectable in render_comments_section"""
+    locations = []
+    for group_id, value in available_items.items():
+        locations.append(group_id)
+        if isinstance(value, dict):
+            locations.extend(f"{group_id}_{sub_id}" for sub_id in value)
+    return locations
+
+
+@st.fragment(run_every=COMMENTS_REFRESH_INTERVAL)
 def render_comments_section(available_items: Dict[str, any], page_key: str = ""):
     """
-    Render a centralized comments section for multiple items with hierarchical support
+    Render a centralized comments section for multiple items with hierarchical support.
+    Runs as a fragment, so selecting, saving and pushed comments refresh only this section.
     
     Args:
         available_items: Dict with item_id as key and either:
@@ -141,6 +153,9 @@ def render_comments_section(available_items: Dict[str, any], page_key: str = "")
     
     # Check if we have hierarchical structure (groups with sub-items)
     has_hierarchical = any(isinstance(value, dict) for value in available_items.values())
+
+    # Warm the comment cache for every selectable item with one query
+    CommentsManager.prefetch_comments(_comment_locations(available_items))
     
     if has_hierarchical:
         # First level: select group
@@ -202,8 +217,12 @@ def render_comments_section(available_items: Dict[str, any], page_key: str = "")
         selected_item_id = item_options[selected_item_index]
         selected_item_name = available_items[selected_item_id]
     
-    # Display existing comments for selected item
-    comments = CommentsManager.load_comments(selected_item_id)
+    # Live updates for the selected item
+    CommentsManager.sync_live_updates([selected_item_id])
+
+    # Display existing comments for selected item (one page at a time)
+    limit_key = f"comments_limit_{page_key}_{selected_item_id}"
+    comments, has_more = CommentsManager.load_comments_page(selected_item_id, CommentsManager.page_limit(limit_key))
 
     st.markdown("### ➕ Adicionar Comentário")
 
@@ -224,13 +243,14 @@ def render_comments_section(available_items: Dict[str, any], page_key: str = "")
         if submitted and comment_text.strip():
             if CommentsManager.save_comment(selected_item_id, comment_text.strip()):
                 st.success("Comentário adicionado com sucesso!")
-                st.rerun()
+                st.rerun(scope="fragment")
             else:
                 st.error("Erro ao salvar comentário.")
         elif submitted:
             st.warning("Por favor, digite um comentário antes de enviar.")
 
-    st.markdown(f"### 📝 Comentários: {selected_item_name}")
+    total = CommentsManager.count_comments(selected_item_id) if has_more else len(comments)
+    st.markdown(f"### 📝 Comentários: {selected_item_name}" + (f" ({total})" if total else ""))
 
     if comments:
         for comment in comments:
@@ -253,6 +273,8 @@ def render_comments_section(available_items: Dict[str, any], page_key: str = "")
                 st.markdown(f"**👤 {author_short}** • 📅 {formatted_time}")
                 st.markdown(f"> {comment.comment}")
                 st.markdown("---")
+
+        CommentsManager.render_load_more(limit_key, has_more)
     else:
         st.info("Nenhum comentário ainda. Seja o primeiro a comentar!")
 
@@ -0,0 +1,187 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("postgrest")
+
+from src.nm.supabase_client import SupabaseClientFactory
+
+API_KEY = "local-test-key"
+COMMENTS = [
+    {"id": 1, "project": "st-textile-pe", "location": "overview", "comment": "Primeiro"},
+    {"id": 2, "project": "st-textile-pe", "location": "overview", "comment": "Segundo"},
+]
+
+
+class PostgrestStandIn(BaseHTTPRequestHandler):
+    """Minimal PostgREST stand-in: GET returns COMMENTS, POST records the body"""
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.requests.append(("GET", self.path, dict(self.headers)))
+        self._reply(200, COMMENTS if self.path.startswith("/rest/v1/comments") else {})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length))
+        self.server.requests.append(("POST", self.path, dict(self.headers)))
+        self.server.inserted.extend(payload if isinstance(payload, list) else [payload])
+        self._reply(201, payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def postgrest_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PostgrestStandIn)
+    server.connections = 0
+    server.requests = []
+    server.inserted = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def server_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_select_against_local_stand_in(postgrest_server):
+    factory = SupabaseClientFactory(url=server_url(postgrest_server), key=API_KEY)
+
+    result = factory.get_client().table("comments").select("*").eq("location", "overview").execute()
+
+    assert result.data == COMMENTS
+    method, path, headers = postgrest_server.requests[0]
+    assert method == "GET" and path.startswith("/rest/v1/comments?")
+    assert "location=eq.overview" in path
+    assert headers["apiKey"] == API_KEY
+    assert headers["Authorization"] == f"Bearer {API_KEY}"
+
+
+def test_client_is_shared_and_connection_kept_alive(postgrest_server):
+    factory = SupabaseClientFactory(url=server_url(postgrest_server), key=API_KEY)
+
+    for _ in range(5):
+        factory.get_client().table("comments").select("*").execute()
+
+    assert factory.get_client() is factory.get_client()
+    assert len(postgrest_server.requests) == 5
+    assert postgrest_server.connections == 1
+
+
+def test_batch_insert(postgrest_server):
+    factory = SupabaseClientFactory(url=server_url(postgrest_server), key=API_KEY)
+    rows = [{"event_type": "page_view", "n": i} for i in range(3)]
+
+    factory.get_client().table("analytics").insert(rows).execute()
+
+    method, path, _ = postgrest_server.requests[0]
+    assert len(postgrest_server.requests) == 1
+    assert method == "POST" and path.split("?")[0] == "/rest/v1/analytics"
+    assert postgrest_server.inserted == rows
+
+
+class FlakyTransport(httpx.BaseTransport):
+    """Forwards to the stand-in over real sockets; raises ConnectError on the next `failures` requests"""
+
+    def __init__(self):
+        self.failures = 0
+        self._inner = None
+
+    def handle_request(self, request):
+        if self.failures:
+            self.failures -= 1
+            raise httpx.ConnectError("connection refused", request=request)
+        if self._inner is None:
+            self._inner = httpx.HTTPTransport()
+        return self._inner.handle_request(request)
+
+    def close(self):
+        # Closing the failed client drops its pool; the next client opens a new one
+        if self._inner is not None:
+            self._inner.close()
+            self._inner = None
+
+
+def test_health_check_reconnects_after_transport_error(postgrest_server):
+    transport = FlakyTransport()
+    factory = SupabaseClientFactory(url=server_url(postgrest_server), key=API_KEY, transport=transport)
+    first = factory.get_client()
+    assert factory.health_check()
+
+    transport.failures = 1
+    assert not factory.health_check()
+
+    second = factory.get_client()
+    assert second is not first
+    assert second.table("comments").select("*").execute().data == COMMENTS
+    assert factory.get_client() is second
+    assert postgrest_server.connections == 2  # a new connection to the same URL
+
+
+def test_reset_if_disconnected(postgrest_server):
+    transport = FlakyTransport()
+    factory = SupabaseClientFactory(url=server_url(postgrest_server), key=API_KEY, transport=transport)
+    first = factory.get_client()
+
+    # Non-transport errors keep the current client
+    factory.reset_if_disconnected(first, ValueError("bad payload"))
+    assert factory.get_client() is first
+
+    transport.failures = 1
+    with pytest.raises(httpx.ConnectError) as error:
+        first.table("comments").select("*").execute()
+    factory.reset_if_disconnected(first, error.value)
+
+    second = factory.get_client()
+    assert second is not first
+    assert second.table("comments").select("*").execute().data == COMMENTS
+
+    # A stale failure report from the old client does not drop the new one
+    factory.reset(first)
+    assert factory.get_client() is second
+
+
+def test_environment_injection(postgrest_server, monkeypatch):
+    monkeypatch.setenv("SUPABASE_URL", server_url(postgrest_server))
+    monkeypatch.setenv("SUPABASE_KEY", API_KEY)
+    factory = SupabaseClientFactory()
+
+    assert factory.configured
+    assert factory.get_client().table("comments").select("*").execute().data == COMMENTS
+
+
+def test_mock_transport():
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json=COMMENTS[:1])
+
+    factory = SupabaseClientFactory(url="http://postgrest.test", key=API_KEY,
+                                    transport=httpx.MockTransport(handler))
+
+    result = factory.get_client().table("comments").select("id,comment").execute()
+
+    assert result.data == COMMENTS[:1]
+    assert seen[0].url.path == "/rest/v1/comments"
+    assert seen[0].url.params["select"] == "id,comment"
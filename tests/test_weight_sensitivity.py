@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from src.nm.city_table import AGGREGATE_ROWS
+from src.nm.composite_index import DEFAULT_SPECS, compute_composite_index, rankable_components
+from src.nm.weight_sensitivity import run_weight_sensitivity
+
+CITIES = ["Santa Cruz do Capibaribe", "Caruaru", "Toritama", "Surubim"]
+
+
+def city_facts():
+    rng = np.random.default_rng(7)
+    facts = pd.DataFrame({"cidade": CITIES + list(AGGREGATE_ROWS)})
+    for spec in DEFAULT_SPECS:
+        facts[spec.column] = rng.uniform(1, 100, len(facts))
+    # 'Total Polo' só tem parte dos indicadores; Surubim tem apenas um
+    facts.loc[facts["cidade"] == "Total Polo", ["idh", "evasao_escolar", "investimento_inovacao_percentual"]] = np.nan
+    facts.loc[facts["cidade"] == "Surubim", [spec.column for spec in DEFAULT_SPECS[1:]]] = np.nan
+    return facts
+
+
+def test_aggregate_rows_never_ranked():
+    index = compute_composite_index(city_facts())
+
+    assert set(index.components.index).isdisjoint(AGGREGATE_ROWS)
+    assert list(index.ranking["cidade"]) == list(index.ranked_components.index)
+    assert "Surubim" not in set(index.ranking["cidade"])
+
+    result = run_weight_sensitivity(index.ranked_components, [spec.weight for spec in index.specs], samples=500)
+
+    assert set(result.stats["cidade"]).isdisjoint(AGGREGATE_ROWS)
+    assert set(result.stats["cidade"]) == set(CITIES) - {"Surubim"}
+
+
+def test_rankable_components_drops_aggregates_and_low_coverage():
+    facts = city_facts().set_index("cidade")[[spec.column for spec in DEFAULT_SPECS]]
+
+    result = run_weight_sensitivity(rankable_components(facts), samples=500)
+
+    assert set(result.stats["cidade"]).isdisjoint(AGGREGATE_ROWS)
+    assert "Surubim" not in set(result.stats["cidade"])